@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains AI helper classes used in the game STAR WARS DOGFIGHTER.
+The AISensors class runs the radar computation of AIShipSprite.use_radar for all AI
+controlled ships at once, so that large squadrons pay one vectorized cost per frame
+instead of two Python round trips per ship. The TargetSelector class replaces the random
+target acquisition of AIShipSprite with policy based selection backed by a per-frame
+spatial index over each side's ships.'''
+
+from random import randint
+
+import numpy as np
+
+class AISensors(object):
+    '''Per-frame sensor stage for AI controlled ships. Computes the projection of the
+    (normalized) ship -> target vector on the clockwise orthonormal of each ship's direction
+    of flight, and hands the result to the ships as radar readings that both their pilot
+    and gunner decisions use.'''
+
+    def __init__(self):
+
+        # initialize statistics
+        self.n_scans = 0
+        self.n_ships_scanned = 0
+
+    def scan(self,
+             ai_ships):
+        '''Computes and attaches radar readings for all specified AIShipSprites that currently
+        have a target. Ships without a target get their reading cleared.'''
+
+        # gather ships with a target and their targets
+        ships, targets = [], []
+
+        for ship in ai_ships:
+            current_targets = ship._current_target.sprites()
+
+            if current_targets:
+                ships.append(ship)
+                targets.append(current_targets[0])
+            else:
+                ship._radar_reading = None
+
+        self.n_scans += 1
+        self.n_ships_scanned += len(ships)
+
+        if not ships:
+            return
+
+        # get positional attributes as arrays
+        centers = np.array([ship._center for ship in ships],dtype='float')
+        target_centers = np.array([target._center for target in targets],dtype='float')
+        angles_radian = np.radians([ship._angle for ship in ships])
+
+        # clockwise oriented orthonormal to unit directional vector (cos, -sin)
+        clockwise_ortnorm_directions = np.stack([-np.sin(angles_radian),
+                                                 -np.cos(angles_radian)],axis = 1)
+
+        # unit vectors pointing towards targets
+        towards_target_vectors = target_centers - centers
+        norms = np.linalg.norm(towards_target_vectors,axis = 1)
+        norms[norms == 0] = np.inf # a target on top of the ship is straight ahead
+
+        projections_on_ortnorm = (clockwise_ortnorm_directions * towards_target_vectors).sum(axis = 1) / norms
+
+        # hand readings to ships
+        for ship, target, projection_on_ortnorm in zip(ships, targets, projections_on_ortnorm.tolist()):
+            ship._radar_reading = (target, projection_on_ortnorm)
+
+class ShipIndex(object):
+    '''Snapshot of one side's ships for target queries, taken once per frame: positions,
+    hit points and engagement counts as arrays, plus a uniform grid over the (toroidal)
+    screen for nearest neighbour searches.'''
+
+    def __init__(self,
+                 ships,
+                 world_size,
+                 cell_size):
+
+        self.ships = ships
+        self.ship_rows = dict((ship, i) for i, ship in enumerate(ships))
+
+        # get ship attributes as arrays
+        self.centers = np.array([ship._center for ship in ships],dtype='float').reshape((-1,2))
+        self.hit_points = np.array([ship._hit_points for ship in ships],dtype='float')
+        self.engagements = np.zeros(len(ships),dtype='int')
+        self.alive = np.ones(len(ships),dtype='bool')
+
+        # build grid
+        self._world_size = np.array(world_size,dtype='float')
+        self._cell_size = cell_size
+        self._n_cols = max(int(np.ceil(world_size[0] / cell_size)),1)
+        self._n_rows = max(int(np.ceil(world_size[1] / cell_size)),1)
+
+        # the last column and row are narrower than a cell if the world size isn't a multiple of
+        # the cell size; paths across the seam can be shorter than their number of cells suggests
+        self._seam_deficit = max(self._n_cols * cell_size - world_size[0],
+                                 self._n_rows * cell_size - world_size[1],
+                                 0)
+
+        self._grid = {}
+
+        cells = self._get_cells(self.centers)
+
+        for i, cell in enumerate(map(tuple, cells.tolist())):
+            self._grid.setdefault(cell, []).append(i)
+
+    def get_distances(self,
+                      point,
+                      rows = None):
+        '''Returns the toroidal distances from the specified point to the ships at the
+        specified rows (all ships if not specified).'''
+
+        centers = self.centers if rows is None else self.centers[rows]
+
+        delta = centers - point
+        delta = (delta + self._world_size / 2) % self._world_size - self._world_size / 2
+
+        return np.hypot(delta[:,0], delta[:,1])
+
+    def get_distance_matrix(self,
+                            points,
+                            rows):
+        '''Returns the toroidal distances from each of the specified points (shape (n,2)) to
+        each of the ships at the specified rows as an array of shape (n, len(rows)).'''
+
+        delta = self.centers[rows][None,:,:] - points[:,None,:]
+        delta = (delta + self._world_size / 2) % self._world_size - self._world_size / 2
+
+        return np.hypot(delta[:,:,0], delta[:,:,1])
+
+    def get_nearest(self,
+                    point):
+        '''Returns the row of the nearest live ship to the specified point, or None if there are
+        no live ships. Searches the grid in rings of cells around the point's cell.'''
+
+        col, row = self._get_cells(np.array(point,dtype='float').reshape((1,2)))[0].tolist()
+
+        max_ring = max(self._n_cols, self._n_rows) // 2 + 1
+
+        best_row, best_distance = None, np.inf
+
+        for ring in range(max_ring + 1):
+            # stop once no cell of this ring can hold anything closer than the best so far. The
+            # ring - 1 cells in between include at most one partial cell at the seam
+            if best_row is not None and (ring - 1) * self._cell_size - self._seam_deficit > best_distance:
+                break
+
+            ring_rows = []
+
+            for cell in self._get_ring(col, row, ring):
+                ring_rows.extend(self._grid.get(cell, ()))
+
+            ring_rows = [ring_row for ring_row in ring_rows if self.alive[ring_row]]
+
+            if not ring_rows:
+                continue
+
+            distances = self.get_distances(point, ring_rows)
+            i = int(distances.argmin())
+
+            if distances[i] < best_distance:
+                best_row, best_distance = ring_rows[i], float(distances[i])
+
+        return best_row
+
+    def _get_cells(self,
+                   points):
+        '''Util function that returns the (wrapped) grid cells of an array of points.'''
+
+        cells = np.floor(points / self._cell_size).astype('int')
+        cells[:,0] %= self._n_cols
+        cells[:,1] %= self._n_rows
+
+        return cells
+
+    def _get_ring(self,
+                  col,
+                  row,
+                  ring):
+        '''Util function that returns the set of (wrapped) grid cells at Chebyshev distance
+        'ring' from the specified cell.'''
+
+        if ring == 0:
+            return {(col, row)}
+
+        cells = set()
+
+        for d in range(-ring, ring + 1):
+            cells.add(((col + d) % self._n_cols, (row - ring) % self._n_rows))
+            cells.add(((col + d) % self._n_cols, (row + ring) % self._n_rows))
+            cells.add(((col - ring) % self._n_cols, (row + d) % self._n_rows))
+            cells.add(((col + ring) % self._n_cols, (row + d) % self._n_rows))
+
+        return cells
+
+class TargetSelector(object):
+    '''Target acquisition service for AI controlled ships. Once per frame, it takes a snapshot
+    (ShipIndex) of every hostile ships group that is queried, which is then shared by all
+    queries of that frame. Supported policies:
+
+        'random': any live hostile ship (the original AIShipSprite behaviour)
+        'nearest': the nearest live hostile ship (toroidal distance)
+        'weakest': the live hostile ship with the fewest hit points; ties go to the nearest
+        'least_engaged': the live hostile ship targeted by the fewest ships; ties go to the nearest'''
+
+    policies = ('random','nearest','weakest','least_engaged')
+
+    def __init__(self,
+                 world_size,
+                 policy = 'nearest',
+                 cell_size = 128):
+
+        '''Arguments:
+
+            world_size: tuple (width, height) of the main screen the game is displayed on.
+            policy: target selection policy. See class docstring. Default is 'nearest'.
+            cell_size: edge length of one (square) grid cell in pixels. Default is 128.'''
+
+        if policy not in self.policies:
+            raise ValueError('Target policy must be one of ' + str(self.policies) + ', but is ' + str(policy))
+
+        self._world_size = world_size
+        self._policy = policy
+        self._cell_size = cell_size
+
+        # initialize per-frame indices, keyed by the id of the hostile ships group
+        self._indices = {}
+        self._engaged_ships = []
+
+        # initialize statistics
+        self.n_queries = 0
+        self.n_acquired = 0
+
+    def begin_frame(self,
+                    engaged_ships = ()):
+        '''Discards the previous frame's indices. 'engaged_ships' is an iterable of all ships
+        that might currently have a target; it is used to count engagements for the
+        'least_engaged' policy.'''
+
+        self._indices = {}
+        self._engaged_ships = list(engaged_ships) if self._policy == 'least_engaged' else []
+
+    def assign_targets(self,
+                       ships):
+        '''Batch query: acquires a target for every specified ship that has none. For the
+        'nearest' and 'weakest' policies, the distances between all seeking ships and all
+        hostile ships of a side are computed at once.'''
+
+        seekers = [ship for ship in ships if not ship._current_target and ship._hostile_ships_group]
+
+        if not seekers:
+            return
+
+        # 'random' and 'least_engaged' depend on earlier picks; run them one by one
+        if self._policy in ('random','least_engaged'):
+            for ship in seekers:
+                self.acquire_target(ship)
+
+            return
+
+        # group seekers by hostile ships group
+        seekers_by_group = {}
+
+        for ship in seekers:
+            seekers_by_group.setdefault(id(ship._hostile_ships_group), (ship._hostile_ships_group, []))[1].append(ship)
+
+        for hostile_ships_group, group_seekers in seekers_by_group.values():
+            index = self._get_index(hostile_ships_group)
+            live_rows = np.flatnonzero(index.alive)
+
+            if not len(live_rows):
+                continue
+
+            # toroidal distance matrix of shape (n_seekers, n_live_targets)
+            seeker_centers = np.array([ship._center for ship in group_seekers],dtype='float')
+            distances = index.get_distance_matrix(seeker_centers, live_rows)
+
+            if self._policy == 'nearest':
+                target_columns = distances.argmin(axis = 1)
+            else:
+                # weakest: penalize every hit point above the minimum more than any distance
+                hit_points = index.hit_points[live_rows]
+                target_columns = (distances + (hit_points - hit_points.min()) * (distances.max() + 1)).argmin(axis = 1)
+
+            for ship, target_column in zip(group_seekers, target_columns.tolist()):
+                self.n_queries += 1
+
+                target_row = int(live_rows[target_column])
+                target = index.ships[target_row]
+
+                # ships can be killed after the snapshot; fall back to single query then
+                if target._alive:
+                    index.engagements[target_row] += 1
+                    ship._current_target.add(target)
+                    self.n_acquired += 1
+                else:
+                    index.alive[target_row] = False
+                    self.acquire_target(ship)
+
+    def acquire_target(self,
+                       ship):
+        '''Selects a target for the specified ship from its hostile ships group according to
+        the selection policy and adds it to the ship's current target group. Returns the
+        target, or None if there is none.'''
+
+        self.n_queries += 1
+
+        hostile_ships_group = ship._hostile_ships_group
+
+        if not hostile_ships_group:
+            return None
+
+        index = self._get_index(hostile_ships_group)
+
+        # keep trying until a live target is found (ships can be killed after the snapshot)
+        while index.alive.any():
+            target_row = self._select(index, ship)
+            target = index.ships[target_row]
+
+            if target._alive:
+                index.engagements[target_row] += 1
+                ship._current_target.add(target)
+                self.n_acquired += 1
+
+                return target
+
+            index.alive[target_row] = False
+
+        return None
+
+    def _get_index(self,
+                   hostile_ships_group):
+        '''Util function that returns this frame's index for the specified group, building it
+        if needed.'''
+
+        index = self._indices.get(id(hostile_ships_group))
+
+        if index is None:
+            index = ShipIndex(hostile_ships_group.sprites(),
+                              self._world_size,
+                              self._cell_size)
+
+            # count current engagements if needed
+            for engaged_ship in self._engaged_ships:
+                for target in engaged_ship._current_target:
+                    if target in index.ship_rows:
+                        index.engagements[index.ship_rows[target]] += 1
+
+            self._indices[id(hostile_ships_group)] = index
+
+        return index
+
+    def _select(self,
+                index,
+                ship):
+        '''Util function that returns the row of the selected target in the index.'''
+
+        live_rows = np.flatnonzero(index.alive)
+
+        if self._policy == 'random':
+            return int(live_rows[randint(0,len(live_rows)-1)])
+
+        if self._policy == 'nearest':
+            return index.get_nearest(ship._center)
+
+        # 'weakest' and 'least_engaged': primary key from policy, secondary key distance
+        if self._policy == 'weakest':
+            primary_keys = index.hit_points[live_rows]
+        else:
+            primary_keys = index.engagements[live_rows]
+
+        distances = index.get_distances(ship._center, live_rows)
+
+        return int(live_rows[np.lexsort((distances, primary_keys))[0]])
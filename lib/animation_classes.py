@@ -14,11 +14,114 @@ Created on Sat Jun  2 14:00:12 2018
  sprite through time (like gun flashes, missile propulsion, engine fire etc.)'''
  
 #from pygame.sprite import Sprite, Group
+from pygame.sprite import Group
 from basic_sprite_class import BasicSprite
 from math import pi, sin, cos
  
 import numpy as np
 
+class AnimationTimeline(object):
+    '''Maps the number of frames an animation has been shown for to the index of the image
+    to show. Timelines only depend on the number of images, the frame rate and the seconds
+    per image, so animations share them (see get_shared) instead of building their own.'''
+    
+    # shared timelines by (number of images, frames per image)
+    _shared = {}
+    
+    def __init__(self,
+                 n_images,
+                 frames_per_image):
+        
+        '''Arguments:
+            
+            n_images: number of images in the animation sequence.
+            frames_per_image: number of frames each image is shown for (float).'''
+        
+        self.n_images = n_images
+        self.frames_per_image = frames_per_image
+        
+        # construct frame count intervals, where one interval ~= one image from animation sequence
+        self.lowers = np.linspace(0,(n_images-1)*frames_per_image,n_images).tolist() # get lower boundaries for intervals
+        self.uppers = np.linspace(frames_per_image,n_images*frames_per_image,n_images).tolist() # get upper boundaries for intervals
+        
+        # get first frame count after the first one that no longer maps to an image
+        self.end_frame = 2
+        
+        while self.get_image_index(self.end_frame) >= 0:
+            self.end_frame += 1
+        
+    @classmethod
+    def get_shared(cls,
+                   n_images,
+                   fps,
+                   seconds_per_image):
+        '''Returns the timeline shared by all animations with the specified number of images,
+        frame rate and seconds per image.'''
+        
+        frames_per_image = float(fps) * seconds_per_image # get frames per images
+        key = (n_images,frames_per_image)
+        
+        if key not in cls._shared:
+            cls._shared[key] = cls(n_images,frames_per_image)
+            
+        return cls._shared[key]
+        
+    def get_image_index(self,frames_passed):
+        '''Returns the index of the image to show after the specified number of frames, or -1
+        if the animation sequence is over. Takes constant time: the interval is computed rather
+        than searched for, and only it and its neighbours are checked, since the interval
+        boundaries may be off by a rounding error.'''
+        
+        lowers, uppers = self.lowers, self.uppers
+        
+        if frames_passed > uppers[-1]:
+            return -1
+        
+        image_index = int(frames_passed / self.frames_per_image)
+        
+        for i in (image_index - 1, image_index, image_index + 1):
+            if 0 <= i < self.n_images and lowers[i] < frames_passed <= uppers[i]:
+                return i
+            
+        return -1
+    
+class AnimationGroup(Group):
+    '''Sprite group that advances the frame counters of all its animations in one step per
+    update: the group counts its updates, and each animation reads its frame count off that
+    clock (relative to the update it started at) instead of incrementing its own.'''
+    
+    def __init__(self,
+                 *sprites):
+        
+        '''Arguments:
+            
+            *sprites: sprites to add to the group.'''
+        
+        self.n_updates = 0
+        
+        Group.__init__(self,*sprites)
+        
+    def add_internal(self,sprite,layer=None):
+        
+        Group.add_internal(self,sprite,layer)
+        
+        if isinstance(sprite,BasicAnimation):
+            sprite.set_frame_clock(self)
+            
+    def remove_internal(self,sprite):
+        
+        Group.remove_internal(self,sprite)
+        
+        if isinstance(sprite,BasicAnimation) and sprite._frame_clock is self:
+            sprite.set_frame_clock(None)
+            
+    def update(self,*args,**kwargs):
+        '''Advances the frame counters of all animations in the group, then updates its sprites.'''
+        
+        self.n_updates += 1
+        
+        Group.update(self,*args,**kwargs)
+
 class BasicAnimation(BasicSprite):
     '''Base class for animations used in game.'''
     
@@ -33,7 +136,9 @@ class BasicAnimation(BasicSprite):
                  speed = 0,
                  looping = False,
                  is_transparent = True,
-                 transparent_color = (255,255,255)):
+                 transparent_color = (255,255,255),
+                 kinematics_world = None,
+                 timer_wheel = None):
     
         '''Arguments:
             
@@ -56,7 +161,11 @@ class BasicAnimation(BasicSprite):
             transparent_color: tuple specifiying the color key considered as transparent if 'is_transparent'
                     is set to true. Default to (255,255,255), which corresponds to the color white.
             *groups: tuple of pygame Group objects. The sprite will add itself to each of these
-                    when initialized.'''
+                    when initialized.
+            kinematics_world: KinematicsWorld object that will integrate the animation's positional
+                    attributes. Default is None.
+            timer_wheel: TimerWheel object. If specified, animations that aren't looping register
+                    their expiry with the wheel when they start. Default is None.'''
                     
         BasicSprite.__init__(self,
                              fps,
@@ -67,50 +176,113 @@ class BasicAnimation(BasicSprite):
                              angle=angle,
                              speed=speed,
                              is_transparent=is_transparent,
-                             transparent_color=transparent_color)
+                             transparent_color=transparent_color,
+                             kinematics_world=kinematics_world)
         
         # if animation looping?
         self.is_looping = looping
         
-        # initialize frame counter
-        self.frames_passed = 1
+        # initialize frame counter, unless the animation already joined an AnimationGroup's
+        # frame clock when it was added to its groups
+        if '_frame_clock' not in self.__dict__:
+            self._frame_clock = None
+            self._frames_passed = 1
         
-        # set sequence control attributes
-        frames_per_image = float(self._fps) * seconds_per_image # get frames per images
+        # get the shared timeline mapping frame counts to images of the animation sequence
+        self.timeline = AnimationTimeline.get_shared(len(original_images),
+                                                     self._fps,
+                                                     seconds_per_image)
         
-        # construct list of frame count intervals, where one interval ~= one image from animation sequence
-        n_images = len(original_images) # get number of images
-        lowers = np.linspace(0,(n_images-1)*frames_per_image,n_images) # get lower boundaries for intervals
-        uppers = np.linspace(frames_per_image,n_images*frames_per_image,n_images) # get upper boundaries for intervals
-                            
-        self.frame_image_intervals = [(lower,upper) for (lower,upper) in zip(lowers, # make list of intervals
-                                                                              uppers)]     
-
+        self._schedule_expiry(timer_wheel)
         
-    def get_interval_index(self,value,intervals):
-        '''Helper function that takes a value and a list of intervals. Determines
-        which interval the value lies in and returns the list index of that interval.
-        If value lies in none of the intervals, returns False.'''
+    def reset(self,
+              fps,
+              screen,
+              original_images,
+              seconds_per_image,
+              *groups,
+              center = np.zeros(2),
+              angle = 0,
+              speed = 0,
+              looping = False,
+              is_transparent = True,
+              transparent_color = (255,255,255),
+              kinematics_world = None,
+              timer_wheel = None):
+        '''Sets a killed animation up again with the specified arguments (see __init__), so
+        that it can be reused (see SpritePool).'''
         
-        for i,(lower,upper) in enumerate(intervals):
-            if lower < value <= upper:
-                
-                return i + 1
+        # restart frame counter; joining an AnimationGroup puts it on the group's clock
+        self._frame_clock = None
+        self._frames_passed = 1
+        
+        BasicSprite.reset(self,
+                          fps,
+                          screen,
+                          original_images,
+                          *groups,
+                          center=center,
+                          angle=angle,
+                          speed=speed,
+                          is_transparent=is_transparent,
+                          transparent_color=transparent_color,
+                          kinematics_world=kinematics_world)
+        
+        self.is_looping = looping
+        self.timeline = AnimationTimeline.get_shared(len(original_images),
+                                                     self._fps,
+                                                     seconds_per_image)
+        
+        self._schedule_expiry(timer_wheel)
+        
+    def _schedule_expiry(self,timer_wheel):
+        '''Util function that registers the expiry of an animation that isn't looping with the
+        timer wheel, if any. The frame counter starts at 1 and goes up by one per update, so the
+        animation ends in the update 'end_frame - 1' frames from now.'''
+        
+        if timer_wheel is not None and not self.is_looping:
+            self.expire_in(timer_wheel,
+                           self.timeline.end_frame - 1)
             
-        return False
+    @property
+    def frames_passed(self):
+        '''Number of frames the current run of the animation has been shown for. Read off the
+        frame clock of the AnimationGroup the animation belongs to, if any.'''
+        
+        if self._frame_clock is None:
+            return self._frames_passed
+        
+        return self._frame_clock.n_updates - self._frames_offset
+    
+    @frames_passed.setter
+    def frames_passed(self,frames_passed):
+        
+        if self._frame_clock is None:
+            self._frames_passed = frames_passed
+        else:
+            self._frames_offset = self._frame_clock.n_updates - frames_passed
+            
+    def set_frame_clock(self,animation_group):
+        '''Util function called by AnimationGroup when the animation is added to (or, with None,
+        removed from) it. The animation then counts its frames on the group's clock.'''
+        
+        frames_passed = self.frames_passed if '_frame_clock' in self.__dict__ else 1
+        
+        self._frame_clock = animation_group
+        self.frames_passed = frames_passed
         
     def update(self):
         '''base class update method plus checks & handling of image sequence & animation lifetime.'''
                 
-        # update frame counter
-        self.frames_passed += 1
+        # update frame counter; animations in an AnimationGroup have been advanced by the group
+        if self._frame_clock is None:
+            self._frames_passed += 1
         
         # get current image index
-        image_number = self.get_interval_index(self.frames_passed,
-                                               self.frame_image_intervals)
+        image_index = self.timeline.get_image_index(self.frames_passed)
         
-        # if index is 'False', the time is up; 
-        if not image_number:
+        # if index is negative, the time is up; 
+        if image_index < 0:
             if not self.is_looping:
                 # animation is not of looping type and is out of type -> terminate
                 self.kill()
@@ -120,7 +292,7 @@ class BasicAnimation(BasicSprite):
                 self._image_index = 0
         # actual index is returned; perform base class update on appropriate image sequence element
         else:
-            self._image_index = image_number - 1
+            self._image_index = image_index
         
         # call base class update
         BasicSprite.update(self)
@@ -150,7 +322,8 @@ class TrackingAnimation(BasicAnimation):
                  looping = False,
                  dynamic_angle = True,
                  is_transparent = True,
-                 transparent_color = (255,255,255)):
+                 transparent_color = (255,255,255),
+                 timer_wheel = None):
     
         '''Arguments:
             
@@ -173,7 +346,11 @@ class TrackingAnimation(BasicAnimation):
             transparent_color: tuple specifiying the color key considered as transparent if 'is_transparent'
                     is set to true. Default to (255,255,255), which corresponds to the color white.
             *groups: tuple of pygame Group objects. The sprite will add itself to each of these
-                    when initialized.'''
+                    when initialized.
+            timer_wheel: see BasicAnimation.
+                    
+        If the tracked sprite has an AttachmentRegistry, the animation is attached to it: the
+        registry positions the animation and kills it along with the tracked sprite.'''
         
         # Note that speed and angle attributes inherited from BasicSprite
         # defualt to 0 if not passed to initializer
@@ -185,7 +362,52 @@ class TrackingAnimation(BasicAnimation):
                                  *groups,
                                  looping = looping,
                                  is_transparent = is_transparent,
-                                 transparent_color = transparent_color)
+                                 transparent_color = transparent_color,
+                                 timer_wheel = timer_wheel)
+        
+        self._track(tracked_sprite,
+                    original_offset,
+                    dynamic_angle)
+        
+    def reset(self,
+              fps,
+              screen,
+              original_images,
+              seconds_per_image,
+              tracked_sprite,
+              original_offset,
+              *groups,
+              center = np.zeros(2),
+              angle = 0,
+              speed = 0,
+              looping = False,
+              dynamic_angle = True,
+              is_transparent = True,
+              transparent_color = (255,255,255),
+              timer_wheel = None):
+        '''Sets a killed animation up again with the specified arguments (see __init__), so
+        that it can be reused (see SpritePool).'''
+        
+        BasicAnimation.reset(self,
+                             fps,
+                             screen,
+                             original_images,
+                             seconds_per_image,
+                             *groups,
+                             looping = looping,
+                             is_transparent = is_transparent,
+                             transparent_color = transparent_color,
+                             timer_wheel = timer_wheel)
+        
+        self._track(tracked_sprite,
+                    original_offset,
+                    dynamic_angle)
+        
+    def _track(self,
+               tracked_sprite,
+               original_offset,
+               dynamic_angle):
+        '''Util function that attaches the animation to the tracked sprite.'''
         
         # attach dynamic angle attribute
         self._dynamic_angle = dynamic_angle
@@ -196,12 +418,26 @@ class TrackingAnimation(BasicAnimation):
         # attach original offsets
         self._original_offset = original_offset
         
+        # if the tracked sprite has an attachment registry, let it do the tracking
+        self._attachment_registry = getattr(tracked_sprite,'_attachment_registry',None)
+        
+        if self._attachment_registry is not None:
+            self._attachment_registry.attach(self,
+                                             tracked_sprite,
+                                             original_offset,
+                                             dynamic_angle = dynamic_angle)
         
     def update(self):
         '''Updates the animations position and orientation based on tracked sprite.
         Then updates animation's rect and image attributes accordingly through the base
         class update().'''
         
+        # attached animations have been positioned by the attachment registry
+        if self._attachment_registry is not None:
+            BasicAnimation.update(self)
+            
+            return
+        
         # first check if tracked ship is still alive; if not, kill self
         if not self._tracked_sprite._alive:
             self.kill()
@@ -217,6 +453,15 @@ class TrackingAnimation(BasicAnimation):
         # self._speed == 0
         BasicAnimation.update(self) 
         
+    def kill(self):
+        '''Base class kill method plus detaching from the attachment registry.'''
+        
+        if self._attachment_registry is not None:
+            self._attachment_registry.detach(self,
+                                             self._tracked_sprite)
+            
+        BasicAnimation.kill(self)
+        
     def _get_rotated_offset(self):
         '''Rotate and return the original offset.'''
         
@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the asset build pipeline of the game STAR WARS DOGFIGHTER, which
+replaces the old meta_yaml_editor.py script. The skin and animation definitions below are
+validated against the files in ./graphics and ./sounds (image and sound paths, gun and
+engine offsets, fire modes and seconds per image), written to the runtime meta data files
+in ./meta and, together with derived data precomputed for every skin (its rotated images
+for every angle bucket and its collision bounds), packed into an asset bundle the game can
+start from (see asset_bundle_class.py). Collision masks are not stored, as pygame can not
+create masks from buffers; they are still built on first use, from the prebuilt rotations.
+
+A manifest of content hashes in the build directory makes repeated builds only recompute
+the derived data of skins whose images changed, and skip writing the bundle if none of its
+inputs changed.
+
+Example (run from the lib directory, like game_class.py):
+
+    python asset_build_pipeline.py --compare
+    python game_class.py --asset-bundle ../build/asset_bundle.bin'''
+
+import os
+import json
+import hashlib
+import argparse
+
+import yaml
+import numpy as np
+import pygame as pg
+
+from rotation_cache_class import RotationCache
+from collision_classes import CollisionBounds
+from asset_registry_class import AssetRegistry
+from asset_bundle_class import BUNDLED_IMAGES, BUNDLE_VERSION, PIXEL_FORMAT, BUILD_DIR, MANIFEST_NAME, BUNDLE_NAME, build_asset_bundle, get_prebuilt_bundle
+
+#----------------------------------------------
+# [1] Animation definitions
+#----------------------------------------------
+
+# each entry in the animation definitions needs:
+#   - sound: path to sound file (optional)
+#   - image_paths: list of paths to all images used to create sequence
+#   - spi: seconds per image
+
+ANIMATION_DEFINITIONS = {}
+
+# red laser muzzle flash animation
+ANIMATION_DEFINITIONS['red'] = {'image_paths':['./graphics/red_muzzle_flash/red_muzzle_flash' + str(i+1) + '.bmp' for i in range(6)],
+                                'sound':'./sounds/missile.wav',
+                                'spi':0.02}
+
+# green laser muzzle flash animation
+ANIMATION_DEFINITIONS['green'] = {'image_paths':['./graphics/green_muzzle_flash/green_muzzle_flash' + str(i+1) + '.bmp' for i in range(6)],
+                                  'sound':'./sounds/missile.wav',
+                                  'spi':0.02}
+
+# explosion animation
+ANIMATION_DEFINITIONS['explosion'] = {'image_paths':['./graphics/explosion/explosion' + str(i+1) + '.bmp' for i in range(9)],
+                                      'sound':'./sounds/explosion.wav',
+                                      'spi':0.1}
+
+# engine flames
+ANIMATION_DEFINITIONS['engine'] = {'image_paths':['./graphics/engine_flame/engine_flame' + str(i+1) + '.bmp' for i in range(4)],
+                                   'spi':0.1}
+
+#----------------------------------------------
+# [2] Sprite skin definitions
+#----------------------------------------------
+
+# each ship skin entry needs:
+#   - image_paths: list of paths to the skin's images
+#   - gun_offsets: list of [x,y] offsets of the laser cannons from the image center (at angle 0)
+#   - engine_offsets: list of [x,y] offsets of the engine flames from the image center (at angle 0)
+#   - fire_modes: list of fire modes. Each fire mode is a list of groups of gun indices; the
+#       groups fire in turn, all guns of a group at once. Every fire mode uses every gun once
+# laser beam skins only need image_paths
+
+SKIN_DEFINITIONS = {}
+
+# awing skin
+SKIN_DEFINITIONS['awing'] = {'image_paths':['./graphics/sprite_skins/awing.bmp'],
+                             'gun_offsets':[[9,-15],
+                                            [9,15]],
+                             'engine_offsets':[[-20,-7],
+                                               [-20,7]],
+                             'fire_modes':[[[0,1]], # coupled
+                                           [[0], # single
+                                            [1]]]}
+
+# xwing skin
+SKIN_DEFINITIONS['xwing'] = {'image_paths':['./graphics/sprite_skins/xwing.bmp'],
+                             'gun_offsets':[[13,-18],
+                                            [13,18],
+                                            [14,-16],
+                                            [14,16]],
+                             'engine_offsets':[[-25,-6],
+                                               [-25,6]],
+                             'fire_modes':[[[0,1,2,3]], # all
+                                           [[0,1],
+                                            [2,3]], # coupled
+                                           [[0], # single
+                                            [1],
+                                            [2],
+                                            [3]]]}
+
+# tie fighter skin
+SKIN_DEFINITIONS['tiefighter'] = {'image_paths':['./graphics/sprite_skins/tiefighter.bmp'],
+                                  'gun_offsets':[[9,-2],
+                                                 [9,3]],
+                                  'engine_offsets':[[-11,0]],
+                                  'fire_modes':[[[0,1]], # coupled
+                                                [[0], # single
+                                                 [1]]]}
+
+# tie interceptor skin
+SKIN_DEFINITIONS['tieinterceptor'] = {'image_paths':['./graphics/sprite_skins/tieinterceptor.bmp'],
+                                      'gun_offsets':[[22,-17],
+                                                     [22,17],
+                                                     [22,-13],
+                                                     [22,13]],
+                                      'engine_offsets':[[-18,0]],
+                                      'fire_modes':[[[0,1,2,3]], # all
+                                                    [[0,1],
+                                                     [2,3]], # coupled
+                                                    [[0], # single
+                                                     [1],
+                                                     [2],
+                                                     [3]]]}
+
+# hornet skin
+SKIN_DEFINITIONS['hornet'] = {'image_paths':['./graphics/sprite_skins/hornet.bmp'],
+                              'gun_offsets':[[6,-2],
+                                             [6,3]],
+                              'engine_offsets':[[-20,0]],
+                              'fire_modes':[[[0,1]], # coupled
+                                            [[0], # single
+                                             [1]]]}
+
+# f35 skin
+SKIN_DEFINITIONS['f35'] = {'image_paths':['./graphics/sprite_skins/f35.bmp'],
+                           'gun_offsets':[[6,-2],
+                                          [6,3]],
+                           'engine_offsets':[[-17,0]],
+                           'fire_modes':[[[0,1]], # coupled
+                                         [[0], # single
+                                          [1]]]}
+
+# red laser beam skin
+SKIN_DEFINITIONS['red'] = {'image_paths':['./graphics/sprite_skins/redlaser.bmp']}
+
+# green laser beam skin
+SKIN_DEFINITIONS['green'] = {'image_paths':['./graphics/sprite_skins/greenlaser.bmp']}
+
+#----------------------------------------------
+# [3] Build pipeline
+#----------------------------------------------
+
+# version of the derived data; bump to rebuild all of it after changing how it is computed
+DERIVED_DATA_VERSION = 1
+
+# runtime meta data files; the build outputs' paths are defined in asset_bundle_class.py
+SKINS_META_PATH = './meta/sprite_skins_meta_data.yaml'
+ANIMATIONS_META_PATH = './meta/animations_meta_data.yaml'
+
+def validate_definitions(skin_definitions,
+                         animation_definitions,
+                         graphics_dir = './graphics'):
+    '''Checks the specified skin and animation definitions. Returns a list of errors (missing
+    or unreadable files, malformed offsets, fire modes that don't use every gun exactly once,
+    non-positive seconds per image) and a list of warnings (offsets outside the skin's image,
+    images in the graphics directory that are not used anywhere).'''
+
+    errors, warnings = [], []
+
+    def check_files(name, paths):
+        for path in paths:
+            if not os.path.isfile(path):
+                errors.append(name + ': file ' + str(path) + ' does not exist')
+
+    # animations
+    for name, definition in sorted(animation_definitions.items()):
+        if not definition.get('image_paths'):
+            errors.append('animation ' + name + ': no image paths')
+
+        check_files('animation ' + name, definition.get('image_paths', []))
+
+        if 'sound' in definition:
+            check_files('animation ' + name, [definition['sound']])
+
+        if not isinstance(definition.get('spi'), (int, float)) or definition['spi'] <= 0:
+            errors.append('animation ' + name + ': seconds per image must be a positive number, but is ' + str(definition.get('spi')))
+
+    # skins
+    for name, definition in sorted(skin_definitions.items()):
+        if not definition.get('image_paths'):
+            errors.append('skin ' + name + ': no image paths')
+            continue
+
+        check_files('skin ' + name, definition['image_paths'])
+
+        # offsets must be [x,y] pairs of numbers, and should lie on the skin's first image
+        image_size = None
+
+        if os.path.isfile(definition['image_paths'][0]):
+            try:
+                image_size = pg.image.load(definition['image_paths'][0]).get_size()
+            except pg.error as load_error:
+                errors.append('skin ' + name + ': ' + str(load_error))
+
+        for offsets_name in ('gun_offsets','engine_offsets'):
+            for i, offset in enumerate(definition.get(offsets_name, [])):
+                if not (isinstance(offset, (list, tuple)) and len(offset) == 2 and all(isinstance(value, (int, float)) for value in offset)):
+                    errors.append('skin ' + name + ': ' + offsets_name + '[' + str(i) + '] must be an [x,y] pair of numbers, but is ' + str(offset))
+                elif image_size is not None and (abs(offset[0]) > image_size[0] / 2 or abs(offset[1]) > image_size[1] / 2):
+                    warnings.append('skin ' + name + ': ' + offsets_name + '[' + str(i) + '] ' + str(offset) + ' lies outside the ' + 'x'.join(map(str, image_size)) + ' image')
+
+        # fire modes need guns, and every fire mode uses every gun exactly once
+        n_guns = len(definition.get('gun_offsets', []))
+
+        if 'gun_offsets' in definition and not definition.get('fire_modes'):
+            errors.append('skin ' + name + ': guns but no fire modes')
+
+        for i, fire_mode in enumerate(definition.get('fire_modes', [])):
+            gun_indices = [gun_index for gun_group in fire_mode for gun_index in gun_group]
+
+            if not all(gun_group for gun_group in fire_mode) or sorted(gun_indices) != list(range(n_guns)):
+                errors.append('skin ' + name + ': fire_modes[' + str(i) + '] ' + str(fire_mode) + ' must use each of the ' + str(n_guns) + ' guns exactly once, in non-empty groups')
+
+    # unused images
+    used_paths = set(os.path.normpath(path) for definitions in (skin_definitions, animation_definitions)
+                     for definition in definitions.values() for path in definition.get('image_paths', []))
+    used_paths.update(os.path.normpath(path) for path, _ in BUNDLED_IMAGES)
+
+    for directory, _, file_names in sorted(os.walk(graphics_dir)):
+        for file_name in sorted(file_names):
+            path = os.path.join(directory, file_name)
+
+            if file_name.lower().endswith('.bmp') and os.path.normpath(path) not in used_paths:
+                warnings.append('image ' + path + ' is not used by any skin or animation')
+
+    return errors, warnings
+
+def get_content_hash(*parts):
+    '''Returns the hex SHA-256 hash of the specified parts. File paths are hashed by their
+    contents, all other parts by their JSON representation.'''
+
+    content_hash = hashlib.sha256()
+
+    for part in parts:
+        if isinstance(part, str) and os.path.isfile(part):
+            with open(part,'rb') as part_file:
+                content_hash.update(part_file.read())
+        else:
+            content_hash.update(json.dumps(part, sort_keys = True).encode('utf-8'))
+
+    return content_hash.hexdigest()
+
+def build_derived_data(images,
+                       angle_resolution):
+    '''Returns the derived data of a skin with the specified (converted) images: for each image,
+    the list of its rotated versions per angle bucket as (width, height, BGRA pixel bytes),
+    and the collision bounds values of its first image.'''
+
+    # rotate exactly like the sprites' rotation caches do
+    rotation_cache = RotationCache(images,
+                                   angle_resolution = angle_resolution,
+                                   max_bytes = np.inf)
+    rotation_cache.prebuild()
+
+    rotations = []
+
+    for image_index in range(len(images)):
+        rotations.append([])
+
+        for angle_bucket in range(rotation_cache.n_buckets):
+            rotated_image = rotation_cache.get_by_bucket(image_index, angle_bucket).image
+            rotations[-1].append(rotated_image.get_size() + (pg.image.tobytes(rotated_image, PIXEL_FORMAT),))
+
+    return rotations, CollisionBounds(images[0]).to_values()
+
+def save_derived_data(derived_path,
+                      rotations,
+                      bounds_values):
+    '''Writes a skin's derived data (see build_derived_data) to the specified .npz file.'''
+
+    sizes = np.array([[frame[:2] for frame in image_rotations] for image_rotations in rotations], dtype = 'int32')
+    pixels = np.frombuffer(b''.join(frame[2] for image_rotations in rotations for frame in image_rotations), dtype = 'uint8')
+
+    np.savez(derived_path,
+             sizes = sizes,
+             pixels = pixels,
+             bounds = [bounds_values['radius']] + bounds_values['half_extents'] + bounds_values['offset'])
+
+def load_derived_data(derived_path):
+    '''Reads a skin's derived data written by save_derived_data.'''
+
+    derived_data = np.load(derived_path)
+    sizes = derived_data['sizes']
+    pixels = derived_data['pixels'].tobytes()
+
+    rotations = []
+    offset = 0
+
+    for image_sizes in sizes:
+        rotations.append([])
+
+        for width, height in image_sizes:
+            rotations[-1].append((int(width), int(height), pixels[offset:offset + width * height * 4]))
+            offset += width * height * 4
+
+    radius, half_width, half_height, offset_x, offset_y = derived_data['bounds'].tolist()
+
+    return rotations, {'radius': radius,
+                       'half_extents': [half_width, half_height],
+                       'offset': [offset_x, offset_y]}
+
+def write_if_changed(path,
+                     text):
+    '''Writes the specified text to the specified file, unless it already holds exactly that
+    text. Returns True if the file was written.'''
+
+    if os.path.isfile(path):
+        with open(path,'r') as existing_file:
+            if existing_file.read() == text:
+                return False
+
+    with open(path,'w') as new_file:
+        new_file.write(text)
+
+    return True
+
+def build_assets(skin_definitions = SKIN_DEFINITIONS,
+                 animation_definitions = ANIMATION_DEFINITIONS,
+                 build_dir = BUILD_DIR,
+                 angle_resolution = 1,
+                 force = False,
+                 verbose = True):
+    '''Validates the definitions, writes the runtime meta data files and builds the asset
+    bundle with the prebuilt derived data of all skins in the build directory. Only the
+    derived data of skins whose inputs changed since the last build is recomputed (all of it
+    if 'force' is set). Raises a ValueError listing all errors if the definitions are invalid.
+    Returns a dictionary with the numbers of rebuilt and reused skins and whether the meta
+    data and bundle were written.'''
+
+    def log(message):
+        if verbose:
+            print(message)
+
+    # validate definitions
+    errors, warnings = validate_definitions(skin_definitions,
+                                            animation_definitions)
+
+    for warning in warnings:
+        log('Warning: ' + warning)
+
+    if errors:
+        raise ValueError('Invalid asset definitions:\n' + '\n'.join(errors))
+
+    # write runtime meta data
+    stats = {'meta_data_written': write_if_changed(SKINS_META_PATH, yaml.dump(skin_definitions, default_flow_style = None)),
+             'rebuilt_skins': 0,
+             'reused_skins': 0,
+             'bundle_written': False}
+
+    stats['meta_data_written'] |= write_if_changed(ANIMATIONS_META_PATH, yaml.dump(animation_definitions, default_flow_style = None))
+
+    # load previous manifest
+    os.makedirs(build_dir, exist_ok = True)
+    manifest_path = os.path.join(build_dir, MANIFEST_NAME)
+    bundle_path = os.path.join(build_dir, BUNDLE_NAME)
+
+    if os.path.isfile(manifest_path) and not force:
+        with open(manifest_path,'r') as manifest_file:
+            manifest = json.load(manifest_file)
+    else:
+        manifest = {'skins': {}}
+
+    # images are converted to the display's pixel format, so set the display mode first
+    pg.init()
+
+    if pg.display.get_surface() is None:
+        pg.display.set_mode((1,1))
+
+    assets = AssetRegistry(SKINS_META_PATH,
+                           ANIMATIONS_META_PATH)
+
+    # get derived data of all skins; reuse what was built from the same inputs before
+    skin_entries = {}
+    rotations = {}
+    collision_bounds = {}
+
+    for name, definition in sorted(skin_definitions.items()):
+        skin_hash = get_content_hash(DERIVED_DATA_VERSION,
+                                     pg.version.ver,
+                                     angle_resolution,
+                                     *definition['image_paths'])
+        derived_path = os.path.join(build_dir, 'derived_' + name + '.npz')
+        previous_entry = manifest['skins'].get(name)
+
+        if previous_entry is not None and previous_entry['hash'] == skin_hash and os.path.isfile(derived_path):
+            skin_rotations, bounds_values = load_derived_data(derived_path)
+            stats['reused_skins'] += 1
+        else:
+            log('Building derived data of skin ' + name)
+            skin_rotations, bounds_values = build_derived_data(assets.get_images(definition['image_paths']),
+                                                               angle_resolution)
+            save_derived_data(derived_path, skin_rotations, bounds_values)
+            stats['rebuilt_skins'] += 1
+
+        skin_entries[name] = {'hash': skin_hash,
+                              'derived_path': derived_path}
+
+        for image_path, image_rotations in zip(definition['image_paths'], skin_rotations):
+            rotations[image_path] = (angle_resolution, image_rotations)
+
+        collision_bounds[definition['image_paths'][0]] = bounds_values
+
+    # remove derived data of skins that no longer exist
+    for name, previous_entry in manifest['skins'].items():
+        if name not in skin_entries and os.path.isfile(previous_entry['derived_path']):
+            os.remove(previous_entry['derived_path'])
+
+    # build bundle if any of its inputs changed
+    source_paths = sorted(set([SKINS_META_PATH, ANIMATIONS_META_PATH] +
+                              [path for definition in skin_definitions.values() for path in definition['image_paths']] +
+                              [path for definition in animation_definitions.values() for path in definition['image_paths'] + [definition.get('sound')] if path] +
+                              [path for path, _ in BUNDLED_IMAGES]))
+
+    bundle_hash = get_content_hash(BUNDLE_VERSION,
+                                   [skin_entries[name]['hash'] for name in sorted(skin_entries)],
+                                   source_paths,
+                                   *source_paths)
+
+    if manifest.get('bundle_hash') != bundle_hash or not os.path.isfile(bundle_path):
+        log('Building asset bundle ' + bundle_path)
+        build_asset_bundle(bundle_path,
+                           assets,
+                           rotations = rotations,
+                           collision_bounds = collision_bounds)
+        stats['bundle_written'] = True
+    else:
+        # mark unchanged bundle as up to date, so that get_prebuilt_bundle keeps using it even
+        # if some of its source files have been touched since it was written
+        os.utime(bundle_path)
+
+    # write manifest
+    with open(manifest_path,'w') as manifest_file:
+        json.dump({'skins': skin_entries,
+                   'bundle_hash': bundle_hash,
+                   'source_paths': source_paths},
+                  manifest_file,
+                  indent = 2,
+                  sort_keys = True)
+
+    return stats
+
+def main():
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description = 'STAR WARS DOGFIGHTER asset build pipeline')
+    parser.add_argument('--angle-resolution',
+                        type = float,
+                        default = 1,
+                        help = 'width of the angle buckets (in degrees) to prebuild rotated images for')
+    parser.add_argument('--force',
+                        action = 'store_true',
+                        help = 'rebuild all derived data, even if its inputs did not change')
+    parser.add_argument('--check',
+                        action = 'store_true',
+                        help = 'only validate the definitions')
+    parser.add_argument('--compare',
+                        action = 'store_true',
+                        help = 'report the game startup time with the loose files and with the bundle after building')
+    parser.add_argument('--repeats',
+                        type = int,
+                        default = 5,
+                        help = 'number of game startups per asset source when comparing')
+    args = parser.parse_args()
+
+    # the pipeline never opens a window
+    os.environ.setdefault('SDL_VIDEODRIVER','dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER','dummy')
+
+    # make sure directory is repo head
+    os.chdir('..')
+
+    # angle resolutions are ints unless they need to be floats, like in the game
+    angle_resolution = int(args.angle_resolution) if args.angle_resolution == int(args.angle_resolution) else args.angle_resolution
+
+    if args.check:
+        errors, warnings = validate_definitions(SKIN_DEFINITIONS,
+                                                ANIMATION_DEFINITIONS)
+
+        print('\n'.join(['Error: ' + error for error in errors] + ['Warning: ' + warning for warning in warnings]) or 'Definitions are valid')
+    else:
+        stats = build_assets(angle_resolution = angle_resolution,
+                             force = args.force)
+
+        print('Rebuilt derived data of ' + str(stats['rebuilt_skins']) + ' skins, reused ' + str(stats['reused_skins']) +
+              '; meta data ' + ('written' if stats['meta_data_written'] else 'unchanged') +
+              ', bundle ' + ('written' if stats['bundle_written'] else 'unchanged'))
+
+        # compare startup times
+        if args.compare:
+            from game_class import Game
+
+            for asset_source, asset_bundle in (('loose files', None), ('bundle', get_prebuilt_bundle())):
+                startup_times = [Game(headless = True, asset_bundle = asset_bundle).startup_time for i in range(args.repeats)]
+
+                print('Startup time from ' + asset_source + ': ' + '{:.1f}'.format(min(startup_times) * 1000) +
+                      ' ms (best of ' + str(args.repeats) + ')')
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the AssetBundle class used in the game STAR WARS DOGFIGHTER, and the
+function that writes asset bundles. A bundle packs the skins and animations meta data and
+all the game's images and sounds into one file: a small header with the meta data and an
+index, followed by the raw pixel buffers of all images in the display's pixel format (as
+returned by the AssetRegistry) and the sound files' contents. Bundles written by the asset
+build pipeline also hold prebuilt rotated images and collision bounds of the skins. The bundle is memory mapped
+when opened, and its images are pygame Surfaces created on the mapped pixel buffers, so
+loading them involves no decoding and, if the display's pixel format matches the bundle's
+(as it does for the common 32 bit display formats), no copying either. Bundles are built
+by the asset build pipeline (see asset_build_pipeline.py) into the build directory, where
+the game finds them with get_prebuilt_bundle.'''
+
+import os
+import io
+import json
+import mmap
+import struct
+
+import pygame as pg
+
+# images used by the game that are not part of any skin or animation: path, transparent
+BUNDLED_IMAGES = (('./graphics/misc/star_wars_background_24bit.bmp', False),
+                  ('./graphics/misc/player_frame.bmp', True),
+                  ('./graphics/misc/ally_frame.bmp', True),
+                  ('./graphics/misc/hostile_frame.bmp', True))
+
+# file signature, format version and layout of the bundle's preamble (signature, version,
+# header length); the JSON header follows right after
+BUNDLE_SIGNATURE = b'SWDFBNDL'
+BUNDLE_VERSION = 2
+PREAMBLE_FORMAT = '<8sII'
+
+# byte order of the pixel buffers, and the alignment of every buffer in the file
+PIXEL_FORMAT = 'BGRA'
+BUFFER_ALIGNMENT = 64
+
+# build directory of the asset build pipeline, and the names of its manifest and bundle files
+BUILD_DIR = './build'
+MANIFEST_NAME = 'manifest.json'
+BUNDLE_NAME = 'asset_bundle.bin'
+
+class AssetBundle(object):
+    '''Read-only, memory mapped asset bundle. Gives the bundled meta data, images and sounds
+    by their original paths.'''
+
+    def __init__(self,
+                 bundle_path):
+
+        '''Arguments:
+
+            bundle_path: path to a bundle file written by build_asset_bundle.'''
+
+        self.bundle_path = bundle_path
+
+        # map file. Pages are copy-on-write, so surfaces on the mapped buffers can be drawn on
+        # without changing the file
+        with open(bundle_path,'rb') as bundle_file:
+            self._mmap = mmap.mmap(bundle_file.fileno(), 0, access = mmap.ACCESS_COPY)
+
+        self._buffer = memoryview(self._mmap)
+
+        # read preamble and header
+        preamble_size = struct.calcsize(PREAMBLE_FORMAT)
+        signature, version, header_size = struct.unpack_from(PREAMBLE_FORMAT, self._buffer)
+
+        if signature != BUNDLE_SIGNATURE or version != BUNDLE_VERSION:
+            raise ValueError(str(bundle_path) + ' is not an asset bundle of version ' + str(BUNDLE_VERSION))
+
+        header = json.loads(bytes(self._buffer[preamble_size:preamble_size + header_size]).decode('utf-8'))
+        self._data = self._buffer[get_data_offset(header_size):]
+
+        self.skins_meta_data = header['skins_meta_data']
+        self.animations_meta_data = header['animations_meta_data']
+        self._image_index = dict(((os.path.normpath(entry['path']), entry['transparent']), entry) for entry in header['images'])
+        self._sound_index = dict((os.path.normpath(entry['path']), entry) for entry in header['sounds'])
+        self._rotation_index = dict((os.path.normpath(entry['path']), entry) for entry in header['rotations'])
+        self._collision_bounds = dict((os.path.normpath(path), values) for path, values in header['collision_bounds'].items())
+
+        # initialize statistics
+        self.n_images_copied = 0
+
+    def has_image(self,
+                  image_path,
+                  transparent = True):
+        '''Returns True if the bundle holds the specified image, False otherwise.'''
+
+        return (os.path.normpath(image_path), transparent) in self._image_index
+
+    def get_image(self,
+                  image_path,
+                  transparent = True):
+        '''Returns the specified image as a new Surface on the bundle's pixel buffer, with
+        per-pixel alpha if it is transparent. If the display's pixel format differs from the
+        bundle's, the surface is converted (copied) to it.'''
+
+        return self._get_surface(self._image_index[(os.path.normpath(image_path), transparent)],
+                                 transparent)
+
+    def has_rotations(self,
+                      image_path,
+                      angle_resolution):
+        '''Returns True if the bundle holds prebuilt rotated versions of the specified
+        (transparent) image for the specified angle resolution, False otherwise.'''
+
+        entry = self._rotation_index.get(os.path.normpath(image_path))
+
+        return entry is not None and entry['angle_resolution'] == angle_resolution
+
+    def get_rotation(self,
+                     image_path,
+                     angle_bucket):
+        '''Returns the prebuilt rotated version of the specified (transparent) image for the
+        specified angle bucket as a new Surface on the bundle's pixel buffer.'''
+
+        return self._get_surface(self._rotation_index[os.path.normpath(image_path)]['frames'][angle_bucket])
+
+    def get_collision_bounds(self,
+                             image_path):
+        '''Returns the prebuilt collision bounds of the specified image as a dictionary (see
+        CollisionBounds.to_values), or None if the bundle has none.'''
+
+        return self._collision_bounds.get(os.path.normpath(image_path))
+
+    def has_sound(self,
+                  sound_path):
+        '''Returns True if the bundle holds the specified sound, False otherwise.'''
+
+        return os.path.normpath(sound_path) in self._sound_index
+
+    def get_sound(self,
+                  sound_path):
+        '''Returns the specified sound as a pygame Sound object.'''
+
+        entry = self._sound_index[os.path.normpath(sound_path)]
+
+        return pg.mixer.Sound(file = io.BytesIO(self._data[entry['offset']:entry['offset'] + entry['length']]))
+
+    def get_stats(self):
+        '''Returns the number of bundled images and sounds, the bundle's size in bytes and the
+        number of images that had to be copied to the display's pixel format.'''
+
+        return {'images': len(self._image_index),
+                'sounds': len(self._sound_index),
+                'bytes': len(self._mmap),
+                'images_copied': self.n_images_copied}
+
+    def _get_surface(self,
+                     entry,
+                     transparent = True):
+        '''Util function that returns a new Surface on the pixel buffer of the specified index
+        entry. If the display's pixel format differs from the bundle's, the surface is
+        converted (copied) to it.'''
+
+        pixels = self._data[entry['offset']:entry['offset'] + entry['width'] * entry['height'] * 4]
+        image = pg.image.frombuffer(pixels, (entry['width'], entry['height']), PIXEL_FORMAT)
+
+        # opaque images are blitted without blending
+        if not transparent:
+            image.set_alpha(None)
+
+        # convert to display pixel format if it differs from the bundle's
+        display = pg.display.get_surface()
+
+        if display is not None and display.get_masks()[:3] != image.get_masks()[:3]:
+            image = image.convert_alpha() if transparent else image.convert()
+            self.n_images_copied += 1
+
+        return image
+
+def get_data_offset(header_size):
+    '''Returns the position of the data section in a bundle with a header of the specified
+    size (in bytes).'''
+
+    data_offset = struct.calcsize(PREAMBLE_FORMAT) + header_size
+
+    return data_offset + (- data_offset % BUFFER_ALIGNMENT)
+
+def build_asset_bundle(bundle_path,
+                       assets,
+                       extra_images = BUNDLED_IMAGES,
+                       rotations = None,
+                       collision_bounds = None):
+    '''Writes an asset bundle with the meta data of the specified AssetRegistry, all images
+    and sounds of the skins and animations in it and the specified extra images. The images
+    are loaded through the registry, so the display mode must be set to get them in the
+    display's pixel format. Returns the bundle's stats.
+
+    Arguments:
+
+        bundle_path: path of the bundle file to write.
+        assets: AssetRegistry to take the meta data and images from.
+        extra_images: sequence of (image path, transparent) tuples of images used by the game
+                that are not part of any skin or animation. Default is BUNDLED_IMAGES.
+        rotations: optional dictionary mapping image paths to tuples (angle resolution,
+                list of rotated images as (width, height, BGRA pixel bytes) per angle bucket).
+        collision_bounds: optional dictionary mapping image paths to collision bounds values
+                (see CollisionBounds.to_values).'''
+
+    rotations = rotations or {}
+
+    # load all assets through the registry
+    images = []
+
+    for skin_name in assets.skins_meta_data:
+        images.extend((image_path, True) for image_path in assets.skins_meta_data[skin_name]['image_paths'])
+
+    for animation_name in assets.animations_meta_data:
+        images.extend((image_path, True) for image_path in assets.animations_meta_data[animation_name]['image_paths'])
+
+    images.extend(extra_images)
+
+    sound_paths = sorted(set(animation_meta_data['sound'] for animation_meta_data in assets.animations_meta_data.values()
+                             if 'sound' in animation_meta_data))
+
+    # get data blocks and their index entries
+    image_entries, image_blocks = [], []
+    sound_entries, sound_blocks = [], []
+
+    for image_path, transparent in dict.fromkeys(images):
+        image = assets.get_image(image_path, transparent)
+        width, height = image.get_size()
+
+        image_entries.append({'path': image_path,
+                              'transparent': transparent,
+                              'width': width,
+                              'height': height})
+        image_blocks.append(pg.image.tobytes(image, PIXEL_FORMAT))
+
+    for sound_path in sound_paths:
+        with open(sound_path,'rb') as sound_file:
+            sound_blocks.append(sound_file.read())
+
+        sound_entries.append({'path': sound_path,
+                              'length': len(sound_blocks[-1])})
+
+    rotation_entries, frame_entries, frame_blocks = [], [], []
+
+    for image_path, (angle_resolution, frames) in sorted(rotations.items()):
+        rotation_entries.append({'path': image_path,
+                                 'angle_resolution': angle_resolution,
+                                 'frames': []})
+
+        for width, height, pixels in frames:
+            rotation_entries[-1]['frames'].append({'width': width,
+                                                   'height': height})
+            frame_entries.append(rotation_entries[-1]['frames'][-1])
+            frame_blocks.append(pixels)
+
+    # pad blocks to the buffer alignment and set their offsets relative to the data section
+    blocks = [block + b'\0' * (- len(block) % BUFFER_ALIGNMENT) for block in image_blocks + sound_blocks + frame_blocks]
+    data_size = 0
+
+    for entry, block in zip(image_entries + sound_entries + frame_entries, blocks):
+        entry['offset'] = data_size
+        data_size += len(block)
+
+    # get header; the data section starts at the first aligned position after it
+    header = json.dumps({'skins_meta_data': assets.skins_meta_data,
+                         'animations_meta_data': assets.animations_meta_data,
+                         'images': image_entries,
+                         'sounds': sound_entries,
+                         'rotations': rotation_entries,
+                         'collision_bounds': collision_bounds or {}},
+                        sort_keys = True).encode('utf-8')
+
+    data_offset = get_data_offset(len(header))
+
+    # write bundle
+    with open(bundle_path,'wb') as bundle_file:
+        bundle_file.write(struct.pack(PREAMBLE_FORMAT, BUNDLE_SIGNATURE, BUNDLE_VERSION, len(header)))
+        bundle_file.write(header)
+        bundle_file.write(b'\0' * (data_offset - struct.calcsize(PREAMBLE_FORMAT) - len(header)))
+
+        for block in blocks:
+            bundle_file.write(block)
+
+    return {'images': len(image_entries),
+            'sounds': len(sound_entries),
+            'rotated_images': len(frame_entries),
+            'bytes': data_offset + data_size}
+
+def get_prebuilt_bundle(build_dir = BUILD_DIR):
+    '''Returns the path of the asset bundle in the specified build directory if it is up to
+    date, i.e. exists and is newer than all the files it was built from. Returns None otherwise.
+    The asset build pipeline touches the bundle when its sources have been touched but have
+    not changed, so a stale bundle is only ever reported until the pipeline runs again.'''
+
+    manifest_path = os.path.join(build_dir, MANIFEST_NAME)
+    bundle_path = os.path.join(build_dir, BUNDLE_NAME)
+
+    if not (os.path.isfile(manifest_path) and os.path.isfile(bundle_path)):
+        return None
+
+    with open(manifest_path,'r') as manifest_file:
+        source_paths = json.load(manifest_file)['source_paths']
+
+    bundle_time = os.path.getmtime(bundle_path)
+
+    for source_path in source_paths:
+        if not os.path.isfile(source_path) or os.path.getmtime(source_path) > bundle_time:
+            return None
+
+    return bundle_path
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the AssetRegistry class used in the game STAR WARS DOGFIGHTER. The
+registry gets the typed skins and animations meta data (see meta_data_classes.py) and loads every image, sound and
+font the game asks for exactly once. Images are converted to the display's pixel format
+(with per-pixel alpha instead of the white color key) when loaded, so that rotating and
+blitting them is as cheap as possible. All sprites using the same asset share the same
+handle, which also lets them share rotation caches. Rendered text labels (e.g. ship ids) are cached as well.
+Optionally, meta data, images and sounds are taken from an AssetBundle instead of the loose
+files; assets missing from the bundle are still loaded from their files. Rotated images and
+collision bounds prebuilt into the bundle by the asset build pipeline are handed to the
+rotation caches and collision bounds of the image sequences they belong to.'''
+
+import os
+from functools import partial
+
+import pygame as pg
+
+from rotation_cache_class import RotationCache
+from collision_classes import CollisionBounds
+from meta_data_classes import MetaDataCache, compile_meta_data
+
+class AssetRegistry(object):
+    '''Load-once cache for the game's images, sounds, fonts, text labels and meta data.'''
+
+    def __init__(self,
+                 skins_meta_path = './meta/sprite_skins_meta_data.yaml',
+                 animations_meta_path = './meta/animations_meta_data.yaml',
+                 transparent_color = (255,255,255),
+                 bundle = None,
+                 meta_data_cache_path = './build/meta_data_cache.pickle'):
+
+        '''Arguments:
+
+            skins_meta_path: path to the YAML file with the skin meta data (image paths, gun
+                    and engine offsets and fire modes per ship/laser skin).
+            animations_meta_path: path to the YAML file with the animation meta data (image
+                    paths, sound and seconds per image per animation).
+            transparent_color: color made transparent in all images loaded with the default
+                    color key. Default is (255,255,255), which corresponds to the color white.
+            bundle: optional AssetBundle. If specified, its meta data is used instead of the
+                    meta data files, and its images and sounds instead of the loose files.
+            meta_data_cache_path: path of the MetaDataCache's binary cache file for the meta
+                    data files. If None, the meta data files are parsed every time.'''
+
+        self.bundle = bundle
+
+        # load meta data, raw and typed
+        if bundle is not None:
+            meta_data = compile_meta_data(bundle.skins_meta_data,
+                                          bundle.animations_meta_data)
+        else:
+            meta_data = MetaDataCache(skins_meta_path,
+                                      animations_meta_path,
+                                      meta_data_cache_path).load()
+
+        self.skins_meta_data = meta_data['skins_meta_data']
+        self.animations_meta_data = meta_data['animations_meta_data']
+        self.skins = meta_data['skins']
+        self.animations = meta_data['animations']
+
+        self._transparent_color = transparent_color
+
+        # initialize caches
+        self._images = {}
+        self._image_sequences = {}
+        self._sounds = {}
+        self._fonts = {}
+        self._labels = {}
+        self._rotation_caches = [] # caches holding prebuilt rotations; kept alive by the registry
+        self._collision_bounds = {}
+
+        # initialize statistics
+        self.n_files_loaded = 0
+
+    def get_image(self,
+                  image_path,
+                  transparent = True):
+        '''Returns the image at the specified path, converted to the display's pixel format if
+        the display mode is set. If 'transparent' is set, the registry's transparent color is
+        made transparent: as RLE accelerated color key if the image can't be converted,
+        otherwise as per-pixel alpha (see _convert_transparent). Bundled images are taken
+        from the bundle as they are.'''
+
+        key = (os.path.normpath(image_path), transparent)
+
+        if key in self._images:
+            return self._images[key]
+
+        if self.bundle is not None and self.bundle.has_image(image_path, transparent):
+            self._images[key] = self.bundle.get_image(image_path, transparent)
+        else:
+            image = pg.image.load(image_path)
+            self.n_files_loaded += 1
+
+            if pg.display.get_surface() is None:
+                if transparent:
+                    image.set_colorkey(self._transparent_color, pg.RLEACCEL)
+            elif transparent:
+                image = self._convert_transparent(image)
+            else:
+                image = image.convert()
+
+            self._images[key] = image
+
+        return self._images[key]
+
+    def get_images(self,
+                   image_paths,
+                   transparent = True):
+        '''Returns the list of images at the specified paths. The same paths always give the
+        same list object, so that sprites created from it share their rotation cache.'''
+
+        key = (tuple(os.path.normpath(image_path) for image_path in image_paths), transparent)
+
+        if key not in self._image_sequences:
+            self._image_sequences[key] = images = [self.get_image(image_path, transparent) for image_path in image_paths]
+
+            if self.bundle is not None and transparent:
+                self._add_prebuilt(image_paths, images)
+
+        return self._image_sequences[key]
+
+    def get_sound(self,
+                  sound_path):
+        '''Returns the sound at the specified path as a pygame Sound object.'''
+
+        key = os.path.normpath(sound_path)
+
+        if key not in self._sounds:
+            if self.bundle is not None and self.bundle.has_sound(sound_path):
+                self._sounds[key] = self.bundle.get_sound(sound_path)
+            else:
+                self._sounds[key] = pg.mixer.Sound(sound_path)
+                self.n_files_loaded += 1
+
+        return self._sounds[key]
+
+    def get_font(self,
+                 font_name = 'freesansbold.ttf',
+                 size = 12):
+        '''Returns the pygame Font of the specified name and size.'''
+
+        key = (font_name, size)
+
+        if key not in self._fonts:
+            self._fonts[key] = pg.font.Font(font_name, size)
+
+        return self._fonts[key]
+
+    def get_label(self,
+                  text,
+                  size = 12,
+                  color = (254,254,254)):
+        '''Returns a one element list with the specified text rendered as (anti-aliased)
+        surface, ready to be used as image sequence of a sprite.'''
+
+        key = (text, size, tuple(color))
+
+        if key not in self._labels:
+            self._labels[key] = [self.get_font(size = size).render(text, True, color)]
+
+        return self._labels[key]
+
+    def get_skin(self,
+                 skin_name):
+        '''Returns the images, gun offsets, engine offsets and fire modes of the specified
+        skin, as given by its SkinMetaData. The same skin always gives the same (read-only)
+        objects. Missing entries (e.g. for laser skins) are returned as None.'''
+
+        skin = self.skins[skin_name]
+
+        return self.get_images(skin.image_paths), skin.gun_offsets, skin.engine_offsets, skin.fire_modes
+
+    def get_animation(self,
+                      animation_name):
+        '''Returns the images, sound (None if there is none) and seconds per image of the
+        specified animation from the animations meta data.'''
+
+        animation = self.animations[animation_name]
+
+        images = self.get_images(animation.image_paths)
+        sound = self.get_sound(animation.sound_path) if animation.sound_path is not None else None
+
+        return images, sound, animation.spi
+
+    def get_collision_bounds(self,
+                             images):
+        '''Returns the prebuilt CollisionBounds of the specified image sequence (as returned by
+        get_images or get_skin), or None if there are none.'''
+
+        entry = self._collision_bounds.get(id(images))
+
+        return entry[1] if entry is not None else None
+
+    def get_stats(self):
+        '''Returns the number of cached assets per kind and the number of files loaded.'''
+
+        return {'images': len(self._images),
+                'sounds': len(self._sounds),
+                'fonts': len(self._fonts),
+                'labels': len(self._labels),
+                'files_loaded': self.n_files_loaded}
+
+    def _add_prebuilt(self,
+                      image_paths,
+                      images):
+        '''Util function that makes the shared rotation cache of the specified image sequence
+        take the bundle's prebuilt rotations at the current default angle resolution (see
+        RotationCache), and gets the bundle's collision bounds of its first image.'''
+
+        rotation_cache = None
+
+        for image_index, image_path in enumerate(image_paths):
+            if not self.bundle.has_rotations(image_path, RotationCache.default_angle_resolution):
+                continue
+
+            if rotation_cache is None:
+                rotation_cache = RotationCache.get_shared(images)
+                self._rotation_caches.append(rotation_cache)
+
+            rotation_cache.set_prebuilt(image_index,
+                                        partial(self.bundle.get_rotation, image_path))
+
+        bounds_values = self.bundle.get_collision_bounds(image_paths[0])
+
+        if bounds_values is not None:
+            self._collision_bounds[id(images)] = (images, CollisionBounds.from_values(**bounds_values))
+
+    def _convert_transparent(self,
+                             image):
+        '''Util function that converts an image to the display's pixel format with per-pixel
+        alpha, with the transparent color's pixels set to fully transparent black. Sprite
+        images are rotated with pg.transform.rotozoom, which ignores the color key of
+        converted surfaces; for color keyed source images, it produces exactly this
+        surface before rotating, so rotated images look the same either way.'''
+
+        image.set_colorkey(self._transparent_color)
+        image = image.convert_alpha()
+
+        # zero out color of transparent pixels; rotozoom blends it into the edges
+        pixels = pg.surfarray.pixels3d(image)
+        pixels[pg.surfarray.pixels_alpha(image) == 0] = 0
+        del pixels
+
+        return image
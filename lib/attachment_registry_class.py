@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the AttachmentRegistry class used in the game STAR WARS DOGFIGHTER.
+Sprites that stay attached to a ship (engine flames, muzzle flashes, ship frames and id
+labels, see TrackingAnimation) used to rotate their offset w.r.t. the ship's center with a
+2x2 rotation matrix of their own every frame, and to check every frame whether the ship was
+still alive. The registry keeps all offsets attached to a ship, including the ship's gun
+offsets, per ship. It rotates the offsets of all attached sprites in one batched operation
+per frame, and a ship's gun offsets all at once whenever the ship fires at a new angle.
+When a ship is killed, its attached sprites are killed with it.'''
+
+from math import pi, sin, cos
+
+import numpy as np
+
+class ShipAttachments(object):
+    '''The gun offsets and attached sprites of one ship.'''
+
+    def __init__(self):
+
+        # gun offsets and their rotation at the last angle asked for
+        self.gun_offsets = np.zeros((0,2))
+        self._gun_angle = None
+        self._rotated_gun_offsets = None
+
+        # attached sprites and their offsets; sprites with a static angle get their offset
+        # rotated by their own angle once, when attached
+        self.sprites = []
+        self.offsets = []
+        self.dynamic_angles = []
+
+    def set_gun_offsets(self,
+                        gun_offsets):
+        '''Sets the gun offsets (array of shape (n,2), at an angle of 0).'''
+
+        self.gun_offsets = np.array(gun_offsets, dtype = 'float').reshape(-1,2)
+        self._gun_angle = None
+
+    def get_rotated_gun_offsets(self,
+                                angle):
+        '''Returns the gun offsets rotated (counter-clockwise) by the specified angle in
+        degrees. All guns are rotated at once, and only when the angle changed.'''
+
+        if angle != self._gun_angle:
+            self._rotated_gun_offsets = get_rotated_offsets(self.gun_offsets, angle)
+            self._gun_angle = angle
+
+        return self._rotated_gun_offsets
+
+    def add(self,
+            sprite,
+            offset,
+            dynamic_angle):
+        '''Attaches the sprite at the specified offset.'''
+
+        offset = np.array(offset, dtype = 'float').reshape(1,2)
+
+        if not dynamic_angle:
+            offset = get_rotated_offsets(offset, sprite._angle)
+
+        self.sprites.append(sprite)
+        self.offsets.append(offset[0])
+        self.dynamic_angles.append(dynamic_angle)
+
+    def remove(self,
+               sprite):
+        '''Detaches the sprite. Returns whether it was attached.'''
+
+        for i, attached_sprite in enumerate(self.sprites):
+            if attached_sprite is sprite:
+                del self.sprites[i], self.offsets[i], self.dynamic_angles[i]
+
+                return True
+
+        return False
+
+class AttachmentRegistry(object):
+    '''Keeps track of the sprites and guns attached to each ship, and positions all attached
+    sprites in one batched pass per frame.'''
+
+    def __init__(self):
+
+        # attachments by ship
+        self._ship_attachments = {}
+
+        # attached sprites of all ships, stacked into arrays; rebuilt when sprites are
+        # attached or detached
+        self._stack_is_current = False
+        self._ships = []
+        self._sprites = []
+        self._dynamic_sprites = []
+        self._offsets = np.zeros((0,2))
+        self._ship_indices = np.zeros(0, dtype = 'int')
+        self._dynamic_angles = np.zeros(0, dtype = 'bool')
+
+    def add_guns(self,
+                 ship,
+                 gun_offsets):
+        '''Registers the ship's gun offsets (array of shape (n,2), at an angle of 0) in the
+        order of its laser cannons; see get_gun_position.'''
+
+        self._get_ship_attachments(ship).set_gun_offsets(gun_offsets)
+
+    def attach(self,
+               sprite,
+               ship,
+               offset,
+               dynamic_angle = True):
+        '''Attaches the sprite to the ship at the specified offset w.r.t. the ship's center at
+        an angle of 0, and positions it right away. If 'dynamic_angle' is set, the sprite
+        takes the ship's angle and its offset is rotated with it; otherwise, the sprite keeps
+        its own angle.'''
+
+        ship_attachments = self._get_ship_attachments(ship)
+        ship_attachments.add(sprite,
+                             offset,
+                             dynamic_angle)
+
+        self._stack_is_current = False
+
+        # position sprite
+        angle = ship._angle if dynamic_angle else 0
+        sprite._center = ship._center + get_rotated_offsets(ship_attachments.offsets[-1].reshape(1,2), angle)[0]
+
+        if dynamic_angle:
+            sprite._angle = ship._angle
+
+    def detach(self,
+               sprite,
+               ship):
+        '''Detaches the sprite from the ship, e.g. when the sprite is killed.'''
+
+        ship_attachments = self._ship_attachments.get(ship)
+
+        if ship_attachments is not None and ship_attachments.remove(sprite):
+            self._stack_is_current = False
+
+    def despawn(self,
+                ship):
+        '''Forgets the ship and kills all sprites attached to it. Called when the ship is killed.'''
+
+        ship_attachments = self._ship_attachments.pop(ship, None)
+
+        if ship_attachments is None:
+            return
+
+        self._stack_is_current = False
+
+        for sprite in ship_attachments.sprites:
+            sprite.kill()
+
+    def get_gun_position(self,
+                         ship,
+                         gun_index):
+        '''Returns the screen position of the ship's gun tip at the specified index (see
+        add_guns) as array of shape (2,).'''
+
+        return self._ship_attachments[ship].get_rotated_gun_offsets(ship._angle)[gun_index] + ship._center
+
+    def step(self):
+        '''Positions all attached sprites w.r.t. their ship's current center and angle. Call
+        once per frame, after the ships have moved.'''
+
+        if not self._stack_is_current:
+            self._stack()
+
+        if not self._sprites:
+            return
+
+        # get ships' positional attributes; sprites with a static angle are not rotated
+        ship_centers = np.array([ship._center for ship in self._ships])
+        ship_angles = np.array([ship._angle for ship in self._ships], dtype = 'float')
+
+        angles = np.where(self._dynamic_angles, ship_angles[self._ship_indices], 0)
+
+        # rotate all offsets at once (counter-clockwise, in pygame's screen coordinates)
+        radian_angles = angles * pi / 180
+        cosines, sines = np.cos(radian_angles), np.sin(radian_angles)
+
+        offset_x, offset_y = self._offsets[:,0], self._offsets[:,1]
+
+        centers = ship_centers[self._ship_indices]
+        centers[:,0] += cosines * offset_x + sines * offset_y
+        centers[:,1] += - sines * offset_x + cosines * offset_y
+
+        for sprite, center in zip(self._sprites, centers):
+            sprite._center = center
+
+        for sprite, angle in zip(self._dynamic_sprites, ship_angles[self._ship_indices[self._dynamic_angles]].tolist()):
+            sprite._angle = angle
+
+    def get_stats(self):
+        '''Returns the number of ships and attached sprites.'''
+
+        return {'ships': len(self._ship_attachments),
+                'sprites': sum(len(ship_attachments.sprites) for ship_attachments in self._ship_attachments.values())}
+
+    def _get_ship_attachments(self,
+                              ship):
+        '''Util function that returns the ship's attachments, creating them if needed.'''
+
+        if ship not in self._ship_attachments:
+            self._ship_attachments[ship] = ShipAttachments()
+
+        return self._ship_attachments[ship]
+
+    def _stack(self):
+        '''Util function that stacks the attached sprites of all ships into the arrays used
+        by step.'''
+
+        self._ships = [ship for ship, ship_attachments in self._ship_attachments.items() if ship_attachments.sprites]
+        self._sprites = []
+        offsets, ship_indices, dynamic_angles = [], [], []
+
+        for ship_index, ship in enumerate(self._ships):
+            ship_attachments = self._ship_attachments[ship]
+
+            self._sprites.extend(ship_attachments.sprites)
+            offsets.extend(ship_attachments.offsets)
+            ship_indices.extend([ship_index] * len(ship_attachments.sprites))
+            dynamic_angles.extend(ship_attachments.dynamic_angles)
+
+        self._offsets = np.array(offsets, dtype = 'float').reshape(-1,2)
+        self._ship_indices = np.array(ship_indices, dtype = 'int')
+        self._dynamic_angles = np.array(dynamic_angles, dtype = 'bool')
+        self._dynamic_sprites = [sprite for sprite, dynamic_angle in zip(self._sprites, dynamic_angles) if dynamic_angle]
+
+        self._stack_is_current = True
+
+def get_rotated_offsets(offsets,
+                        angle):
+    '''Util function that rotates the offsets (array of shape (n,2)) counter-clockwise by the
+    specified angle in degrees, in pygame's screen coordinates.'''
+
+    # convert angle to radian
+    radian_angle = angle * pi / 180
+
+    # rotate with the transposed rotation matrix, since offsets are stored row by row
+    transposed_rotation_matrix = np.array([[cos(radian_angle), - sin(radian_angle)],
+                                           [sin(radian_angle), cos(radian_angle)]])
+
+    return np.dot(offsets, transposed_rotation_matrix)
@@ -6,14 +6,61 @@ Created on Mon Jun  4 00:04:44 2018
 """
 
 from pygame.sprite import Sprite
+from rotation_cache_class import RotationCache
 from math import cos, sin, pi
 
 import pygame as pg
 import numpy as np
 
+class KinematicAttribute(object):
+    '''Descriptor for the positional attributes '_center', '_angle', '_speed', '_d_angle' and
+    '_d_speed' of a BasicSprite. If the sprite is attached to a KinematicsWorld, the attribute
+    is a view onto the sprite's row in the world's arrays; otherwise it is stored on the sprite
+    itself.'''
+    
+    def __init__(self,
+                 world_array_name):
+        
+        self._world_array_name = world_array_name
+        self._local_name = '_local_' + world_array_name
+        
+    def __get__(self,
+                sprite,
+                owner):
+        
+        if sprite is None:
+            return self
+        
+        if sprite._kinematics_row is None:
+            return sprite.__dict__[self._local_name]
+        
+        return getattr(sprite._kinematics_world,self._world_array_name)[sprite._kinematics_row]
+    
+    def __set__(self,
+                sprite,
+                value):
+        
+        if sprite._kinematics_row is None:
+            sprite.__dict__[self._local_name] = value
+        else:
+            getattr(sprite._kinematics_world,self._world_array_name)[sprite._kinematics_row] = value
+
 class BasicSprite(Sprite):
     '''Base class for all masked sprites that appear in the game.'''
     
+    # positional attributes; see KinematicAttribute
+    _center = KinematicAttribute('center')
+    _angle = KinematicAttribute('angle')
+    _speed = KinematicAttribute('speed')
+    _d_angle = KinematicAttribute('d_angle')
+    _d_speed = KinematicAttribute('d_speed')
+    
+    # SpritePool the sprite returns to when killed, if any
+    _pool = None
+    
+    # Timer that kills the sprite when its lifetime is over, if any (see expire_in)
+    _expiry_timer = None
+    
     def __init__(self,
                  fps,
                  screen,
@@ -23,7 +70,8 @@ class BasicSprite(Sprite):
                  angle = 0,
                  speed = 0,
                  is_transparent = True,
-                 transparent_color = (255,255,255)):
+                 transparent_color = (255,255,255),
+                 kinematics_world = None):
         
         '''Arguments:
             
@@ -44,50 +92,136 @@ class BasicSprite(Sprite):
                     color argument in the surfaces contained in 'original_images' will be made transparent.
                     Default is True
             transparent_color: tuple specifiying the color key considered as transparent if 'is_transparent'
-                    is set to true. Default to (255,255,255), which corresponds to the color white.'''
+                    is set to true. Default to (255,255,255), which corresponds to the color white.
+            kinematics_world: KinematicsWorld object. If specified, the sprite's positional attributes
+                    will be stored in and integrated by the world instead of by the sprite itself.
+                    Default is None.'''
                     
                     
         # call Sprite base class init - add self to all groups specified
         Sprite.__init__(self,*groups)
         
+        # set sprite up
+        self._set_up(fps,
+                     screen,
+                     original_images,
+                     center,
+                     angle,
+                     speed,
+                     is_transparent,
+                     transparent_color,
+                     kinematics_world)
+        
+    def reset(self,
+              fps,
+              screen,
+              original_images,
+              *groups,
+              center = np.zeros(2),
+              angle = 0,
+              speed = 0,
+              is_transparent = True,
+              transparent_color = (255,255,255),
+              kinematics_world = None):
+        '''Sets a killed sprite up again with the specified arguments (see __init__) and adds it
+        to the specified groups, so that it can be reused instead of creating a new sprite
+        (see SpritePool).'''
+        
+        self._set_up(fps,
+                     screen,
+                     original_images,
+                     center,
+                     angle,
+                     speed,
+                     is_transparent,
+                     transparent_color,
+                     kinematics_world)
+        
+        self.add(*groups)
+        
+    def _set_up(self,
+                fps,
+                screen,
+                original_images,
+                center,
+                angle,
+                speed,
+                is_transparent,
+                transparent_color,
+                kinematics_world):
+        '''Util function that sets the sprite's attributes from the arguments of __init__.'''
+        
         # set surrounding pygame variables as attributes
         self._screen = screen
         self._fps = fps
         
-        # if necessary, make original image surfaces transparent; then attach
+        # if necessary, make original image surfaces transparent; then attach. Images that
+        # already are (e.g. shared images from the asset registry) are left as they are
         if is_transparent:
             for original_image in original_images:
-                original_image.set_colorkey(transparent_color)
+                if original_image.get_colorkey() is None and not original_image.get_flags() & pg.SRCALPHA:
+                    original_image.set_colorkey(transparent_color)
                 
         self._original_images = original_images
         
-        # set positional attributes using initial values passed
-        self._center = np.array(center,dtype='float')
-        self._angle = angle
-        self._speed = speed / fps # convert to pixel per frame
+        # attach kinematics world; if given, get a row in it for the positional attributes
+        self._kinematics_world = kinematics_world
+        self._kinematics_row = None
         
-        # set rate of change of positional attributes
-        self._d_angle = 0
-        self._d_speed = 0
+        if kinematics_world is not None:
+            self._kinematics_row = kinematics_world.add(center,
+                                                        angle,
+                                                        speed / fps) # convert to pixel per frame
+        else:
+            # set positional attributes using initial values passed
+            self._center = np.array(center,dtype='float')
+            self._angle = angle
+            self._speed = speed / fps # convert to pixel per frame
+            
+            # set rate of change of positional attributes
+            self._d_angle = 0
+            self._d_speed = 0
         
         # set sprite up
         # set image and rect - these will be called by Group object methods; get mask
         self._image_index = 0 # always start with first image in original_images
 
-        # initialize image surface object
+        # attach rotation cache shared by all sprites using the same original images
         self._size_factor = 1
-        self.image = pg.transform.rotozoom(self._original_images[self._image_index],
-                                           self._angle,
-                                           self._size_factor)
+        self._rotation_cache = RotationCache.get_shared(self._original_images,
+                                                        size_factor = self._size_factor)
         
-        # update object type attribute: mask
-        self.mask = pg.mask.from_surface(self.image)
+        # initialize image surface object, mask and positional rectangle
+        self.update_image_attributes()
         
-        # update object type attributes: positional rectangle
-        self.rect = self.image.get_rect()
+    def update_image_attributes(self):
+        '''Updates the sprite's object type attributes 'image' and 'rect' (and with them, the
+        'mask' property) based on the current image index, angle and center. Rotated images
+        are taken from the sprite's shared rotation cache.'''
+        
+        # get rotated image for current angle from cache
+        self._rotated_image = self._rotation_cache.get(self._image_index,
+                                                       self._angle)
         
+        # update object type attributes: surface
+        self.image = self._rotated_image.image
+        
+        # update object type attributes: positional rectangle
+        self.rect = self._rotated_image.rect.copy()
         self.rect.center = self._center
         
+        # let the kinematics world know the current image size for its wrap checks
+        if self._kinematics_row is not None:
+            self._kinematics_world.half_size[self._kinematics_row] = self.rect.width / 2, self.rect.height / 2
+        
+    @property
+    def mask(self):
+        '''Collision mask of the sprite's current image. Only built (and then cached with the
+        rotated image) when a collision test actually reads it, so sprites that never take
+        part in collision checks never pay for mask generation.'''
+        
+        return self._rotated_image.mask
+        
     def update_positional_attributes(self):
         '''Updates the sprites positional attributes '_angle' and '_speed'.
         Does not update the 'image','rect' or 'mask' attributes.'''
@@ -141,6 +275,13 @@ class BasicSprite(Sprite):
         
         return
     
+    def steer(self):
+        '''Sets the sprite's directional changes for the current frame (see set_pilot_commands).
+        Called by update, unless the sprite is attached to a kinematics world: such sprites are
+        steered by the game before the world integrates them (see Game.update_game_state).'''
+        
+        self.set_pilot_commands()
+    
     def _control_speed(self):
         '''Util function that ensures sprite respects its speed constraints.
         Only used at ShipSprite (and upwards) level.'''
@@ -151,20 +292,48 @@ class BasicSprite(Sprite):
         '''Updates the sprite's object type attributes 'image','rect' and 'mask' based on 
         updated numerical positional attributes'self._angle','self._speed' and self_center'.'''
         
-        # get directional changes
-        self.set_pilot_commands()
+        # get directional changes and update numerical positional attributes. Sprites attached
+        # to a kinematics world have been steered and integrated by the world's vectorized step
+        if self._kinematics_row is None:
+            self.steer()
+            self.update_positional_attributes()
         
-        # update numerical positional attributes
-        self.update_positional_attributes()
+        # update object type attributes 'image', 'mask' and 'rect'
+        self.update_image_attributes()
         
-        # update object type attributes: surface
-        self.image = pg.transform.rotozoom(self._original_images[self._image_index],
-                                           self._angle,
-                                           self._size_factor)
-
-        # update object type attribute: mask
-        self.mask = pg.mask.from_surface(self.image)
+    def expire_in(self,
+                  timer_wheel,
+                  n_frames):
+        '''Registers the sprite's expiry with the TimerWheel: the sprite is killed when the
+        wheel reaches the specified number of frames from now, unless it is killed before.'''
         
-        # update object type attributes: positional rectangle
-        self.rect = self.image.get_rect()
-        self.rect.center = self._center
+        self._expiry_timer = timer_wheel.schedule(n_frames,
+                                                  self.kill)
+        
+    def kill(self):
+        '''Base class kill method plus release of the sprite's row in the kinematics world, if
+        attached. The final positional attributes are copied onto the sprite itself so they
+        can still be read after the sprite has been killed. Pooled sprites then return to
+        their pool. A pending expiry timer is cancelled.'''
+        
+        if self._expiry_timer is not None:
+            self._expiry_timer.cancel()
+            self._expiry_timer = None
+        
+        if self._kinematics_row is not None:
+            # copy final state
+            center, angle, speed = np.array(self._center), self._angle, self._speed
+            d_angle, d_speed = self._d_angle, self._d_speed
+            
+            # release row
+            self._kinematics_world.remove(self._kinematics_row)
+            self._kinematics_row = None
+            
+            # set positional attributes locally
+            self._center, self._angle, self._speed = center, angle, speed
+            self._d_angle, self._d_speed = d_angle, d_speed
+        
+        Sprite.kill(self)
+        
+        if self._pool is not None:
+            self._pool.release(self)
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the batch battle runner of the game STAR WARS DOGFIGHTER. It runs
+headless AI vs AI battles for every combination of a parameter grid and a list of seeds,
+spread across a process pool. Each finished battle is appended to a JSON lines results
+file as soon as a worker reports it, and battles already in that file are skipped, so an
+interrupted sweep can simply be started again. At the end, the results are aggregated per
+grid point and printed as a table.
+
+Example (run from the lib directory, like game_class.py):
+
+    python battle_runner.py --scenario squadrons --seeds 20 --grid gunning_cone_sine=0.05,0.1,0.2 --grid n_hostile_ships=3,4'''
+
+import os
+import json
+import random
+import argparse
+import itertools
+import multiprocessing
+
+import yaml
+import numpy as np
+
+from game_class import Game
+
+# grid parameters that are set as Game attributes before the battle is set up
+ATTRIBUTE_PARAMETERS = ('piloting_cone_sine',
+                        'gunning_cone_sine',
+                        'laser_range_in_seconds',
+                        'laser_speed_in_seconds',
+                        'laser_rate_in_seconds')
+
+# grid parameters that are passed on to the scenario's setup method
+SCENARIO_PARAMETERS = ('n_allied_ships',
+                       'n_hostile_ships')
+
+# scenario name -> Game setup method name, fixed keyword arguments
+SCENARIOS = {'default': ('setup_battle', {'ai_player': True}),
+             'squadrons': ('setup_squadron_battle', {})}
+
+def get_grid_points(param_grid):
+    '''Takes a dictionary mapping parameter names to lists of values and returns the list of
+    all parameter combinations as dictionaries.'''
+
+    names = sorted(param_grid)
+
+    return [dict(zip(names, values)) for values in itertools.product(*[param_grid[name] for name in names])]
+
+def get_battle_key(scenario,
+                   seed,
+                   params):
+    '''Returns the string identifying a battle in the results file.'''
+
+    return json.dumps({'scenario': scenario,
+                       'seed': seed,
+                       'params': params},
+                      sort_keys = True)
+
+def run_battle(battle):
+    '''Runs one headless battle. Takes a (scenario, seed, params, max_frames) tuple and returns
+    the battle's results as a flat dictionary that also holds the battle's key. Parameters
+    that are neither attribute nor scenario parameters are passed on to the Game.'''
+
+    scenario, seed, params, max_frames = battle
+
+    # seed all sources of randomness used by the AI
+    random.seed(seed)
+    np.random.seed(seed)
+
+    # sort parameters
+    game_kwargs = dict((name, value) for name, value in params.items()
+                       if name not in ATTRIBUTE_PARAMETERS and name not in SCENARIO_PARAMETERS)
+    scenario_kwargs = dict((name, value) for name, value in params.items() if name in SCENARIO_PARAMETERS)
+
+    # create game, apply parameters and set up scenario
+    game = Game(headless = True,
+                **game_kwargs)
+
+    for name in ATTRIBUTE_PARAMETERS:
+        if name in params:
+            setattr(game, name, params[name])
+
+    setup_method_name, setup_kwargs = SCENARIOS[scenario]
+    scenario_kwargs.update(setup_kwargs)
+
+    getattr(game, setup_method_name)(**scenario_kwargs)
+
+    # simulate until one side is eliminated or time is up
+    row = game.simulate(max_frames).to_dict()
+
+    row.update({'key': get_battle_key(scenario, seed, params),
+                'scenario': scenario,
+                'seed': seed,
+                'params': params})
+
+    return row
+
+def load_results(results_path):
+    '''Returns the list of battle results stored in the specified JSON lines file, or an
+    empty list if it does not exist. Incomplete lines (e.g. from an interrupted write) are
+    ignored.'''
+
+    if not os.path.exists(results_path):
+        return []
+
+    rows = []
+
+    with open(results_path,'r') as results_file:
+        for line in results_file:
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                continue
+
+    return rows
+
+def terminate_last_line(results_path):
+    '''Appends a newline to the specified results file if it does not end with one (e.g. after
+    an interrupted write), so that results appended next start on a line of their own.'''
+
+    if not os.path.exists(results_path):
+        return
+
+    with open(results_path,'rb+') as results_file:
+        results_file.seek(0, os.SEEK_END)
+
+        if not results_file.tell():
+            return
+
+        results_file.seek(-1, os.SEEK_END)
+
+        if results_file.read(1) != b'\n':
+            results_file.write(b'\n')
+
+def run_sweep(scenario,
+              param_grid,
+              seeds,
+              results_path,
+              max_frames = 3600,
+              n_workers = None,
+              verbose = True):
+    '''Runs one battle for every combination of grid point and seed that is not yet in the
+    results file, using a pool of 'n_workers' processes (default: one per CPU). Results are
+    appended to the results file as they come in. Returns the list of all battle results of
+    the sweep, including those from previous runs.'''
+
+    if scenario not in SCENARIOS:
+        raise ValueError('Scenario must be one of ' + str(sorted(SCENARIOS)) + ', but is ' + str(scenario))
+
+    # get finished battles
+    rows = dict((row['key'], row) for row in load_results(results_path))
+
+    # get battles still to run
+    battles = []
+    keys = []
+
+    for params in get_grid_points(param_grid):
+        for seed in seeds:
+            key = get_battle_key(scenario, seed, params)
+            keys.append(key)
+
+            if key not in rows:
+                battles.append((scenario, seed, params, max_frames))
+
+    if verbose:
+        print('Running ' + str(len(battles)) + ' of ' + str(len(keys)) + ' battles (' + str(len(keys) - len(battles)) + ' already finished)')
+
+    # run battles and stream results to file. The pool is closed and joined rather than
+    # terminated, as SDL turns the SIGTERM of Pool.terminate into a quit event in workers
+    # that initialized pygame, which then never exit
+    if battles:
+        pool = multiprocessing.Pool(n_workers)
+
+        try:
+            terminate_last_line(results_path)
+
+            with open(results_path,'a') as results_file:
+                for i, row in enumerate(pool.imap_unordered(run_battle, battles)):
+                    results_file.write(json.dumps(row) + '\n')
+                    results_file.flush()
+
+                    rows[row['key']] = row
+
+                    if verbose:
+                        print(str(i + 1) + '/' + str(len(battles)) + ': ' + str(row['params']) + ', seed ' + str(row['seed']) + ' -> ' + str(row['winner']))
+        finally:
+            pool.close()
+            pool.join()
+
+    return [rows[key] for key in keys]
+
+def aggregate_results(rows):
+    '''Groups battle results by scenario and parameters and returns one summary dictionary
+    per group with the number of battles, the share of battles won by each side, the mean
+    battle duration in (game) seconds, the mean number of shots fired per battle and the
+    overall hit ratio.'''
+
+    groups = {}
+
+    for row in rows:
+        group_key = json.dumps({'scenario': row['scenario'], 'params': row['params']}, sort_keys = True)
+        groups.setdefault(group_key, []).append(row)
+
+    summaries = []
+
+    for group_rows in groups.values():
+        n_battles = len(group_rows)
+        winners = [row['winner'] for row in group_rows]
+        shots_fired = [row['allied_shots_fired'] + row['hostile_shots_fired'] for row in group_rows]
+        n_hits = sum(row['allied_hits'] + row['hostile_hits'] for row in group_rows)
+
+        summaries.append({'scenario': group_rows[0]['scenario'],
+                          'params': group_rows[0]['params'],
+                          'n_battles': n_battles,
+                          'allied_wins': winners.count('allied') / n_battles,
+                          'hostile_wins': winners.count('hostile') / n_battles,
+                          'undecided': (winners.count('draw') + winners.count(None)) / n_battles,
+                          'mean_duration': np.mean([row['game_time'] for row in group_rows]),
+                          'mean_shots_fired': np.mean(shots_fired),
+                          'hit_ratio': n_hits / sum(shots_fired) if sum(shots_fired) else None})
+
+    return summaries
+
+def format_results_table(summaries):
+    '''Returns the aggregated results as a printable table.'''
+
+    header = ['params','battles','allied won','hostile won','undecided','duration [s]','shots fired','hit ratio']
+
+    lines = [header]
+
+    for summary in summaries:
+        lines.append([', '.join(name + '=' + str(value) for name, value in sorted(summary['params'].items())) or '-',
+                      str(summary['n_battles']),
+                      '{:.0%}'.format(summary['allied_wins']),
+                      '{:.0%}'.format(summary['hostile_wins']),
+                      '{:.0%}'.format(summary['undecided']),
+                      '{:.1f}'.format(summary['mean_duration']),
+                      '{:.0f}'.format(summary['mean_shots_fired']),
+                      '-' if summary['hit_ratio'] is None else '{:.2f}'.format(summary['hit_ratio'])])
+
+    widths = [max(len(line[i]) for line in lines) for i in range(len(header))]
+
+    return '\n'.join('  '.join(cell.ljust(width) for cell, width in zip(line, widths)) for line in lines)
+
+def parse_grid_arguments(grid_arguments):
+    '''Util function that turns a list of 'name=value1,value2,...' strings into a parameter
+    grid. Values are parsed as YAML scalars, so numbers, booleans and null are typed.'''
+
+    param_grid = {}
+
+    for grid_argument in grid_arguments:
+        name, values = grid_argument.split('=',1)
+        param_grid[name.strip()] = [yaml.safe_load(value) for value in values.split(',')]
+
+    return param_grid
+
+def main():
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description = 'STAR WARS DOGFIGHTER batch battle runner')
+    parser.add_argument('--scenario',
+                        default = 'squadrons',
+                        choices = sorted(SCENARIOS),
+                        help = 'battle setup')
+    parser.add_argument('--grid',
+                        action = 'append',
+                        default = [],
+                        help = "parameter values to sweep, as 'name=value1,value2,...'. Can be repeated")
+    parser.add_argument('--seeds',
+                        type = int,
+                        default = 10,
+                        help = 'number of seeds (0, 1, ...) per grid point')
+    parser.add_argument('--frames',
+                        type = int,
+                        default = 3600,
+                        help = 'maximum number of frames per battle')
+    parser.add_argument('--workers',
+                        type = int,
+                        default = None,
+                        help = 'number of worker processes. Default is one per CPU')
+    parser.add_argument('--results',
+                        default = 'battle_results.jsonl',
+                        help = 'JSON lines file to store battle results in; finished battles are skipped')
+    args = parser.parse_args()
+
+    # results path is relative to where the runner was started
+    results_path = os.path.abspath(args.results)
+
+    # make sure directory is repo head
+    os.chdir('..')
+
+    rows = run_sweep(args.scenario,
+                     parse_grid_arguments(args.grid),
+                     list(range(args.seeds)),
+                     results_path,
+                     max_frames = args.frames,
+                     n_workers = args.workers)
+
+    print(format_results_table(aggregate_results(rows)))
+
+if __name__=='__main__':
+    main()
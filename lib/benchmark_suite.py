@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the scaling benchmark suite of the game STAR WARS DOGFIGHTER. It
+builds synthetic battles with N AI ships per side, M extra live laser beams and K extra
+tracking animations out of the game's real sprite classes, runs them under the SDL dummy
+video driver and measures the frame time of the three phases of the game loop
+(Game.update_game_state, Game.draw_game_state and Game.handle_collisions) for every
+combination of the specified sizes. Results are written to a JSON file, and the mean
+frame time of each phase is printed as a scaling curve, together with the frame budget
+and the first battle size that exceeds it.
+
+Example (run from the lib directory, like game_class.py):
+
+    python benchmark_suite.py --ships 2,8,32 --bolts 0,500 --animations 0,500 --output benchmark.json
+
+Game options (see Game.__init__) can be set with --game-option, e.g.
+--game-option broadphase_cell_size=64 --game-option collision_mode=obb'''
+
+import os
+import json
+import time
+import random
+import argparse
+import itertools
+
+# the benchmark never opens a window
+os.environ.setdefault('SDL_VIDEODRIVER','dummy')
+os.environ.setdefault('SDL_AUDIODRIVER','dummy')
+
+import yaml
+import numpy as np
+
+from game_class import Game
+from weapons_classes import ProjectileSprite
+from animation_classes import TrackingAnimation
+
+# phases of the game loop, in the order they run
+PHASES = ('update','draw','collisions')
+
+class BenchmarkBattle(object):
+    '''Synthetic battle of fixed size. Ships are invulnerable, and laser beams and animations
+    are topped up to their target numbers before every frame, so that the number of
+    entities stays (roughly) constant while the frame times are measured.'''
+
+    # lifetime of extra laser beams; long enough that they only disappear when they hit a ship
+    bolt_lifetime_in_seconds = 10 ** 6
+
+    def __init__(self,
+                 n_ships_per_side,
+                 n_bolts,
+                 n_animations,
+                 seed = 0,
+                 **game_kwargs):
+
+        '''Arguments:
+
+            n_ships_per_side: number of AI controlled ships on each side.
+            n_bolts: number of laser beams that are alive in addition to those the ships fire.
+            n_animations: number of looping tracking animations attached to random ships in
+                    addition to the ships' own animations.
+            seed: seed for the placement of bolts and animations and for the AI.
+            **game_kwargs: keyword arguments passed on to the (headless) Game.'''
+
+        self.n_ships_per_side = n_ships_per_side
+        self.n_bolts = n_bolts
+        self.n_animations = n_animations
+
+        # seed all sources of randomness
+        random.seed(seed)
+        np.random.seed(seed)
+
+        # create game and ships
+        self.game = Game(headless = True,
+                         **game_kwargs)
+
+        self.game.setup_squadron_battle(n_ships_per_side,
+                                        n_ships_per_side)
+
+        # make ships invulnerable
+        for ship in self.game.all_ships:
+            ship._hit_points = np.inf
+
+        # create extra laser beams and animations
+        self._bolts = []
+        self._animations = []
+
+        self._top_up()
+
+    def run(self,
+            n_frames,
+            n_warmup_frames = 30):
+        '''Runs the battle for 'n_warmup_frames' unmeasured and 'n_frames' measured frames.
+        Returns a dictionary mapping each phase (and 'total') to an array of frame times in
+        milliseconds.'''
+
+        frame_times = dict((phase, np.zeros(n_frames)) for phase in PHASES + ('total',))
+
+        for frame in range(- n_warmup_frames, n_frames):
+            self._top_up()
+
+            start = time.perf_counter()
+            self.game.update_game_state()
+            after_update = time.perf_counter()
+            self.game.draw_game_state()
+            after_draw = time.perf_counter()
+            self.game.handle_collisions()
+            after_collisions = time.perf_counter()
+
+            if frame >= 0:
+                frame_times['update'][frame] = (after_update - start) * 1000
+                frame_times['draw'][frame] = (after_draw - after_update) * 1000
+                frame_times['collisions'][frame] = (after_collisions - after_draw) * 1000
+                frame_times['total'][frame] = (after_collisions - start) * 1000
+
+        return frame_times
+
+    def get_entity_counts(self):
+        '''Returns the current number of ships, laser beams (sprites and batched) and
+        animations in the game.'''
+
+        n_laser_beams = len(self.game.allied_laser_beams) + len(self.game.hostile_laser_beams)
+
+        if self.game.projectiles is not None:
+            n_laser_beams += self.game.projectiles.n_beams
+
+        # frames and ship ids count as animations, whether drawn as sprites or on the HUD
+        n_animations = len(self.game.animations) + len(self.game.ship_stats)
+
+        if self.game.hud is not None:
+            n_animations += self.game.hud.n_elements
+
+        return {'ships': len(self.game.all_ships),
+                'laser_beams': n_laser_beams,
+                'animations': n_animations}
+
+    def _top_up(self):
+        '''Util function that replaces extra laser beams and animations that are no longer
+        alive.'''
+
+        game = self.game
+        screen_width, screen_height = game.screen.get_size()
+
+        # laser beams; alternate between sides so both sides' ships are hit. Batched extra beams
+        # are told apart from fired ones by their remaining lifetime
+        if game.projectiles is not None:
+            n_alive = int((game.projectiles.lifetime[:game.projectiles.n_beams] > game.fps * self.bolt_lifetime_in_seconds / 2).sum())
+        else:
+            self._bolts = [bolt for bolt in self._bolts if bolt.alive()]
+            n_alive = len(self._bolts)
+
+        for i in range(self.n_bolts - n_alive):
+            center = np.random.uniform((0, 0), (screen_width, screen_height))
+            angle = np.random.uniform(0, 360)
+
+            if i % 2:
+                laser_images, laser_group, side = game.allied_laser_images, game.allied_laser_beams, game.allied_side
+            else:
+                laser_images, laser_group, side = game.hostile_laser_images, game.hostile_laser_beams, game.hostile_side
+
+            if game.projectiles is not None:
+                game.projectiles.spawn(center,
+                                       angle,
+                                       game.laser_speed_in_seconds,
+                                       self.bolt_lifetime_in_seconds,
+                                       side,
+                                       game.projectiles.register_beam_type(laser_images))
+            else:
+                self._bolts.append(ProjectileSprite(game.fps,
+                                                    game.screen,
+                                                    laser_images,
+                                                    self.bolt_lifetime_in_seconds,
+                                                    laser_group,
+                                                    center = center,
+                                                    angle = angle,
+                                                    speed = game.laser_speed_in_seconds,
+                                                    kinematics_world = game.kinematics_world,
+                                                    timer_wheel = game.expiry_timers))
+
+        # animations
+        self._animations = [animation for animation in self._animations if animation.alive()]
+        ships = game.all_ships.sprites()
+
+        for i in range(self.n_animations - len(self._animations)):
+            self._animations.append(TrackingAnimation(game.fps,
+                                                      game.screen,
+                                                      game.engine_images,
+                                                      game.engine_spi,
+                                                      ships[i % len(ships)],
+                                                      np.random.uniform(-20, 20, 2),
+                                                      game.animations,
+                                                      looping = True))
+
+def get_phase_stats(frame_times):
+    '''Returns the mean, 99th percentile and maximum of each phase's frame times.'''
+
+    return dict((phase, {'mean_ms': float(np.mean(times)),
+                         'p99_ms': float(np.percentile(times, 99)),
+                         'max_ms': float(np.max(times))})
+                for phase, times in frame_times.items())
+
+def run_suite(ship_counts,
+              bolt_counts,
+              animation_counts,
+              n_frames = 120,
+              n_warmup_frames = 30,
+              game_kwargs = None,
+              verbose = True):
+    '''Runs a BenchmarkBattle for every combination of the specified numbers of ships per
+    side, extra laser beams and extra animations. Returns a list with one result dictionary
+    per battle size.'''
+
+    game_kwargs = game_kwargs or {}
+    results = []
+
+    for n_ships_per_side, n_bolts, n_animations in itertools.product(ship_counts, bolt_counts, animation_counts):
+        battle = BenchmarkBattle(n_ships_per_side,
+                                 n_bolts,
+                                 n_animations,
+                                 **game_kwargs)
+
+        frame_times = battle.run(n_frames,
+                                 n_warmup_frames)
+
+        result = {'n_ships_per_side': n_ships_per_side,
+                  'n_bolts': n_bolts,
+                  'n_animations': n_animations,
+                  'entity_counts': battle.get_entity_counts(),
+                  'pools': battle.game.get_pool_stats(),
+                  'timers': battle.game.timers.get_stats(),
+                  'phases': get_phase_stats(frame_times)}
+
+        results.append(result)
+
+        if verbose:
+            print('ships/side=' + str(n_ships_per_side) +
+                  ', bolts=' + str(n_bolts) +
+                  ', animations=' + str(n_animations) + ': ' +
+                  ', '.join(phase + ' ' + '{:.2f}/{:.2f}'.format(stats['mean_ms'], stats['p99_ms'])
+                            for phase, stats in result['phases'].items()) +
+                  ' ms (mean/p99)')
+
+    return results
+
+def format_scaling_curves(results,
+                          fps,
+                          width = 50):
+    '''Returns the mean frame time of each phase per battle size as text bar charts, with
+    the frame budget marked as '|' and battles whose p99 total frame time exceeds it marked
+    with '!'. Also reports the first battle size over budget (the crossover point).'''
+
+    frame_budget = 1000 / fps
+    scale_max = max([result['phases']['total']['p99_ms'] for result in results] + [frame_budget])
+    budget_column = int(round(frame_budget / scale_max * width))
+
+    lines = ['Frame budget at ' + str(fps) + ' fps: ' + '{:.2f}'.format(frame_budget) + ' ms']
+
+    for phase in PHASES + ('total',):
+        lines.append('')
+        lines.append(phase + ' (mean ms)')
+
+        for result in results:
+            mean = result['phases'][phase]['mean_ms']
+            bar = list(('#' * int(round(mean / scale_max * width))).ljust(width))
+
+            # mark frame budget
+            if bar[min(budget_column, width - 1)] == ' ':
+                bar[min(budget_column, width - 1)] = '|'
+
+            over_budget = result['phases']['total']['p99_ms'] > frame_budget
+
+            lines.append('{:>5} ships/side {:>6} bolts {:>6} anims '.format(result['n_ships_per_side'],
+                                                                          result['n_bolts'],
+                                                                          result['n_animations']) +
+                         ''.join(bar) + ' {:8.2f}'.format(mean) + (' !' if over_budget else ''))
+
+    # crossover point
+    over_budget_results = [result for result in results if result['phases']['total']['p99_ms'] > frame_budget]
+
+    lines.append('')
+
+    if over_budget_results:
+        result = over_budget_results[0]
+        lines.append('First battle size over budget (p99 total): ' + str(result['n_ships_per_side']) + ' ships/side, ' +
+                     str(result['n_bolts']) + ' bolts, ' + str(result['n_animations']) + ' animations')
+    else:
+        lines.append('All battle sizes within budget (p99 total)')
+
+    return '\n'.join(lines)
+
+def main():
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description = 'STAR WARS DOGFIGHTER scaling benchmark suite')
+    parser.add_argument('--ships',
+                        default = '2,8,32',
+                        help = 'comma separated numbers of ships per side')
+    parser.add_argument('--bolts',
+                        default = '0,200',
+                        help = 'comma separated numbers of extra laser beams')
+    parser.add_argument('--animations',
+                        default = '0,200',
+                        help = 'comma separated numbers of extra tracking animations')
+    parser.add_argument('--frames',
+                        type = int,
+                        default = 120,
+                        help = 'number of measured frames per battle size')
+    parser.add_argument('--warmup',
+                        type = int,
+                        default = 30,
+                        help = 'number of unmeasured frames per battle size')
+    parser.add_argument('--game-option',
+                        action = 'append',
+                        default = [],
+                        help = "Game keyword argument as 'name=value'. Can be repeated")
+    parser.add_argument('--output',
+                        default = 'benchmark_results.json',
+                        help = 'JSON file to write the results to')
+    args = parser.parse_args()
+
+    game_kwargs = {}
+
+    for game_option in args.game_option:
+        name, value = game_option.split('=',1)
+        game_kwargs[name.strip()] = yaml.safe_load(value)
+
+    # output path is relative to where the suite was started
+    output_path = os.path.abspath(args.output)
+
+    # make sure directory is repo head
+    os.chdir('..')
+
+    results = run_suite([int(n) for n in args.ships.split(',')],
+                        [int(n) for n in args.bolts.split(',')],
+                        [int(n) for n in args.animations.split(',')],
+                        n_frames = args.frames,
+                        n_warmup_frames = args.warmup,
+                        game_kwargs = game_kwargs)
+
+    fps = game_kwargs.get('fps', 60)
+
+    with open(output_path,'w') as output_file:
+        json.dump({'game_options': game_kwargs,
+                   'fps': fps,
+                   'n_frames': args.frames,
+                   'n_warmup_frames': args.warmup,
+                   'results': results},
+                  output_file,
+                  indent = 2)
+
+    print('')
+    print(format_scaling_curves(results, fps))
+    print('')
+    print('Results written to ' + output_path)
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains collision detection classes used in the game STAR WARS DOGFIGHTER.
+The SpatialHash class is a uniform grid broadphase that can be used instead of pygame's
+groupcollide: only sprites sharing at least one grid cell are passed on to the (exact)
+mask test. The grid wraps around the screen edges the same way the sprites do, so sprites
+near one edge can collide with sprites near the opposite edge.
+The AnalyticCollider class replaces the mask test with vectorized circle or oriented box
+tests based on per-skin CollisionBounds.'''
+
+from math import ceil
+from pygame.sprite import collide_mask
+
+import pygame as pg
+import numpy as np
+
+def collide_mask_wrapped(left,
+                         right,
+                         world_size):
+    '''Toroidal version of pygame's collide_mask: the offset between the two sprites'
+    rects is wrapped around the world dimensions (tuple (width, height)) before the mask
+    overlap test.'''
+
+    world_w, world_h = world_size
+
+    x_offset = right.rect[0] - left.rect[0]
+    y_offset = right.rect[1] - left.rect[1]
+
+    # take the shortest way around the donut
+    x_offset = (x_offset + world_w // 2) % world_w - world_w // 2
+    y_offset = (y_offset + world_h // 2) % world_h - world_h // 2
+
+    return left.mask.overlap(right.mask, (x_offset, y_offset))
+
+class SpatialHash(object):
+    '''Uniform grid broadphase for collision checks between two sprite groups on a
+    toroidal ('donut topology') screen.'''
+
+    def __init__(self,
+                 world_size,
+                 cell_size = 64):
+
+        '''Arguments:
+
+            world_size: tuple (width, height) of the main screen the game is displayed on.
+            cell_size: edge length of one (square) grid cell in pixels. Should be about as big
+                    as the biggest sprite taking part in collisions. Default is 64.'''
+
+        # attach world dimensions
+        self._world_w, self._world_h = world_size
+
+        # set grid dimensions
+        self._cell_size = cell_size
+        self._n_cols = max(int(ceil(self._world_w / cell_size)),1)
+        self._n_rows = max(int(ceil(self._world_h / cell_size)),1)
+
+        # initialize statistics
+        self.stats = {}
+        self.last_frame_stats = {}
+        self.begin_frame()
+
+    def begin_frame(self):
+        '''Stores the current frame's statistics as 'last_frame_stats' and resets the counters.
+        Should be called once per frame before the first collision check.'''
+
+        self.last_frame_stats = self.stats
+
+        self.stats = {'cells_occupied':0,
+                      'candidate_pairs':0,
+                      'narrowphase_tests':0,
+                      'collisions':0}
+
+    def get_cells(self,
+                  rect):
+        '''Returns a list of (column, row) tuples of all grid cells covered by the specified
+        pygame Rect. The rect is wrapped around the screen edges first, so that the same spot
+        always falls into the same cell, even if the last column and row of the grid are
+        narrower than a cell.'''
+
+        cols = self._get_spanned_cells(rect.left, rect.width, self._world_w, self._n_cols)
+        rows = self._get_spanned_cells(rect.top, rect.height, self._world_h, self._n_rows)
+
+        return [(col, row) for col in cols for row in rows]
+
+    def _get_spanned_cells(self,
+                           start,
+                           length,
+                           world_extent,
+                           n_cells):
+        '''Util function that returns the indices of the grid cells along one axis covered by
+        the pixel span [start, start + length), wrapped around the screen edge. A span that
+        crosses the edge is split in two.'''
+
+        cell_size = self._cell_size
+
+        # spans as wide as the screen cover every cell
+        if length >= world_extent:
+            return range(n_cells)
+
+        # move span start onto the screen; split span if it still crosses the far edge
+        start %= world_extent
+        end = start + max(length, 1)
+
+        if end <= world_extent:
+            return range(start // cell_size, (end - 1) // cell_size + 1)
+
+        return list(range(start // cell_size, n_cells)) + list(range(0, (end - world_extent - 1) // cell_size + 1))
+
+    def collide_mask(self,
+                     left,
+                     right):
+        '''Toroidal version of pygame's collide_mask: the offset between the two sprites'
+        rects is wrapped around the world dimensions before the mask overlap test.'''
+
+        return collide_mask_wrapped(left,
+                                    right,
+                                    (self._world_w, self._world_h))
+
+    def get_candidates(self,
+                       group_a,
+                       group_b):
+        '''Hashes the sprites of 'group_b' into the grid and returns a list of (sprite_a, candidates)
+        tuples, where 'candidates' is the list of sprites of 'group_b' sharing at least one grid
+        cell with 'sprite_a'. Sprites of 'group_a' without candidates are left out.'''
+
+        stats = self.stats
+
+        # build grid for group b
+        grid = {}
+
+        for sprite_b in group_b.sprites():
+            for cell in self.get_cells(sprite_b.rect):
+                if cell in grid:
+                    grid[cell].append(sprite_b)
+                else:
+                    grid[cell] = [sprite_b]
+
+        stats['cells_occupied'] += len(grid)
+
+        # collect candidates for group a sprites from their cells
+        candidates_by_sprite = []
+
+        for sprite_a in group_a.sprites():
+            candidates = set()
+
+            for cell in self.get_cells(sprite_a.rect):
+                if cell in grid:
+                    candidates.update(grid[cell])
+
+            if candidates:
+                stats['candidate_pairs'] += len(candidates)
+                candidates_by_sprite.append((sprite_a, list(candidates)))
+
+        return candidates_by_sprite
+
+    def groupcollide(self,
+                     group_a,
+                     group_b,
+                     dokill_a,
+                     dokill_b,
+                     collided = None):
+        '''Drop-in replacement for pygame's groupcollide. Sprites of 'group_b' are hashed into
+        the grid, then every sprite of 'group_a' is tested against the sprites sharing at least
+        one of its cells. Returns a dictionary mapping every sprite of 'group_a' that collided
+        to a list of the sprites of 'group_b' it collided with. If no 'collided' callback is
+        specified, the toroidal mask test is used.'''
+
+        if collided is None:
+            collided = self.collide_mask
+
+        stats = self.stats
+
+        # check group a sprites against their candidates
+        crashed = {}
+        killed_b = set()
+
+        for sprite_a, candidates in self.get_candidates(group_a, group_b):
+            hits = []
+
+            for sprite_b in candidates:
+                # skip sprites that have already been removed by an earlier hit
+                if sprite_b in killed_b:
+                    continue
+
+                stats['narrowphase_tests'] += 1
+
+                if collided(sprite_a, sprite_b):
+                    hits.append(sprite_b)
+
+            if hits:
+                stats['collisions'] += len(hits)
+                crashed[sprite_a] = hits
+
+                if dokill_b:
+                    for sprite_b in hits:
+                        sprite_b.kill()
+                        killed_b.add(sprite_b)
+
+                if dokill_a:
+                    sprite_a.kill()
+
+        return crashed
+
+class CollisionBounds(object):
+    '''Analytic collision bounds of a sprite skin, derived from the opaque pixels of its
+    first original image: the offset of the opaque pixels' bounding box center w.r.t. the
+    image center, the box's half extents and the radius of the bounding circle around the box
+    center (all at angle 0).'''
+
+    __slots__ = ('radius','half_extents','offset')
+
+    def __init__(self,
+                 original_image):
+
+        mask = pg.mask.from_surface(original_image)
+        image_w, image_h = original_image.get_size()
+
+        bounding_rects = mask.get_bounding_rects()
+
+        if not bounding_rects:
+            # fully transparent image; degenerate to a point
+            self.radius = 0.0
+            self.half_extents = np.zeros(2)
+            self.offset = np.zeros(2)
+
+            return
+
+        box = bounding_rects[0].unionall(bounding_rects[1:])
+
+        # box: half extents and offset of box center from image center
+        self.half_extents = np.array([box.width / 2, box.height / 2])
+        self.offset = np.array([box.left + box.width / 2 - image_w / 2,
+                                box.top + box.height / 2 - image_h / 2])
+
+        # circle: distance from box center to farthest opaque pixel corner
+        outline = np.array(mask.outline() or [box.topleft],dtype='float') + 0.5 # pixel centers
+        distances = np.hypot(outline[:,0] - (box.left + box.width / 2),
+                             outline[:,1] - (box.top + box.height / 2))
+
+        self.radius = float(distances.max()) + 0.5 * np.sqrt(2)
+
+    @classmethod
+    def from_values(cls,
+                    radius,
+                    half_extents,
+                    offset):
+        '''Creates collision bounds from precomputed values (e.g. prebuilt by the asset build
+        pipeline) instead of from an image.'''
+
+        bounds = cls.__new__(cls)
+        bounds.radius = float(radius)
+        bounds.half_extents = np.array(half_extents,dtype='float')
+        bounds.offset = np.array(offset,dtype='float')
+
+        return bounds
+
+    def to_values(self):
+        '''Returns the bounds as a dictionary of plain values, as taken by from_values.'''
+
+        return {'radius': self.radius,
+                'half_extents': self.half_extents.tolist(),
+                'offset': self.offset.tolist()}
+
+class AnalyticCollider(object):
+    '''Vectorized analytic narrowphase that can be used instead of pixel perfect mask tests.
+    All candidate pairs of a group collision check are tested at once with numpy, either as
+    circle vs circle ('circle' mode) or as oriented box vs oriented box ('obb' mode, using a
+    separating axis test). Pairs that pass the analytic test can optionally be refined with
+    a mask test. In audit mode, every candidate pair is also mask tested and disagreements
+    between the two tests are counted.'''
+
+    modes = ('circle','obb')
+
+    def __init__(self,
+                 mode = 'circle',
+                 world_size = None,
+                 refine_with_mask = False,
+                 audit = False):
+
+        '''Arguments:
+
+            mode: 'circle' or 'obb'. See class docstring. Default is 'circle'.
+            world_size: tuple (width, height) of the main screen. If specified, distances
+                    between sprites are wrapped around the screen edges ('donut topology').
+                    Default is None.
+            refine_with_mask: if set, pairs passing the analytic test are only counted as
+                    collisions if they also pass the mask test. Default is False.
+            audit: if set, all candidate pairs are mask tested as well to count
+                    disagreements with the analytic test. Default is False.'''
+
+        if mode not in self.modes:
+            raise ValueError('Collision mode must be one of ' + str(self.modes) + ', but is ' + str(mode))
+
+        self._mode = mode
+        self._world_size = world_size
+        self._refine_with_mask = refine_with_mask
+        self._audit = audit
+
+        # cache of collision bounds, keyed by the id of the sprites' original images sequence
+        self._bounds = {}
+
+        # initialize statistics
+        self.stats = {'analytic_tests':0,
+                      'analytic_hits':0,
+                      'mask_tests':0,
+                      'mask_hits':0,
+                      'audited_pairs':0,
+                      'false_positives':0, # analytic hit, mask miss
+                      'false_negatives':0} # analytic miss, mask hit
+
+    def get_bounds(self,
+                   sprite):
+        '''Returns the CollisionBounds for the specified sprite's original images.'''
+
+        key = id(sprite._original_images)
+        entry = self._bounds.get(key)
+
+        if entry is None:
+            # keep a reference to the images sequence so its id stays valid
+            entry = (sprite._original_images, CollisionBounds(sprite._original_images[0]))
+            self._bounds[key] = entry
+
+        return entry[1]
+
+    def set_bounds(self,
+                   original_images,
+                   bounds):
+        '''Sets the CollisionBounds used for all sprites with the specified original images
+        sequence, e.g. bounds prebuilt by the asset build pipeline.'''
+
+        self._bounds[id(original_images)] = (original_images, bounds)
+
+    def get_disagreement_rate(self):
+        '''Returns the fraction of audited pairs for which the analytic and the mask
+        test disagreed. Returns None if no pairs have been audited yet.'''
+
+        if not self.stats['audited_pairs']:
+            return None
+
+        return (self.stats['false_positives'] + self.stats['false_negatives']) / self.stats['audited_pairs']
+
+    def groupcollide(self,
+                     group_a,
+                     group_b,
+                     dokill_a,
+                     dokill_b,
+                     broadphase = None):
+        '''Drop-in replacement for pygame's groupcollide using the analytic test. If a
+        SpatialHash is specified as 'broadphase', only its candidate pairs are tested;
+        otherwise all pairs are. Returns a dictionary mapping every sprite of 'group_a' that
+        collided to a list of the sprites of 'group_b' it collided with.'''
+
+        # get candidate pairs as index arrays into the sprite lists
+        if broadphase is not None:
+            candidates_by_sprite = broadphase.get_candidates(group_a, group_b)
+
+            sprites_a = [sprite_a for sprite_a, _ in candidates_by_sprite]
+            sprites_b = list(set(sprite_b for _, candidates in candidates_by_sprite for sprite_b in candidates))
+            index_b = dict((sprite_b, i) for i, sprite_b in enumerate(sprites_b))
+
+            pairs_a = [i for i, (_, candidates) in enumerate(candidates_by_sprite) for _ in candidates]
+            pairs_b = [index_b[sprite_b] for _, candidates in candidates_by_sprite for sprite_b in candidates]
+
+            pairs_a, pairs_b = np.array(pairs_a,dtype='int'), np.array(pairs_b,dtype='int')
+        else:
+            sprites_a, sprites_b = group_a.sprites(), group_b.sprites()
+
+            pairs_a, pairs_b = np.divmod(np.arange(len(sprites_a) * len(sprites_b)), max(len(sprites_b),1))
+
+        if not len(pairs_a):
+            return {}
+
+        # analytic test for all pairs at once
+        analytic_hits = self._test(sprites_a, sprites_b, pairs_a, pairs_b)
+
+        self.stats['analytic_tests'] += len(pairs_a)
+        self.stats['analytic_hits'] += int(analytic_hits.sum())
+
+        # audit: mask test every pair and count disagreements
+        if self._audit:
+            for i_a, i_b, analytic_hit in zip(pairs_a.tolist(), pairs_b.tolist(), analytic_hits.tolist()):
+                mask_hit = self._mask_test(sprites_a[i_a], sprites_b[i_b])
+
+                self.stats['audited_pairs'] += 1
+
+                if analytic_hit and not mask_hit:
+                    self.stats['false_positives'] += 1
+                elif mask_hit and not analytic_hit:
+                    self.stats['false_negatives'] += 1
+
+        # collect hits in group a order, optionally refined with mask test
+        crashed = {}
+        killed_b = set()
+
+        for i_a, i_b in zip(pairs_a[analytic_hits].tolist(), pairs_b[analytic_hits].tolist()):
+            sprite_a, sprite_b = sprites_a[i_a], sprites_b[i_b]
+
+            # skip sprites that have already been removed by an earlier hit
+            if sprite_b in killed_b:
+                continue
+
+            if self._refine_with_mask and not self._mask_test(sprite_a, sprite_b):
+                continue
+
+            crashed.setdefault(sprite_a, []).append(sprite_b)
+
+            if dokill_b:
+                killed_b.add(sprite_b)
+
+        for sprite_a, hits in crashed.items():
+            if dokill_b:
+                for sprite_b in hits:
+                    sprite_b.kill()
+
+            if dokill_a:
+                sprite_a.kill()
+
+        return crashed
+
+    def _mask_test(self,
+                   sprite_a,
+                   sprite_b):
+        '''Util function running (and counting) the mask test for one pair.'''
+
+        self.stats['mask_tests'] += 1
+
+        if self._world_size is not None:
+            hit = bool(collide_mask_wrapped(sprite_a, sprite_b, self._world_size))
+        else:
+            hit = bool(collide_mask(sprite_a, sprite_b))
+
+        if hit:
+            self.stats['mask_hits'] += 1
+
+        return hit
+
+    def _test(self,
+              sprites_a,
+              sprites_b,
+              pairs_a,
+              pairs_b):
+        '''Util function that runs the analytic test for all specified pairs at once and
+        returns a boolean array.'''
+
+        # get world positions and local axes of all sprites' bounds
+        centers_a, axes_a, bounds_a = self._get_placed_bounds(sprites_a)
+        centers_b, axes_b, bounds_b = self._get_placed_bounds(sprites_b)
+
+        delta = self._wrap(centers_b[pairs_b] - centers_a[pairs_a])
+
+        # circle mode: compare distance of bounds centers to sum of radii
+        if self._mode == 'circle':
+            radius_a = np.array([bounds.radius for bounds in bounds_a])
+            radius_b = np.array([bounds.radius for bounds in bounds_b])
+
+            return (delta ** 2).sum(axis = 1) <= (radius_a[pairs_a] + radius_b[pairs_b]) ** 2
+
+        # oriented box mode: separating axis test on both boxes' local axes
+        half_extents_a = np.array([bounds.half_extents for bounds in bounds_a])[pairs_a]
+        half_extents_b = np.array([bounds.half_extents for bounds in bounds_b])[pairs_b]
+
+        pair_axes_a = axes_a[pairs_a] # shape (n_pairs, 2 axes, 2 coordinates)
+        pair_axes_b = axes_b[pairs_b]
+
+        overlapping = np.ones(len(pairs_a),dtype='bool')
+
+        for pair_axes in (pair_axes_a, pair_axes_b):
+            for i_axis in range(2):
+                axis = pair_axes[:,i_axis]
+
+                # projected half widths of both boxes and projected center distance
+                extent_a = (half_extents_a * np.abs((pair_axes_a * axis[:,None,:]).sum(axis = 2))).sum(axis = 1)
+                extent_b = (half_extents_b * np.abs((pair_axes_b * axis[:,None,:]).sum(axis = 2))).sum(axis = 1)
+                distance = np.abs((delta * axis).sum(axis = 1))
+
+                overlapping &= distance <= extent_a + extent_b
+
+        return overlapping
+
+    def _get_placed_bounds(self,
+                           sprites):
+        '''Util function that returns the world coordinates of the bounds centers (shape (n,2)),
+        the bounds' local x and y axes in world coordinates (shape (n,2,2)) and the list of
+        CollisionBounds of the specified sprites.'''
+
+        bounds = [self.get_bounds(sprite) for sprite in sprites]
+
+        centers = np.array([sprite._center for sprite in sprites],dtype='float')
+        offsets = np.array([sprite_bounds.offset for sprite_bounds in bounds])
+
+        # rotate counter-clockwise (y-axis pointing down), as in TrackingAnimation._get_rotated_offset
+        radian_angles = np.radians([sprite._angle for sprite in sprites])
+        cosines, sines = np.cos(radian_angles), np.sin(radian_angles)
+
+        axis_x = np.stack([cosines, - sines],axis = 1)
+        axis_y = np.stack([sines, cosines],axis = 1)
+
+        centers += axis_x * offsets[:,:1] + axis_y * offsets[:,1:]
+
+        return centers, np.stack([axis_x, axis_y],axis = 1), bounds
+
+    def _wrap(self,
+              delta):
+        '''Util function that wraps an array of distance vectors around the world dimensions,
+        if specified.'''
+
+        if self._world_size is None:
+            return delta
+
+        world_size = np.array(self._world_size,dtype='float')
+
+        return (delta + world_size / 2) % world_size - world_size / 2
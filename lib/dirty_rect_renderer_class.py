@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the DirtyRectRenderer class used in the game STAR WARS DOGFIGHTER.
+Instead of repainting the whole background and flipping the whole display every frame,
+the renderer only restores the background where sprites were drawn in the previous frame
+and only pushes the regions drawn to in the previous and the current frame to the display.
+When the dirty regions cover too large a part of the screen, it falls back to a full
+repaint and flip, which is cheaper in that case.'''
+
+import pygame as pg
+
+class DirtyRectRenderer(object):
+    '''Tracks the screen regions drawn to per frame and updates only those.'''
+
+    def __init__(self,
+                 screen,
+                 background_image,
+                 full_flip_threshold = 0.4):
+
+        '''Arguments:
+
+            screen: the main screen the game is displayed on (pygame Surface).
+            background_image: pygame Surface drawn at the top left corner of the screen
+                    underneath all sprites.
+            full_flip_threshold: share of the screen area. If the dirty regions of a frame
+                    add up to more than this, the whole screen is repainted and flipped.'''
+
+        self._screen = screen
+        self._background_image = background_image
+        self._screen_rect = screen.get_rect()
+        self._screen_area = self._screen_rect.width * self._screen_rect.height
+        self.full_flip_threshold = full_flip_threshold
+
+        # regions drawn to in the previous frame, and whether the next frame repaints everything
+        self._previous_rects = []
+        self._full_repaint = True
+
+        # initialize statistics
+        self.n_full_flips = 0
+        self.n_partial_updates = 0
+        self.last_dirty_share = 1.0
+
+    def restore_background(self):
+        '''Paints the background over the regions drawn to in the previous frame, or over the
+        whole screen if a full repaint is due. Call before drawing the frame's sprites.'''
+
+        if self._full_repaint:
+            self._screen.blit(self._background_image,(0,0))
+        else:
+            self._screen.blits([(self._background_image, rect, rect) for rect in self._previous_rects],
+                               doreturn = False)
+
+    def update_display(self,
+                       groups,
+                       extra_rects = ()):
+        '''Pushes this frame's drawing to the display. Call after drawing all sprite groups.
+
+        Arguments:
+
+            groups: sequence of pygame Groups drawn this frame. Their drawn regions are read
+                    from the groups, so they must have been drawn with Group.draw.
+            extra_rects: regions drawn to this frame by other means (e.g. batched laser beams,
+                    overlays, a RenderQueue).'''
+
+        screen_rect = self._screen_rect
+
+        # get this frame's regions, clipped to the screen
+        current_rects = [rect for group in groups for rect in group.spritedict.values() if rect]
+        current_rects.extend(screen_rect.clip(rect) for rect in extra_rects)
+
+        current_share = sum(rect.width * rect.height for rect in current_rects) / self._screen_area
+
+        # push dirty regions, or the whole screen if they cover too much of it. Overlapping
+        # regions are counted twice; good enough to decide on a full flip
+        if self._full_repaint:
+            dirty_share = 1.0
+        else:
+            dirty_rects = self._previous_rects + current_rects
+            dirty_share = sum(rect.width * rect.height for rect in dirty_rects) / self._screen_area
+
+        self.last_dirty_share = dirty_share
+
+        if self._full_repaint or dirty_share > self.full_flip_threshold:
+            pg.display.flip()
+            self.n_full_flips += 1
+        else:
+            pg.display.update(dirty_rects)
+            self.n_partial_updates += 1
+
+        self._previous_rects = current_rects
+
+        # next frame's dirty regions are this frame's plus the next frame's, which will be
+        # about the same size. If they'll be too large, repaint the whole screen right away
+        self._full_repaint = 2 * current_share > self.full_flip_threshold
+
+    def invalidate(self):
+        '''Makes the next frame repaint and flip the whole screen, e.g. after something was
+        drawn to the screen without the renderer's knowledge.'''
+
+        self._full_repaint = True
+
+    def get_stats(self):
+        '''Returns the renderer's statistics.'''
+
+        return {'full_flips': self.n_full_flips,
+                'partial_updates': self.n_partial_updates,
+                'last_dirty_share': self.last_dirty_share}
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the EngineServices class used in the game STAR WARS DOGFIGHTER. The
+game creates a number of optional engine services (the kinematics world, the projectile
+manager, the sprite pools, the weapons system and so on) that every ship it spawns needs to
+know about. Instead of passing each of them to the ship sprites separately, the game bundles
+them into one EngineServices object that is handed to every ship.'''
+
+class EngineServices(object):
+    '''Bundle of the engine services used by ship sprites. Services that are None are not used.'''
+
+    def __init__(self,
+                 kinematics_world = None,
+                 projectile_manager = None,
+                 game_clock = None,
+                 timer_wheel = None,
+                 attachment_registry = None,
+                 weapons_system = None,
+                 target_selector = None,
+                 projectile_pool = None,
+                 muzzle_flash_pool = None):
+
+        '''Arguments:
+
+            kinematics_world: KinematicsWorld object that integrates the positional attributes
+                    of the ships as well as those of their laser beams and explosion animations.
+            projectile_manager: ProjectileManager object. If specified, laser beams fired by the
+                    ships are added to the manager instead of being created as ProjectileSprites.
+            game_clock: GameClock object that the ships' laser cannons read to pace their fire.
+                    If None, cannons are paced with pygame's wall clock.
+            timer_wheel: TimerWheel object. If specified, the ships' muzzle flashes, laser beams
+                    and explosions register their expiry with it.
+            attachment_registry: AttachmentRegistry object. If specified, the ships' gun offsets
+                    are registered with it, and the tracking animations attached to the ships are
+                    positioned (and killed with them) by the registry.
+            weapons_system: WeaponsSystem object. If specified, the ships' laser cannons and fire
+                    modes are added to it, and the weapons system decides when the ships fire
+                    (once per frame, for all ships at once) instead of their update methods.
+            target_selector: TargetSelector object used by AI ships to acquire targets. If None,
+                    AI ships select random targets from their hostile ships group.
+            projectile_pool: SpritePool of ProjectileSprites. If specified, laser beams fired by
+                    the ships are taken from the pool instead of being created.
+            muzzle_flash_pool: SpritePool of TrackingAnimations. If specified, muzzle flashes are
+                    taken from the pool instead of being created.'''
+
+        self.kinematics_world = kinematics_world
+        self.projectile_manager = projectile_manager
+        self.game_clock = game_clock
+        self.timer_wheel = timer_wheel
+        self.attachment_registry = attachment_registry
+        self.weapons_system = weapons_system
+        self.target_selector = target_selector
+        self.projectile_pool = projectile_pool
+        self.muzzle_flash_pool = muzzle_flash_pool
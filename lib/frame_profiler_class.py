@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the FrameProfiler class used in the game STAR WARS DOGFIGHTER. The
+game loop marks the end of each of its phases (event handling, the update and draw calls
+of every sprite group, collision handling, flipping the display and waiting for the next
+frame) with the profiler, which attributes the time since the previous mark to that phase.
+Rolling statistics over the last frames and the current entity counts can be read with
+get_stats and get_entity_counts, or shown on screen as an overlay.'''
+
+from time import perf_counter
+
+import pygame as pg
+import numpy as np
+
+class FrameProfiler(object):
+    '''Per-phase frame time profiler with rolling mean, 95th percentile and maximum. While
+    disabled, marking a phase returns right away.'''
+
+    def __init__(self,
+                 window = 120,
+                 enabled = False,
+                 overlay_refresh_frames = 15):
+
+        '''Arguments:
+
+            window: number of most recent frames the rolling statistics are computed over.
+            enabled: if set, phases are timed from the start. Can be changed at any time.
+            overlay_refresh_frames: number of frames between two redraws of the overlay.'''
+
+        self.window = window
+        self.enabled = enabled
+        self.show_overlay = False
+        self._overlay_refresh_frames = overlay_refresh_frames
+
+        # ring buffers of phase times in milliseconds, in order of first appearance
+        self._phase_times = {}
+        self._n_frames = 0 # number of recorded frames
+
+        # current frame
+        self._current_times = {}
+        self._last_mark = None
+
+        # latest entity counts
+        self._entity_counts = {}
+
+        # overlay
+        self._font = None
+        self._overlay = None
+
+    def begin_frame(self):
+        '''Starts timing a new frame.'''
+
+        if not self.enabled:
+            return
+
+        self._current_times = {}
+        self._last_mark = perf_counter()
+
+    def mark(self,
+             phase):
+        '''Attributes the time since the previous mark (or the start of the frame) to the
+        specified phase. Phases marked several times in one frame are added up.'''
+
+        if not self.enabled or self._last_mark is None:
+            return
+
+        now = perf_counter()
+        self._current_times[phase] = self._current_times.get(phase, 0) + (now - self._last_mark) * 1000
+        self._last_mark = now
+
+    def end_frame(self,
+                  entity_counts = None):
+        '''Records the current frame's phase times and the specified entity counts (dictionary
+        mapping names to numbers of entities).'''
+
+        if not self.enabled or self._last_mark is None:
+            return
+
+        slot = self._n_frames % self.window
+
+        # phases not marked in this frame took no time
+        for phase, times in self._phase_times.items():
+            times[slot] = self._current_times.get(phase, 0)
+
+        for phase, phase_time in self._current_times.items():
+            if phase not in self._phase_times:
+                self._phase_times[phase] = np.zeros(self.window)
+                self._phase_times[phase][slot] = phase_time
+
+        self._n_frames += 1
+        self._last_mark = None
+
+        if entity_counts is not None:
+            self._entity_counts = entity_counts
+
+        # redraw overlay if needed
+        if self.show_overlay and (self._overlay is None or self._n_frames % self._overlay_refresh_frames == 0):
+            self._overlay = self._render_overlay()
+
+    def get_stats(self):
+        '''Returns a dictionary mapping each phase (and 'total') to its mean, 95th percentile
+        and maximum time in milliseconds over the last frames.'''
+
+        n = min(self._n_frames, self.window)
+
+        if not n:
+            return {}
+
+        stats = {}
+
+        for phase, times in list(self._phase_times.items()) + [('total', sum(self._phase_times.values()))]:
+            recent_times = times[:n]
+            stats[phase] = {'mean_ms': float(recent_times.mean()),
+                            'p95_ms': float(np.percentile(recent_times, 95)),
+                            'max_ms': float(recent_times.max())}
+
+        return stats
+
+    def get_entity_counts(self):
+        '''Returns the entity counts recorded with the last frame.'''
+
+        return dict(self._entity_counts)
+
+    def reset(self):
+        '''Discards all recorded frames.'''
+
+        self._phase_times = {}
+        self._n_frames = 0
+        self._overlay = None
+
+    def toggle_overlay(self):
+        '''Shows or hides the overlay. Showing the overlay enables the profiler.'''
+
+        self.show_overlay = not self.show_overlay
+        self._overlay = None
+
+        if self.show_overlay:
+            self.enabled = True
+
+    def draw_overlay(self,
+                     surface,
+                     position = (10,10)):
+        '''Draws the overlay onto the specified surface if it is shown. Returns the region
+        drawn to as a pygame Rect, or None if nothing was drawn.'''
+
+        if self.show_overlay and self._overlay is not None:
+            return surface.blit(self._overlay, position)
+
+        return None
+
+    def get_blit_sequence(self,
+                          view_rect = None,
+                          position = (10,10)):
+        '''Returns the overlay's blit at the specified position as a list (as taken by
+        Surface.blits) if it is shown, otherwise an empty list (see RenderQueue.add_source).
+        The view region is ignored; the overlay is always on screen.'''
+
+        if self.show_overlay and self._overlay is not None:
+            return [(self._overlay, position)]
+
+        return []
+
+    def _render_overlay(self):
+        '''Util function that renders the current statistics and entity counts as a table onto
+        a semi-transparent surface.'''
+
+        if self._font is None:
+            self._font = pg.font.Font('freesansbold.ttf',12)
+
+        # table rows
+        rows = [['phase','mean','p95','max [ms]']]
+
+        for phase, phase_stats in self.get_stats().items():
+            rows.append([phase] + ['{:.2f}'.format(phase_stats[key]) for key in ('mean_ms','p95_ms','max_ms')])
+
+        if self._entity_counts:
+            rows.append([''])
+            rows.extend([name, str(count)] for name, count in self._entity_counts.items())
+
+        # render cells and get column positions
+        cell_surfaces = [[self._font.render(cell, True, (254,254,254)) for cell in row] for row in rows]
+
+        n_columns = max(len(row) for row in rows)
+        column_widths = [max(row[i].get_width() for row in cell_surfaces if len(row) > i) + 10 for i in range(n_columns)]
+        column_positions = np.cumsum([5] + column_widths[:-1])
+
+        # draw table
+        line_height = self._font.get_linesize()
+        overlay = pg.Surface((sum(column_widths) + 10,
+                              line_height * len(rows) + 10))
+        overlay.set_alpha(180)
+
+        for i, row in enumerate(cell_surfaces):
+            for cell_surface, column_position in zip(row, column_positions):
+                overlay.blit(cell_surface, (int(column_position), 5 + i * line_height))
+
+        return overlay
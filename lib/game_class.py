@@ -8,44 +8,356 @@ Created on Sun May 27 22:09:47 2018
 # demo gam states here
 import sys
 import os
-import yaml
+import time
+import argparse
 
 import pygame as pg
 import numpy as np
 
 from pygame.sprite import Group, collide_mask, groupcollide
 from sprite_classes import ShipSprite, AIShipSprite
-from animation_classes import TrackingAnimation
+from weapons_classes import ProjectileManager, ProjectileSprite
+from collision_classes import SpatialHash, AnalyticCollider
+from ai_classes import AISensors, TargetSelector
+from animation_classes import TrackingAnimation, AnimationGroup
+from rotation_cache_class import RotationCache, MaskCounter
+from kinematics_world_class import KinematicsWorld
+from attachment_registry_class import AttachmentRegistry
+from weapons_system_class import WeaponsSystem
+from timer_wheel_class import TimerWheel
+from hud_renderer_class import HudRenderer
+from sprite_pool_class import SpritePool
+from engine_services_class import EngineServices
+from game_clock_classes import GameClock
+from frame_profiler_class import FrameProfiler
+from dirty_rect_renderer_class import DirtyRectRenderer
+from render_queue_class import RenderQueue
+from asset_registry_class import AssetRegistry
+from asset_bundle_class import AssetBundle, get_prebuilt_bundle
+
+class BattleResults(object):
+    '''Outcome of a (headless) simulated battle.'''
+    
+    def __init__(self,
+                 winner,
+                 n_frames,
+                 fps,
+                 wall_time,
+                 n_allied_ships,
+                 n_hostile_ships,
+                 shots_fired = (0, 0),
+                 n_hits = (0, 0)):
+        
+        '''Arguments:
+            
+            winner: 'allied' or 'hostile' if the other side was eliminated, 'draw' if both
+                    sides were eliminated, or None if both sides still had ships left when
+                    the simulation stopped.
+            n_frames: number of simulated frames.
+            fps: frames per second of the simulated game. Used to convert frames to game time.
+            wall_time: real time the simulation took in seconds.
+            n_allied_ships: number of allied ships left at the end.
+            n_hostile_ships: number of hostile ships left at the end.
+            shots_fired: number of laser beams fired by the allied and hostile side.
+            n_hits: number of laser beams of the allied and hostile side that hit a ship.'''
+        
+        self.winner = winner
+        self.n_frames = n_frames
+        self.game_time = n_frames / fps
+        self.wall_time = wall_time
+        self.n_allied_ships = n_allied_ships
+        self.n_hostile_ships = n_hostile_ships
+        self.allied_shots_fired, self.hostile_shots_fired = shots_fired
+        self.allied_hits, self.hostile_hits = n_hits
+        
+    def get_speedup(self):
+        '''Returns the ratio of simulated game time to real time.'''
+        
+        if not self.wall_time:
+            return np.inf
+        
+        return self.game_time / self.wall_time
+    
+    def get_hit_ratio(self,
+                      side = None):
+        '''Returns the share of laser beams fired by the specified side ('allied' or 'hostile';
+        both if None) that hit a ship, or None if no laser beams were fired.'''
+        
+        if side == 'allied':
+            shots_fired, n_hits = self.allied_shots_fired, self.allied_hits
+        elif side == 'hostile':
+            shots_fired, n_hits = self.hostile_shots_fired, self.hostile_hits
+        else:
+            shots_fired = self.allied_shots_fired + self.hostile_shots_fired
+            n_hits = self.allied_hits + self.hostile_hits
+            
+        if not shots_fired:
+            return None
+        
+        return n_hits / shots_fired
+    
+    def to_dict(self):
+        '''Returns the results as a flat dictionary, e.g. to be stored as a table row.'''
+        
+        return {'winner': self.winner,
+                'n_frames': self.n_frames,
+                'game_time': self.game_time,
+                'wall_time': self.wall_time,
+                'n_allied_ships': self.n_allied_ships,
+                'n_hostile_ships': self.n_hostile_ships,
+                'allied_shots_fired': self.allied_shots_fired,
+                'hostile_shots_fired': self.hostile_shots_fired,
+                'allied_hits': self.allied_hits,
+                'hostile_hits': self.hostile_hits,
+                'hit_ratio': self.get_hit_ratio()}
+        
+    def __repr__(self):
+        
+        return ('BattleResults(winner=' + str(self.winner) +
+                ', n_frames=' + str(self.n_frames) +
+                ', game_time=' + str(round(self.game_time,2)) +
+                ', wall_time=' + str(round(self.wall_time,3)) +
+                ', n_allied_ships=' + str(self.n_allied_ships) +
+                ', n_hostile_ships=' + str(self.n_hostile_ships) +
+                ', shots_fired=' + str(self.allied_shots_fired + self.hostile_shots_fired) +
+                ', hit_ratio=' + str(self.get_hit_ratio()) + ')')
 
 class Game(object):
     
+    # side ids used by the projectile manager
+    allied_side = 0
+    hostile_side = 1
+    
     def __init__(self,
                  screen_width=1500,
                  screen_height=700,
                  fps=60,
-                 background_image = None):
-        '''Initializes the game object and also the game'''
+                 background_image = None,
+                 angle_resolution = 1,
+                 vectorized_kinematics = True,
+                 batched_projectiles = False,
+                 broadphase_cell_size = None,
+                 collision_mode = 'mask',
+                 collision_mask_refinement = False,
+                 collision_audit = False,
+                 batched_ai_sensors = True,
+                 batched_attachments = True,
+                 batched_weapons = True,
+                 scheduled_expiry = True,
+                 respawn_delay_in_seconds = None,
+                 target_policy = 'random',
+                 fixed_timestep = False,
+                 render_fps = None,
+                 profile = False,
+                 dirty_rects = False,
+                 dirty_area_threshold = 0.4,
+                 batched_draw = True,
+                 projectile_pool_size = None,
+                 muzzle_flash_pool_size = None,
+                 static_hud = True,
+                 hud_health_bars = False,
+                 hud_scoreboard = False,
+                 asset_bundle = None,
+                 headless = False):
+        '''Initializes the game object and also the game.
+        
+        Arguments:
+            
+            screen_width: width of the main screen in pixels. Default is 1500.
+            screen_height: height of the main screen in pixels. Default is 700.
+            fps: frames per second of the game, i.e. simulation steps per second. Default is 60.
+            background_image: not used; the background is loaded from the asset registry.
+            angle_resolution: width (in degrees) of the angle buckets used to cache rotated
+                    sprite images. Default is 1.
+            vectorized_kinematics: if set, the positional attributes of all ships, laser beams
+                    and explosions are integrated by a KinematicsWorld in two vectorized steps per
+                    frame: one for the ships once they have been steered, one for everything else
+                    once the ships have fired. Default is True.
+            batched_projectiles: if set, laser beams are handled as array rows by a
+                    ProjectileManager instead of as individual ProjectileSprites. The manager
+                    checks them for hits itself, so this can't be combined with
+                    'broadphase_cell_size' or a 'collision_mode' other than 'mask'. Default is False.
+            broadphase_cell_size: if specified, collisions between ships and laser beam sprites are
+                    checked with a SpatialHash of that cell size instead of pygame's groupcollide.
+                    Default is None.
+            collision_mode: narrowphase collision test; 'mask' (pixel perfect), or the analytic
+                    'circle' or 'obb' tests of the AnalyticCollider. Default is 'mask'.
+            collision_mask_refinement: if set, hits of the analytic tests are refined with a mask
+                    test. Default is False.
+            collision_audit: if set, the analytic tests are audited against the mask test.
+                    Default is False.
+            batched_ai_sensors: if set, the radar readings of all AI ships are computed in one
+                    vectorized AISensors pass per frame. Default is True.
+            batched_attachments: if set, the animations attached to ships (engine flames, muzzle
+                    flashes, frames and ids) and the ships' gun tips are positioned by an
+                    AttachmentRegistry in one batched pass per frame. Default is True.
+            batched_weapons: if set, a WeaponsSystem decides which ships fire and paces all laser
+                    cannons in one vectorized pass per frame, after the ships have updated.
+                    Default is True.
+            scheduled_expiry: if set, laser beam sprites, muzzle flashes and explosions register
+                    their expiry with the game's TimerWheel (see 'timers') instead of checking
+                    their lifetime every frame. Default is True.
+            respawn_delay_in_seconds: if specified, ships shot down in the interactive game are
+                    respawned after that delay. Default is None (no respawns).
+            target_policy: TargetSelector policy AI ships use to acquire targets ('random',
+                    'nearest', 'weakest' or 'least_engaged'). If None, AI ships pick random
+                    targets on their own. Default is 'random'.
+            fixed_timestep: if set, the main loop draws at 'render_fps' and runs as many
+                    simulation steps of 1/'fps' seconds in between as real time has passed.
+                    Weapon cooldowns are always paced by a GameClock that advances one frame per
+                    simulation step. Default is False.
+            render_fps: frames drawn per second with 'fixed_timestep'. Default is None ('fps').
+            profile: if set, the time spent in each phase of the main loop is recorded by a
+                    FrameProfiler from the start (pressing 'p' shows the profiler's overlay and
+                    enables it in any case), and the startup time is printed when the
+                    interactive game starts. Default is False.
+            dirty_rects: if set, a DirtyRectRenderer only repaints and updates the screen regions
+                    sprites were drawn to. Default is False.
+            dirty_area_threshold: share of the screen above which the DirtyRectRenderer repaints
+                    and updates the whole screen instead. Default is 0.4.
+            batched_draw: if set, a RenderQueue collects the images of all sprite groups, the
+                    batched laser beams, the HUD and the profiler overlay by z-layer and draws
+                    them with one Surface.blits call per frame, skipping images entirely outside
+                    the screen. Default is True.
+            projectile_pool_size: if specified, laser beam sprites are reused from a prewarmed
+                    SpritePool of that size instead of being created for every shot (see
+                    get_pool_stats). Default is None.
+            muzzle_flash_pool_size: as 'projectile_pool_size', for muzzle flashes. Default is None.
+            static_hud: if set, ship frames and ids are drawn by a HudRenderer in one batched blit
+                    per frame instead of as TrackingAnimations. Default is True.
+            hud_health_bars: if set, the HUD shows the ships' health bars. Default is False.
+            hud_scoreboard: if set, the HUD shows a scoreboard. Default is False.
+            asset_bundle: if specified, meta data, images and sounds are loaded from the
+                    AssetBundle at that path instead of the loose files. Either way, the time
+                    taken to set up the game is stored as 'startup_time' (in seconds).
+                    Default is None.
+            headless: if set, no window is opened and the main game loop is not started; use
+                    setup_battle and simulate to run battles as fast as possible instead.
+                    Default is False.'''
+        
+        # time startup
+        startup_start = time.perf_counter()
+        
+        # use dummy video and audio drivers in headless mode; must happen before pg.init
+        self.headless = headless
+        
+        if headless:
+            os.environ.setdefault('SDL_VIDEODRIVER','dummy')
+            os.environ.setdefault('SDL_AUDIODRIVER','dummy')
         
         # initialize pygame (handles pretty much eveything)
         pg.init()
         
+        # set angle resolution for all rotation caches created from here on
+        RotationCache.default_angle_resolution = angle_resolution
+        
         # create clock    
         self.clock = pg.time.Clock()
         
-        self.background_image = pg.image.load('./graphics/misc/star_wars_background_24bit.bmp')
+        # create simulation clock and set timestep mode
+        self.game_clock = GameClock(fps)
+        self.fixed_timestep = fixed_timestep
+        self.render_fps = render_fps if render_fps is not None else fps
+        self.max_steps_per_render = 5
+        
+        # create timer wheel keyed on the simulation frame; expiring sprites use it if needed
+        self.timers = TimerWheel(self.game_clock.frame)
+        self.expiry_timers = self.timers if scheduled_expiry else None
+        self.respawn_delay_in_frames = int(round(respawn_delay_in_seconds * fps)) if respawn_delay_in_seconds is not None else None
+        
+        # create frame profiler
+        self.profiler = FrameProfiler(enabled = profile)
+        
         self.fps = fps
         
         # initialize main screen
         size = screen_width, screen_height # set screen size
         self.screen = pg.display.set_mode(size)
         
-        # load meta data
-        with open('./meta/sprite_skins_meta_data.yaml','r') as skins_meta_file:
-            skins_meta_data = yaml.load(skins_meta_file)
+        # create asset registry (on the asset bundle if specified); loads meta data. Images are
+        # converted to the display's pixel format, so this needs to happen after the display mode is set
+        if asset_bundle is not None:
+            self.assets = AssetRegistry(bundle = AssetBundle(asset_bundle))
+        else:
+            self.assets = AssetRegistry()
         
-        with open('./meta/animations_meta_data.yaml','r') as animations_meta_file:
-            animations_meta_data = yaml.load(animations_meta_file)
+        self.background_image = self.assets.get_image('./graphics/misc/star_wars_background_24bit.bmp',
+                                                      transparent = False)
         
+        # create dirty rectangle renderer if needed
+        if dirty_rects:
+            self.renderer = DirtyRectRenderer(self.screen,
+                                              self.background_image,
+                                              dirty_area_threshold)
+        else:
+            self.renderer = None
+        
+        # create HUD renderer if needed
+        if static_hud:
+            self.hud = HudRenderer(self.screen,
+                                   health_bars = hud_health_bars,
+                                   scoreboard_font = self.assets.get_font(size = 16) if hud_scoreboard else None)
+        else:
+            self.hud = None
+        
+        # create kinematics world if needed
+        if vectorized_kinematics:
+            self.kinematics_world = KinematicsWorld(size)
+        else:
+            self.kinematics_world = None
+            
+        # create projectile manager if needed. Batched laser beams are checked for hits by the
+        # manager itself, so the collision options would silently have no effect
+        if batched_projectiles and (broadphase_cell_size is not None or collision_mode != 'mask'):
+            raise ValueError('Batched projectiles check collisions themselves and can not be combined with ' +
+                             'broadphase_cell_size or a collision_mode other than mask')
+            
+        if batched_projectiles:
+            self.projectiles = ProjectileManager(self.fps,
+                                                 self.screen)
+        else:
+            self.projectiles = None
+            
+        # create collision broadphase if needed
+        if broadphase_cell_size is not None:
+            self.broadphase = SpatialHash(size,
+                                          broadphase_cell_size)
+        else:
+            self.broadphase = None
+            
+        # create analytic collider if needed; wrap distances only if the broadphase does as well
+        if collision_mode != 'mask':
+            self.collider = AnalyticCollider(collision_mode,
+                                             world_size = size if broadphase_cell_size is not None else None,
+                                             refine_with_mask = collision_mask_refinement,
+                                             audit = collision_audit)
+        else:
+            self.collider = None
+            
+        # create AI sensor stage if needed
+        if batched_ai_sensors:
+            self.ai_sensors = AISensors()
+        else:
+            self.ai_sensors = None
+            
+        # create attachment registry if needed
+        if batched_attachments:
+            self.attachments = AttachmentRegistry()
+        else:
+            self.attachments = None
+            
+        # create weapons system if needed
+        if batched_weapons:
+            self.weapons = WeaponsSystem(self.game_clock)
+        else:
+            self.weapons = None
+            
+        # create target selector if needed
+        if target_policy is not None:
+            self.target_selector = TargetSelector(size,
+                                                  target_policy)
+        else:
+            self.target_selector = None
         
         # set player and enemy ship and laser types
         allied_ship, allied_laser = 'tieinterceptor', 'green'
@@ -54,16 +366,11 @@ class Game(object):
         # set game attributes from meta data for player
         
         # skin specific
-        self.allied_images = [pg.image.load(image_path) for image_path in skins_meta_data[allied_ship]['image_paths']]
-        self.allied_gun_offsets = np.array(skins_meta_data[allied_ship]['gun_offsets']).astype('float')
-        self.allied_engine_offsets = np.array(skins_meta_data[allied_ship]['engine_offsets']).astype('float')
-        self.allied_fire_modes = skins_meta_data[allied_ship]['fire_modes']
+        self.allied_images, self.allied_gun_offsets, self.allied_engine_offsets, self.allied_fire_modes = self.assets.get_skin(allied_ship)
         
         # laser specific
-        self.allied_laser_images = [pg.image.load(image_path) for image_path in skins_meta_data[allied_laser]['image_paths']]
-        self.allied_laser_sound = pg.mixer.Sound(animations_meta_data[allied_laser]['sound'])
-        self.allied_muzzle_images = [pg.image.load(image_path) for image_path in animations_meta_data[allied_laser]['image_paths']]
-        self.allied_muzzle_spi = animations_meta_data[allied_laser]['spi']
+        self.allied_laser_images = self.assets.get_skin(allied_laser)[0]
+        self.allied_muzzle_images, self.allied_laser_sound, self.allied_muzzle_spi = self.assets.get_animation(allied_laser)
         
         
         # set game attributes from meta data for enemies
@@ -72,28 +379,67 @@ class Game(object):
         self.piloting_cone_sine = 0.1
         self.gunning_cone_sine = 0.1
         
+        # laser cannon specs for all ships
+        self.laser_range_in_seconds = 1.2
+        self.laser_speed_in_seconds = 150
+        self.laser_rate_in_seconds = 1.5
+        
         # skin specific
-        self.hostile_images = [pg.image.load(image_path) for image_path in skins_meta_data[hostile_ship]['image_paths']]
-        self.hostile_gun_offsets = np.array(skins_meta_data[hostile_ship]['gun_offsets']).astype('float')
-        self.hostile_engine_offsets = np.array(skins_meta_data[hostile_ship]['engine_offsets']).astype('float')
-        self.hostile_fire_modes = skins_meta_data[hostile_ship]['fire_modes']
+        self.hostile_images, self.hostile_gun_offsets, self.hostile_engine_offsets, self.hostile_fire_modes = self.assets.get_skin(hostile_ship)
         
         # laser specific
-        self.hostile_laser_images = [pg.image.load(image_path) for image_path in skins_meta_data[hostile_laser]['image_paths']]
-        self.hostile_laser_sound = pg.mixer.Sound(animations_meta_data[hostile_laser]['sound'])
-        self.hostile_muzzle_images = [pg.image.load(image_path) for image_path in animations_meta_data[hostile_laser]['image_paths']]
-        self.hostile_muzzle_spi = animations_meta_data[hostile_laser]['spi']
+        self.hostile_laser_images = self.assets.get_skin(hostile_laser)[0]
+        self.hostile_muzzle_images, self.hostile_laser_sound, self.hostile_muzzle_spi = self.assets.get_animation(hostile_laser)
         
         # load universal game animation attributes from meta data
         
         # explosion
-        self.explosion_images = [pg.image.load(image_path) for image_path in animations_meta_data['explosion']['image_paths']]
-        self.explosion_sound = pg.mixer.Sound(animations_meta_data['explosion']['sound'])
-        self.explosion_spi = animations_meta_data['explosion']['spi']
+        self.explosion_images, self.explosion_sound, self.explosion_spi = self.assets.get_animation('explosion')
         
         # engine flame
-        self.engine_images = [pg.image.load(image_path) for image_path in animations_meta_data['engine']['image_paths']]
-        self.engine_spi = animations_meta_data['engine']['spi']
+        self.engine_images, _, self.engine_spi = self.assets.get_animation('engine')
+        
+        # create and prewarm sprite pools if needed
+        if projectile_pool_size is not None:
+            self.projectile_pool = SpritePool(ProjectileSprite,
+                                              projectile_pool_size)
+            self.projectile_pool.prewarm(self.fps,
+                                         self.screen,
+                                         self.allied_laser_images,
+                                         self.laser_range_in_seconds,
+                                         kinematics_world = self.kinematics_world)
+        else:
+            self.projectile_pool = None
+            
+        if muzzle_flash_pool_size is not None:
+            self.muzzle_flash_pool = SpritePool(TrackingAnimation,
+                                                muzzle_flash_pool_size)
+            self.muzzle_flash_pool.prewarm(self.fps,
+                                           self.screen,
+                                           self.allied_muzzle_images,
+                                           self.allied_muzzle_spi,
+                                           None,
+                                           np.zeros(2))
+        else:
+            self.muzzle_flash_pool = None
+            
+        # bundle the engine services for the ship sprites
+        self.services = EngineServices(kinematics_world = self.kinematics_world,
+                                       projectile_manager = self.projectiles,
+                                       game_clock = self.game_clock,
+                                       timer_wheel = self.expiry_timers,
+                                       attachment_registry = self.attachments,
+                                       weapons_system = self.weapons,
+                                       target_selector = self.target_selector,
+                                       projectile_pool = self.projectile_pool,
+                                       muzzle_flash_pool = self.muzzle_flash_pool)
+        
+        # use prebuilt collision bounds of the skins if there are any
+        if self.collider is not None:
+            for images in (self.allied_images, self.allied_laser_images, self.hostile_images, self.hostile_laser_images):
+                if self.assets.get_collision_bounds(images) is not None:
+                    self.collider.set_bounds(images,
+                                             self.assets.get_collision_bounds(images))
         
         # initialize empty sprite groups
         self.all_ships = Group()
@@ -106,18 +452,72 @@ class Game(object):
         self.hostile_ships = Group()
         self.hostile_laser_beams = Group()
         
-        # animation group
-        self.animations = Group()
+        # animation group; advances all animations' frame counters in one step per frame
+        self.animations = AnimationGroup()
         
         # information displays
-        self.ship_stats = Group()
+        self.ship_stats = AnimationGroup()
+        
+        # create render queue if needed; everything drawn per frame is registered on a z-layer,
+        # bottom to top in the order the groups used to be drawn in
+        if batched_draw:
+            self.render_queue = RenderQueue(self.screen)
+            
+            self.render_queue.add_group(self.all_ships, layer = 0)
+            self.render_queue.add_group(self.allied_laser_beams, layer = 1)
+            self.render_queue.add_group(self.hostile_laser_beams, layer = 2)
+            
+            if self.projectiles is not None:
+                self.render_queue.add_source(self.projectiles, layer = 3)
+                
+            self.render_queue.add_group(self.animations, layer = 4)
+            self.render_queue.add_group(self.ship_stats, layer = 5)
+            
+            if self.hud is not None:
+                self.render_queue.add_source(self.hud, layer = 6)
+                
+            self.render_queue.add_source(self.profiler, layer = 7)
+        else:
+            self.render_queue = None
+        
+        # initialize battle statistics: all ships spawned so far and laser hits scored per side
+        self.spawned_ships = []
+        self.n_hits = [0, 0]
+        
+        self.startup_time = time.perf_counter() - startup_start
+        
+        # start interactive game unless in headless mode
+        if not headless:
+            if profile:
+                print('Startup time (' + ('asset bundle' if asset_bundle is not None else 'loose files') + '): ' +
+                      '{:.1f}'.format(self.startup_time * 1000) + ' ms')
+            
+            # create default battle and start main game loop
+            self.setup_battle()
+            self.run()
+            
+    def setup_battle(self,
+                     ai_player = False):
+        '''Spawns the default battle: the player and two allied wingmen against three hostile
+        ships. If 'ai_player' is set, an AI controlled allied ship takes the player's place
+        (used in headless mode, where there is no keyboard input).'''
         
-        # create player sprite and add to relevant groups / provide with relevant groups
-        player = self.spawn_player(center=np.array([1400,350]),
-                                   angle=180,
-                                   speed=250,
-                                   d_angle_degrees_per_second = 150,
-                                   max_speed_pixel_per_second=360)
+        # create player sprite (or an AI ally in its place) and add to relevant groups / provide with relevant groups
+        if ai_player:
+            self.player = None
+            
+            self.spawn_ally("P",
+                            center=np.array([1400,350]),
+                            angle=180,
+                            speed=250,
+                            d_angle_degrees_per_second = 150,
+                            max_speed_pixel_per_second=360)
+        else:
+            self.player = self.spawn_player(center=np.array([1400,350]),
+                                            angle=180,
+                                            speed=250,
+                                            d_angle_degrees_per_second = 150,
+                                            max_speed_pixel_per_second=360)
         
         # create two wingmen
         self.spawn_ai_squadron('allied',
@@ -149,8 +549,29 @@ class Game(object):
                                 max_speed_pixel_per_seconds=[300,
                                                              300,
                                                              300])
-                                        
-                        
+        
+    def setup_squadron_battle(self,
+                              n_allied_ships = 3,
+                              n_hostile_ships = 3):
+        '''Spawns an AI only battle between two squadrons of the specified sizes. The allied
+        squadron starts on the right edge of the screen, the hostile squadron on the left edge,
+        each spread evenly from top to bottom.'''
+        
+        screen_width, screen_height = self.screen.get_size()
+        
+        for side, n_ships, x, angle in (('allied', n_allied_ships, screen_width - 100, 180),
+                                        ('hostile', n_hostile_ships, 50, 0)):
+            self.spawn_ai_squadron(side,
+                                   centers=[np.array([x, (i + 0.5) * screen_height / n_ships]) for i in range(n_ships)],
+                                   angles=[angle] * n_ships,
+                                   speeds=[300] * n_ships,
+                                   d_angle_degrees_per_seconds = [150] * n_ships,
+                                   max_speed_pixel_per_seconds=[300] * n_ships)
+        
+    def run(self):
+        '''Runs the interactive main game loop: handles keyboard events, updates and draws the
+        game state, handles collisions and controls the pace.'''
+        
         # initialize enemy down time so that 2 enemies are spawned at beginning of game
         hostile_down = False
         ally_down = False
@@ -161,8 +582,14 @@ class Game(object):
         # initiazlie sound toggle variable
         sound = False
         
+        # initialize real time (in milliseconds) not yet simulated in fixed timestep mode
+        lag = 0
+        
         # start main game loop
         while True:
+            # start timing the frame if profiling
+            self.profiler.begin_frame()
+            
             # check for exit events
             for event in pg.event.get():
                 if event.type == pg.QUIT:
@@ -176,6 +603,10 @@ class Game(object):
                     if event.key == pg.K_ESCAPE:
                         paused = not paused
                         
+                    # toggle profiler overlay if needed
+                    if event.key == pg.K_p:
+                        self.profiler.toggle_overlay()
+                        
                     # toggle sound if needed
                     if event.key == pg.K_s:
                         sound = not sound
@@ -186,60 +617,71 @@ class Game(object):
                     
                     # control player fire mode
                     if event.key == pg.K_f:
-                        player._toggle_fire_mode()
+                        self.player._toggle_fire_mode()
                         
                     # control player fire commands
                     if event.key == pg.K_SPACE:
-                        player._command_to_fire = True
+                        self.player._command_to_fire = True
                         
                     # control player acceleration
                     if event.key == pg.K_UP:
-                        player._d_speed += player._d_speed_pixel_per_frame
+                        self.player._d_speed += self.player._d_speed_pixel_per_frame
                     if event.key == pg.K_DOWN:
-                        player._d_speed -= player._d_speed_pixel_per_frame
+                        self.player._d_speed -= self.player._d_speed_pixel_per_frame
                         
                     # control player steering
                     if event.key == pg.K_RIGHT:
-                        player._d_angle -= player._d_angle_degrees_per_frame
+                        self.player._d_angle -= self.player._d_angle_degrees_per_frame
                     if event.key == pg.K_LEFT:
-                        player._d_angle += player._d_angle_degrees_per_frame
+                        self.player._d_angle += self.player._d_angle_degrees_per_frame
                         
                 elif event.type == pg.KEYUP:
                     
                     # control player fire commands
                     if event.key == pg.K_SPACE:
-                        player._command_to_fire = False
+                        self.player._command_to_fire = False
                     
                     # control player acceleration
                     if event.key == pg.K_UP:
-                        player._d_speed -= player._d_speed_pixel_per_frame
+                        self.player._d_speed -= self.player._d_speed_pixel_per_frame
                     if event.key == pg.K_DOWN:
-                        player._d_speed += player._d_speed_pixel_per_frame
+                        self.player._d_speed += self.player._d_speed_pixel_per_frame
                         
                     # control player steering
                     if event.key == pg.K_RIGHT:
-                        player._d_angle += player._d_angle_degrees_per_frame
+                        self.player._d_angle += self.player._d_angle_degrees_per_frame
                     if event.key == pg.K_LEFT:
-                        player._d_angle -= player._d_angle_degrees_per_frame
+                        self.player._d_angle -= self.player._d_angle_degrees_per_frame
                         
-            # spawn enemies if needed
-            if hostile_down:
-                # create first two enemy sprites and add to relevant groups / provide with relevant groups
-                self.spawn_hostile(center=np.array([50,350]),
-                         speed=300,
-                         d_angle_degrees_per_second = 150,
-                         max_speed_pixel_per_second=300)# enemy #1
-
+            # spawn ships shot down after the respawn delay if needed
+            self.schedule_respawns(hostile_down,
+                                   ally_down)
+            
+            hostile_down = ally_down = False
+                
+            self.profiler.mark('events')
+            
+            if paused:
+                # no simulated time passes while paused
+                lag = 0
                 
-            if ally_down:
-                # reanimate player
-                self.spawn_ally(center=np.array([1400,350]),
-                                speed=300,
-                                angle=180,
-                                d_angle_degrees_per_second = 150,
-                                max_speed_pixel_per_second=300)
+            elif self.fixed_timestep:
+                # run as many fixed length simulation steps as real time has passed, then draw once
+                n_steps = 0
                 
-            if not paused:
+                while lag >= self.game_clock.ms_per_frame and n_steps < self.max_steps_per_render:
+                    step_hostile_down, step_ally_down = self.step()
+                    hostile_down, ally_down = hostile_down or step_hostile_down, ally_down or step_ally_down
+                    lag -= self.game_clock.ms_per_frame
+                    n_steps += 1
+                    
+                # drop the rest if the simulation can't keep up
+                if n_steps == self.max_steps_per_render:
+                    lag = 0
+                    
+                self.draw_game_state()
+                
+            else:
             
                 # update game state
                 self.update_game_state()
@@ -249,35 +691,291 @@ class Game(object):
                 
                 # check and handle collisions
                 hostile_down, ally_down = self.handle_collisions()
+                self.profiler.mark('collisions')
                         
             # control pace
-            self.clock.tick(fps)
+            real_ms_passed = self.clock.tick(self.render_fps)
+            
+            if self.fixed_timestep:
+                lag += real_ms_passed
+                
+            # record frame if profiling
+            self.profiler.mark('idle')
+            
+            if self.profiler.enabled:
+                self.profiler.end_frame(self.get_entity_counts())
+            
+    def step(self):
+        '''Advances the game by one frame without drawing: updates the game state and
+        handles collisions. Returns the flags of handle_collisions.'''
+        
+        self.update_game_state()
+        
+        collision_flags = self.handle_collisions()
+        self.profiler.mark('collisions')
+        
+        return collision_flags
+    
+    def schedule_respawns(self,
+                          hostile_down,
+                          ally_down):
+        '''Schedules a new hostile and/or allied ship (as flagged by handle_collisions) to be
+        spawned on the timer wheel, 'respawn_delay_in_frames' frames from now. Does nothing if
+        respawns are disabled ('respawn_delay_in_frames' is None).'''
+        
+        if self.respawn_delay_in_frames is None:
+            return
+        
+        if hostile_down:
+            # create new enemy sprite and add to relevant groups / provide with relevant groups
+            self.timers.schedule(self.respawn_delay_in_frames,
+                                 self.spawn_hostile,
+                                 'H',
+                                 center=np.array([50,350]),
+                                 speed=300,
+                                 d_angle_degrees_per_second = 150,
+                                 max_speed_pixel_per_second=300)
+            
+        if ally_down:
+            # reanimate ally
+            self.timers.schedule(self.respawn_delay_in_frames,
+                                 self.spawn_ally,
+                                 'A',
+                                 center=np.array([1400,350]),
+                                 speed=300,
+                                 angle=180,
+                                 d_angle_degrees_per_second = 150,
+                                 max_speed_pixel_per_second=300)
+    
+    def simulate(self,
+                 max_frames = 3600,
+                 until_eliminated = True):
+        '''Steps the game as fast as possible, without drawing and without frame cap, for at
+        most 'max_frames' frames. If 'until_eliminated' is set, stops as soon as one side has
+        no ships left. Returns a BattleResults object.'''
+        
+        start_time = time.perf_counter()
+        n_frames = 0
+        
+        while n_frames < max_frames:
+            self.profiler.begin_frame()
+            self.step()
+            n_frames += 1
+            
+            if self.profiler.enabled:
+                self.profiler.end_frame(self.get_entity_counts())
+            
+            # stop if needed
+            if until_eliminated and not (self.allied_ships and self.hostile_ships):
+                break
+            
+        wall_time = time.perf_counter() - start_time
+        
+        # determine winner
+        if self.allied_ships and self.hostile_ships:
+            winner = None
+        elif self.allied_ships:
+            winner = 'allied'
+        elif self.hostile_ships:
+            winner = 'hostile'
+        else:
+            winner = 'draw'
+            
+        return BattleResults(winner,
+                             n_frames,
+                             self.fps,
+                             wall_time,
+                             len(self.allied_ships),
+                             len(self.hostile_ships),
+                             self.get_shots_fired(),
+                             self.n_hits)
             
     def update_game_state(self):
         '''Updates the game state by updating all the game's sprite groups.'''
         
+        # start new frame for the mask build counter; the previous frame's count
+        # is available as MaskCounter.last_frame
+        MaskCounter.reset_frame()
+        
+        # advance simulation time by one frame
+        self.game_clock.advance()
+        
+        mark = self.profiler.mark
+        
+        # get AI ships
+        ships = self.all_ships.sprites()
+        ai_ships = [ship for ship in ships if isinstance(ship, AIShipSprite)]
+            
+        # acquire targets for all AI ships that need one
+        if self.target_selector is not None:
+            self.target_selector.begin_frame(ai_ships)
+            self.target_selector.assign_targets(ai_ships)
+            
+        # take radar readings for all AI ships at once
+        if self.ai_sensors is not None:
+            self.ai_sensors.scan(ai_ships)
+            
+        mark('update AI')
+        
+        # steer all ships attached to the kinematics world, then integrate them in one vectorized
+        # step, so that they move exactly as they would in their own updates
+        if self.kinematics_world is not None:
+            for ship in ships:
+                ship.steer()
+                
+            self.kinematics_world.step([ship._kinematics_row for ship in ships if ship._kinematics_row is not None])
+            mark('update kinematics')
+        
         self.all_ships.update()
+        mark('update all_ships')
+        
+        # fire the cannons of all ships commanded to fire, now that the ships have updated
+        if self.weapons is not None:
+            self.weapons.step()
+            mark('update weapons')
+            
+        # position all animations attached to ships, now that the ships have moved
+        if self.attachments is not None:
+            self.attachments.step()
+            mark('update attachments')
+            
+        # kill all sprites whose lifetime is over and run all other timed events (e.g. respawns)
+        # due this frame, in one batch
+        for timer in self.timers.advance_to(self.game_clock.frame):
+            timer.run()
+            
+        mark('update timers')
+        
+        # integrate all other sprites attached to the kinematics world (laser beams, animations),
+        # including those spawned this frame, before their groups update. Ships spawned this
+        # frame (e.g. respawns) first move in the next frame, like they would in their own updates
+        if self.kinematics_world is not None:
+            self.kinematics_world.step([ship._kinematics_row for ship in self.all_ships.sprites() if ship._kinematics_row is not None],
+                                       exclude = True)
+            mark('update kinematics')
+        
         self.allied_laser_beams.update()
+        mark('update allied_laser_beams')
         self.hostile_laser_beams.update()
+        mark('update hostile_laser_beams')
+        
+        if self.projectiles is not None:
+            self.projectiles.step()
+            mark('update projectiles')
+            
         self.animations.update()
+        mark('update animations')
         self.ship_stats.update()
+        mark('update ship_stats')
         
     def draw_game_state(self):
         '''Draws updated game state by wiping the game's main surface,
         drawing all the game's sprite groups and then flipping the game's main
         surface to display the drawings.'''
         
+        mark = self.profiler.mark
+        
         # draw new game state    
-        self.screen.blit(self.background_image,(0,0)) # paint over old game state
+        if self.renderer is not None:
+            self.renderer.restore_background() # paint over old sprites only
+        else:
+            self.screen.blit(self.background_image,(0,0)) # paint over old game state
+            
+        mark('draw background')
+        
+        # update scoreboard text if needed
+        if self.hud is not None and self.hud.has_scoreboard:
+            self.hud.set_scoreboard_text('ALLIES {}   HOSTILES {}   HITS {} : {}'.format(len(self.allied_ships),
+                                                                                 len(self.hostile_ships),
+                                                                                 *self.n_hits))
         
-        self.all_ships.draw(self.screen) # draw all sprites
-        self.allied_laser_beams.draw(self.screen) # draw player lasers
-        self.hostile_laser_beams.draw(self.screen) # draw enemy lasers
-        self.animations.draw(self.screen) # draw animations
-        self.ship_stats.draw(self.screen) # draw frames and ship ids
+        if self.render_queue is not None:
+            # draw all sprites, batched lasers, HUD and profiler overlay in one batched blit
+            drawn_rects = self.render_queue.draw(self.screen,
+                                                 return_rects = self.renderer is not None)
+            mark('draw render_queue')
+        else:
+            self.all_ships.draw(self.screen) # draw all sprites
+            mark('draw all_ships')
+            self.allied_laser_beams.draw(self.screen) # draw player lasers
+            mark('draw allied_laser_beams')
+            self.hostile_laser_beams.draw(self.screen) # draw enemy lasers
+            mark('draw hostile_laser_beams')
+            
+            if self.projectiles is not None:
+                self.projectiles.draw(self.screen) # draw batched lasers
+                mark('draw projectiles')
+                
+            self.animations.draw(self.screen) # draw animations
+            mark('draw animations')
+            self.ship_stats.draw(self.screen) # draw frames and ship ids
+            mark('draw ship_stats')
+            
+            # draw HUD (frames, ship ids, health bars and scoreboard) if needed
+            if self.hud is not None:
+                hud_rects = self.hud.draw(self.screen)
+                mark('draw hud')
+            else:
+                hud_rects = []
+            
+            # draw profiler overlay if needed
+            overlay_rect = self.profiler.draw_overlay(self.screen)
+            mark('draw overlay')
                    
-        # flip canvas
-        pg.display.flip()
+        # flip canvas, or only the changed parts of it
+        if self.renderer is not None and self.render_queue is not None:
+            self.renderer.update_display((),
+                                         drawn_rects)
+        elif self.renderer is not None:
+            extra_rects = self.projectiles.get_rects() if self.projectiles is not None else []
+            
+            extra_rects.extend(hud_rects)
+            
+            if overlay_rect is not None:
+                extra_rects.append(overlay_rect)
+                
+            self.renderer.update_display((self.all_ships,
+                                          self.allied_laser_beams,
+                                          self.hostile_laser_beams,
+                                          self.animations,
+                                          self.ship_stats),
+                                         extra_rects)
+        else:
+            pg.display.flip()
+            
+        mark('flip')
+        
+    def get_entity_counts(self):
+        '''Returns a dictionary with the current number of entities in each of the game's
+        sprite groups (and in the projectile manager, if any).'''
+        
+        entity_counts = {'all_ships': len(self.all_ships),
+                         'allied_laser_beams': len(self.allied_laser_beams),
+                         'hostile_laser_beams': len(self.hostile_laser_beams),
+                         'animations': len(self.animations),
+                         'ship_stats': len(self.ship_stats)}
+        
+        if self.hud is not None:
+            entity_counts['hud'] = self.hud.n_elements
+        
+        if self.projectiles is not None:
+            entity_counts['projectiles'] = self.projectiles.n_beams
+            
+        return entity_counts
+        
+    def get_pool_stats(self):
+        '''Returns the statistics of the game's sprite pools (see SpritePool.get_stats) by
+        pool name.'''
+        
+        pool_stats = {}
+        
+        if self.projectile_pool is not None:
+            pool_stats['laser_beams'] = self.projectile_pool.get_stats()
+            
+        if self.muzzle_flash_pool is not None:
+            pool_stats['muzzle_flashes'] = self.muzzle_flash_pool.get_stats()
+            
+        return pool_stats
         
     def _sync_player_(self,player_sprite):
         '''Takes a ShipSprite class object and syncs its _d_speed and _d_angle
@@ -304,10 +1002,49 @@ class Game(object):
         '''Takes the ship_id and makes and returns a pygame surface with that 
         ID in the bottom right corner.'''
         
-        largeText = pg.font.Font('freesansbold.ttf',12)
-        textSurface = largeText.render(ship_id, True, (254,254,254))
+        return self.assets.get_label(ship_id,
+                                     size = 12,
+                                     color = (254,254,254))
+        
+    def _add_ship_stats(self,
+                        ship,
+                        frame_images,
+                        ship_id_images,
+                        ship_id_offset):
+        '''Util function that shows the frame and id of the ship: on the HUD if there is one,
+        otherwise as TrackingAnimations.'''
         
-        return [textSurface]
+        if self.hud is not None:
+            self.hud.add_element(ship,
+                                 frame_images,
+                                 np.zeros(2))
+            self.hud.add_element(ship,
+                                 ship_id_images,
+                                 ship_id_offset)
+            
+            return
+        
+        # draw frame around ship
+        TrackingAnimation(self.fps,
+                         self.screen,
+                         frame_images,
+                         10000,
+                         ship,
+                         np.array([0,0]).astype('float'),
+                         self.ship_stats,
+                         looping = True,
+                         dynamic_angle = False)
+        
+        # draw ship id
+        TrackingAnimation(self.fps,
+                          self.screen,
+                          ship_id_images,
+                          10000,
+                          ship,
+                          ship_id_offset,
+                         self.ship_stats,
+                         looping = True,
+                         dynamic_angle = False)
         
     def spawn_player(self,
                      ship_id = "P",
@@ -329,9 +1066,9 @@ class Game(object):
                           self.allied_laser_beams,
                           self.allied_laser_sound,
                           self.allied_laser_images,
-                          1.2, # laser range in seconds
-                          150, # laser speed in pixel per second
-                          1.5, # laser rate of fire in seconds
+                          self.laser_range_in_seconds, # laser range in seconds
+                          self.laser_speed_in_seconds, # laser speed in pixel per second
+                          self.laser_rate_in_seconds, # laser rate of fire in seconds
                           self.allied_muzzle_images,
                           self.allied_muzzle_spi, # seconds per image for muzzle flash
                           self.explosion_sound, # sound of explosion animation
@@ -347,36 +1084,20 @@ class Game(object):
                           speed = speed,
                           d_angle_degrees_per_second = d_angle_degrees_per_second,
                           d_speed_pixel_per_second = d_speed_pixel_per_second,
-                          max_speed_pixel_per_second = max_speed_pixel_per_second)
+                          max_speed_pixel_per_second = max_speed_pixel_per_second,
+                          projectile_side = self.allied_side,
+                          services = self.services)
+        
+        self.spawned_ships.append(player)
         
         # sync player controls with keyboard state
         self._sync_player_(player)
         
-        # draw frame around player ship
-        TrackingAnimation(self.fps,
-                         self.screen,
-                         [pg.image.load("./graphics/misc/player_frame.bmp")],
-                         10000,
-                         player,
-                         np.array([0,0]).astype('float'),
-                         self.ship_stats,
-                         looping = True,
-                         dynamic_angle = False)
-        
-                # get ship_id display surface
-        ship_id_images = self._get_id_image(ship_id,
-                                            (50,50))
-        
-        # draw ship id for hostile ship
-        TrackingAnimation(self.fps,
-                          self.screen,
-                          ship_id_images,
-                          10000,
-                          player,
-                          np.array([15,25]).astype('float'),
-                         self.ship_stats,
-                         looping = True,
-                         dynamic_angle = False)
+        # draw frame and ship id around player ship
+        self._add_ship_stats(player,
+                             self.assets.get_images(["./graphics/misc/player_frame.bmp"]),
+                             self._get_id_image(ship_id),
+                             np.array([15,25]).astype('float'))
 
         return player
     
@@ -399,9 +1120,9 @@ class Game(object):
                         self.allied_laser_beams,
                         self.allied_laser_sound, # pygame sound object; laser fire sound
                         self.allied_laser_images, # sequence with laser beam skin
-                        1.2,
-                        150,
-                        1.5, # laser rate of fire in shots/second
+                        self.laser_range_in_seconds,
+                        self.laser_speed_in_seconds,
+                        self.laser_rate_in_seconds, # laser rate of fire in shots/second
                         self.allied_muzzle_images, # sequence of images for muzzle flash animation
                         self.allied_muzzle_spi, # seconds per image for muzzle flash animation
                         self.explosion_sound,
@@ -421,32 +1142,17 @@ class Game(object):
                         speed=speed,
                         d_angle_degrees_per_second = d_angle_degrees_per_second,
                         d_speed_pixel_per_second = d_speed_pixel_per_second,
-                        max_speed_pixel_per_second = max_speed_pixel_per_second)
-        
-        # draw frame around ally ship
-        TrackingAnimation(self.fps,
-                         self.screen,
-                         [pg.image.load("./graphics/misc/ally_frame.bmp")],
-                         10000,
-                         ally,
-                          np.array([0,0]).astype('float'),
-                         self.ship_stats,
-                         looping = True,
-                         dynamic_angle = False)
+                        max_speed_pixel_per_second = max_speed_pixel_per_second,
+                        projectile_side = self.allied_side,
+                        services = self.services)
         
-        # get ship_id display surface
-        ship_id_images = self._get_id_image(ship_id)
+        self.spawned_ships.append(ally)
         
-        # draw ship id for hostile ship
-        TrackingAnimation(self.fps,
-                          self.screen,
-                          ship_id_images,
-                          10000,
-                          ally,
-                          np.array([15,15]).astype('float'),
-                         self.ship_stats,
-                         looping = True,
-                         dynamic_angle = False)
+        # draw frame and ship id around ally ship
+        self._add_ship_stats(ally,
+                             self.assets.get_images(["./graphics/misc/ally_frame.bmp"]),
+                             self._get_id_image(ship_id),
+                             np.array([15,15]).astype('float'))
                     
     
     def spawn_hostile(self,
@@ -469,9 +1175,9 @@ class Game(object):
                         self.hostile_laser_beams,
                         self.hostile_laser_sound, # pygame sound object; laser fire sound
                         self.hostile_laser_images, # sequence with laser beam skin
-                        1.2,
-                        150,
-                        1.5, # laser rate of fire in shots/second
+                        self.laser_range_in_seconds,
+                        self.laser_speed_in_seconds,
+                        self.laser_rate_in_seconds, # laser rate of fire in shots/second
                         self.hostile_muzzle_images, # sequence of images for muzzle flash animation
                         self.hostile_muzzle_spi, # seconds per image for muzzle flash animation
                         self.explosion_sound,
@@ -491,32 +1197,17 @@ class Game(object):
                         speed=speed,
                         d_angle_degrees_per_second = d_angle_degrees_per_second,
                         d_speed_pixel_per_second = d_speed_pixel_per_second,
-                        max_speed_pixel_per_second = max_speed_pixel_per_second)
+                        max_speed_pixel_per_second = max_speed_pixel_per_second,
+                        projectile_side = self.hostile_side,
+                        services = self.services)
         
-        # draw frame around hostile ship
-        TrackingAnimation(self.fps,
-                         self.screen,
-                         [pg.image.load("./graphics/misc/hostile_frame.bmp")],
-                         10000,
-                         hostile,
-                          np.array([0,0]).astype('float'),
-                         self.ship_stats,
-                         looping = True,
-                         dynamic_angle = False)
+        self.spawned_ships.append(hostile)
         
-        # get ship_id display surface
-        ship_id_images = self._get_id_image(ship_id)
-        
-        # draw ship id for hostile ship
-        TrackingAnimation(self.fps,
-                          self.screen,
-                          ship_id_images,
-                          10000,
-                          hostile,
-                          np.array([20,20]).astype('float'),
-                         self.ship_stats,
-                         looping = True,
-                         dynamic_angle = False)
+        # draw frame and ship id around hostile ship
+        self._add_ship_stats(hostile,
+                             self.assets.get_images(["./graphics/misc/hostile_frame.bmp"]),
+                             self._get_id_image(ship_id),
+                             np.array([20,20]).astype('float'))
         
     def spawn_ai_squadron(self,
                        side,
@@ -561,17 +1252,22 @@ class Game(object):
     def handle_collisions(self):
         '''Checks for collisions between player sprite and enemy lasers, as well
         as enemy sprites and player lasers. Terminates any sprites that were
-        shot down. Records the time of the kill.'''
+        shot down. Returns two flags telling whether a hostile and whether an allied ship
+        was shot down (see schedule_respawns).'''
 
         ally_down = False
         hostile_down = False
+        
+        # start new frame for broadphase statistics
+        if self.broadphase is not None:
+            self.broadphase.begin_frame()
 
         # check for enemy kills
-        hit_allies = groupcollide(self.allied_ships,
-                                      self.hostile_laser_beams,
-                                      False,
-                                      True,
-                                      collide_mask)
+        hit_allies = self._collide_with_laser_beams(self.allied_ships,
+                                                    self.hostile_laser_beams,
+                                                    self.hostile_side)
+        
+        self.n_hits[self.hostile_side] += self._count_hits(hit_allies)
         
         for hit_ally in hit_allies:
             # update hit ship's hit points attribute
@@ -580,14 +1276,14 @@ class Game(object):
             # if ship has no more hit points left, destroy and set flag
             if not hit_ally._hit_points:
                 hit_ally.kill()
-                #ally_down = True
+                ally_down = True
         
         # check for player kills
-        hit_hostiles = groupcollide(self.hostile_ships,
-                                      self.allied_laser_beams,
-                                      False,
-                                      True,
-                                      collide_mask)
+        hit_hostiles = self._collide_with_laser_beams(self.hostile_ships,
+                                                      self.allied_laser_beams,
+                                                      self.allied_side)
+        
+        self.n_hits[self.allied_side] += self._count_hits(hit_hostiles)
         
         for hit_hostile in hit_hostiles:
             # update hit ship's hit points attribute
@@ -596,17 +1292,114 @@ class Game(object):
             # if ship has no more hit points left, destroy and flag
             if not hit_hostile._hit_points:
                 hit_hostile.kill()
-                #hostile_down = True
+                hostile_down = True
             
         return hostile_down, ally_down
+    
+    def _count_hits(self,
+                    hit_ships):
+        '''Util function that returns the number of laser beams that hit the ships in the
+        dictionary returned by _collide_with_laser_beams.'''
+        
+        # the projectile manager returns hit counts, all other methods lists of laser beams
+        if self.projectiles is not None:
+            return sum(hit_ships.values())
+        
+        return sum(len(laser_beams) for laser_beams in hit_ships.values())
+    
+    def get_shots_fired(self):
+        '''Returns the number of laser beams fired by all allied and all hostile ships spawned
+        so far, as a list indexed by side id.'''
+        
+        shots_fired = [0, 0]
+        
+        for ship in self.spawned_ships:
+            shots_fired[ship._projectile_side] += ship._n_shots_fired
+            
+        return shots_fired
+    
+    def _collide_with_laser_beams(self,
+                                  ships_group,
+                                  laser_beams_group,
+                                  laser_side):
+        '''Util function that checks the ships in 'ships_group' for hits by laser beams fired by
+        the other side, using the collision method the game was configured with. Laser beams
+        that hit are removed. Returns a dictionary with the hit ships as keys.'''
+        
+        # batched laser beams
+        if self.projectiles is not None:
+            return self.projectiles.collide(ships_group,
+                                            laser_side)
+        
+        # analytic narrowphase, with broadphase candidates if available
+        if self.collider is not None:
+            return self.collider.groupcollide(ships_group,
+                                              laser_beams_group,
+                                              False,
+                                              True,
+                                              broadphase = self.broadphase)
+        
+        # mask narrowphase with broadphase
+        if self.broadphase is not None:
+            return self.broadphase.groupcollide(ships_group,
+                                                laser_beams_group,
+                                                False,
+                                                True)
+        
+        # pygame's mask collision
+        return groupcollide(ships_group,
+                            laser_beams_group,
+                            False,
+                            True,
+                            collide_mask)
             
             
+def run_headless_battle(max_frames = 3600,
+                        until_eliminated = True,
+                        **game_kwargs):
+    '''Creates a headless game with the default battle (an AI ally in the player's place),
+    simulates it and returns the BattleResults. Additional keyword arguments are passed on
+    to the Game.'''
+    
+    game = Game(headless = True,
+                **game_kwargs)
+    
+    game.setup_battle(ai_player = True)
+    
+    return game.simulate(max_frames,
+                         until_eliminated)
+            
 def main():
+    # parse command line arguments
+    parser = argparse.ArgumentParser(description = 'STAR WARS DOGFIGHTER')
+    parser.add_argument('--headless',
+                        action = 'store_true',
+                        help = 'simulate a battle without window and frame cap, then print the results')
+    parser.add_argument('--frames',
+                        type = int,
+                        default = 3600,
+                        help = 'maximum number of frames to simulate in headless mode')
+    parser.add_argument('--asset-bundle',
+                        default = None,
+                        help = 'asset bundle to load assets from instead of the loose files (see asset_bundle_class.py). ' +
+                               'Default is the bundle built by asset_build_pipeline.py, if it is up to date')
+    args = parser.parse_args()
+    
+    # bundle path is relative to where the game was started
+    asset_bundle = os.path.abspath(args.asset_bundle) if args.asset_bundle is not None else None
+    
     # make sure directory is repo head
     os.chdir('..')
     
+    # start from prebuilt assets if possible
+    if asset_bundle is None:
+        asset_bundle = get_prebuilt_bundle()
     
-    Game()
+    if args.headless:
+        print(run_headless_battle(args.frames,
+                                  asset_bundle = asset_bundle))
+    else:
+        Game(asset_bundle = asset_bundle)
     
 if __name__=='__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the clock classes used in the game STAR WARS DOGFIGHTER.
+Laser cannon cooldowns and fire mode pacing are measured in milliseconds. The GameClock
+class derives these milliseconds from the number of simulated frames, so that weapons
+behave the same no matter how fast the simulation actually runs, whether it is paused,
+or whether frames are dropped. The WallClock class reads pygame's wall clock instead and
+is used by sprites that are created without a game clock.'''
+
+import pygame as pg
+
+class WallClock(object):
+    '''Clock reading real time milliseconds since pygame was initialized.'''
+
+    def get_ticks(self):
+        '''Returns the number of milliseconds since pg.init was called.'''
+
+        return pg.time.get_ticks()
+
+class GameClock(object):
+    '''Simulation clock owned by the game loop. Time only passes when the game advances the
+    clock by one or more frames.'''
+
+    def __init__(self,
+                 fps):
+
+        '''Arguments:
+
+            fps: frames per second of the simulated game. Sets the (simulated) duration of
+                    one frame.'''
+
+        self.fps = fps
+        self.ms_per_frame = 1000 / fps
+
+        # initialize frame counter
+        self.frame = 0
+
+    def advance(self,
+                n_frames = 1):
+        '''Advances the clock by the specified number of frames.'''
+
+        self.frame += n_frames
+
+    def get_ticks(self):
+        '''Returns the simulated number of milliseconds since the clock was created. Drop-in
+        replacement for pg.time.get_ticks.'''
+
+        return self.frame * self.ms_per_frame
+
+    def get_time(self):
+        '''Returns the simulated number of seconds since the clock was created.'''
+
+        return self.frame / self.fps
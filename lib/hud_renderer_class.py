@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the HudRenderer class used in the game STAR WARS DOGFIGHTER. Ship
+frames and id labels never rotate and never change their image, yet as TrackingAnimations
+they went through the full sprite update (rotation cache lookup, rect and interval updates)
+every frame. The HUD renderer instead holds their prerendered surfaces per ship and, once
+per frame, reads the ships' positions and blits all elements with one Surface.blits call.
+Health bars and a scoreboard can be drawn in the same pass.'''
+
+import numpy as np
+import pygame as pg
+
+from rotation_cache_class import RotationCache
+
+class HudRenderer(object):
+    '''Draws static overlay elements (frames, id labels, health bars) at their ships' positions,
+    and a scoreboard.'''
+
+    def __init__(self,
+                 screen,
+                 health_bars = False,
+                 health_bar_size = (40,4),
+                 health_bar_offset = (0,-30),
+                 scoreboard_font = None,
+                 scoreboard_color = (254,254,254)):
+
+        '''Arguments:
+
+            screen: the main screen the game is displayed on (pygame Surface). Elements are
+                    'wrapped' around its edges like sprites.
+            health_bars: if set, a health bar is drawn for each ship added with add_ship.
+                    Default is False.
+            health_bar_size: tuple (width, height) of the health bars in pixels.
+            health_bar_offset: offset of the health bars' centers w.r.t. their ships' centers.
+            scoreboard_font: pygame Font used to render the scoreboard text (see
+                    set_scoreboard_text). If None, no scoreboard is drawn. Default is None.
+            scoreboard_color: color of the scoreboard text.'''
+
+        self._screen_w, self._screen_h = screen.get_size()
+
+        # elements by insertion order: ship, surface and offset of the surface's center
+        self._ships = []
+        self._ship_elements = {} # ship -> list of (surface, offset)
+        self._max_hit_points = {}
+
+        # elements of all ships, stacked into arrays; rebuilt when ships are added or die
+        self._stack_is_current = False
+        self._elements = []
+        self._offsets = np.zeros((0,2))
+        self._half_sizes = np.zeros((0,2))
+        self._ship_indices = np.zeros(0, dtype = 'int')
+
+        # health bars: full and empty bar surfaces; the full bar is blitted in part
+        self.health_bars = health_bars
+        self._health_bar_offset = np.array(health_bar_offset, dtype = 'float')
+        self._empty_health_bar = pg.Surface(health_bar_size)
+        self._empty_health_bar.fill((200,0,0))
+        self._full_health_bar = pg.Surface(health_bar_size)
+        self._full_health_bar.fill((0,200,0))
+
+        # scoreboard: rendered only when its text changes
+        self._scoreboard_font = scoreboard_font
+        self._scoreboard_color = scoreboard_color
+        self._scoreboard_text = None
+        self._scoreboard = None
+
+    @property
+    def has_scoreboard(self):
+        '''Whether a scoreboard is drawn.'''
+
+        return self._scoreboard_font is not None
+
+    @property
+    def n_elements(self):
+        '''Number of frames and labels currently shown.'''
+
+        return sum(len(elements) for elements in self._ship_elements.values())
+
+    def add_ship(self,
+                 ship):
+        '''Adds the ship to the HUD. Its elements (see add_element) and health bar are shown
+        until the ship is killed.'''
+
+        if ship not in self._ship_elements:
+            self._ships.append(ship)
+            self._ship_elements[ship] = []
+            self._max_hit_points[ship] = ship._hit_points
+            self._stack_is_current = False
+
+    def add_element(self,
+                    ship,
+                    images,
+                    offset):
+        '''Shows the first of the specified images (an image sequence as used by sprites)
+        centered at the specified offset w.r.t. the ship's center. The image is drawn exactly
+        as a sprite with that image sequence at an angle of 0 would be.'''
+
+        self.add_ship(ship)
+
+        image = RotationCache.get_shared(images).get(0,0).image
+
+        self._ship_elements[ship].append((image, np.array(offset, dtype = 'float').reshape(2)))
+        self._stack_is_current = False
+
+    def set_scoreboard_text(self,
+                            text):
+        '''Sets the scoreboard's text. The scoreboard is only re-rendered if the text changed.'''
+
+        if self._scoreboard_font is None or text == self._scoreboard_text:
+            return
+
+        self._scoreboard_text = text
+        self._scoreboard = self._scoreboard_font.render(text, True, self._scoreboard_color)
+
+    def draw(self,
+             surface):
+        '''Draws all elements, health bars and the scoreboard onto the surface in one batched
+        blit. Returns the list of regions drawn to.'''
+
+        return surface.blits(self.get_blit_sequence())
+
+    def get_blit_sequence(self,
+                          view_rect = None):
+        '''Returns the blits (as taken by Surface.blits) of all elements, health bars and the
+        scoreboard overlapping the specified view region (pygame Rect; all if None). Ships
+        that were killed are dropped first.'''
+
+        # drop killed ships
+        if not all(ship._alive for ship in self._ships):
+            for ship in [ship for ship in self._ships if not ship._alive]:
+                self._ships.remove(ship)
+                del self._ship_elements[ship], self._max_hit_points[ship]
+
+            self._stack_is_current = False
+
+        if not self._stack_is_current:
+            self._stack()
+
+        blit_sequence = []
+
+        if self._ships:
+            ship_centers = np.array([ship._center for ship in self._ships])
+
+            # get element centers, wrapped around the screen edges like sprites
+            centers = ship_centers[self._ship_indices] + self._offsets
+
+            for axis, screen_extent in ((0, self._screen_w), (1, self._screen_h)):
+                position = centers[:,axis]
+                half_extent = self._half_sizes[:,axis]
+
+                below = position < - half_extent
+                above = position > screen_extent + half_extent
+
+                position[below] = screen_extent + half_extent[below]
+                position[above] = - half_extent[above]
+
+            for (image, rect), center in zip(self._elements, centers.tolist()):
+                rect.center = center
+                blit_sequence.append((image, rect))
+
+            # add health bars: the empty bar, overdrawn by the full bar's part for the hit points left
+            if self.health_bars:
+                bar_width, bar_height = self._full_health_bar.get_size()
+
+                for ship, center in zip(self._ships, (ship_centers + self._health_bar_offset).tolist()):
+                    rect = pg.Rect(0, 0, bar_width, bar_height)
+                    rect.center = center
+                    max_hit_points = self._max_hit_points[ship]
+                    health_share = min(max(ship._hit_points, 0) / max_hit_points, 1) if 0 < max_hit_points < np.inf else 1
+
+                    blit_sequence.append((self._empty_health_bar, rect))
+                    blit_sequence.append((self._full_health_bar, rect, pg.Rect(0, 0, int(bar_width * health_share), bar_height)))
+
+        # add scoreboard at the top center of the screen
+        if self._scoreboard is not None:
+            blit_sequence.append((self._scoreboard, self._scoreboard.get_rect(midtop = (self._screen_w // 2, 10))))
+
+        # drop blits entirely outside the view region
+        if view_rect is not None:
+            is_visible = view_rect.colliderect
+            blit_sequence = [blit for blit in blit_sequence if is_visible(blit[1])]
+
+        return blit_sequence
+
+    def _stack(self):
+        '''Util function that stacks the elements of all ships into the arrays used by draw.'''
+
+        self._elements = []
+        offsets, half_sizes, ship_indices = [], [], []
+
+        for ship_index, ship in enumerate(self._ships):
+            for image, offset in self._ship_elements[ship]:
+                self._elements.append((image, image.get_rect()))
+                offsets.append(offset)
+                half_sizes.append((image.get_width() / 2, image.get_height() / 2))
+                ship_indices.append(ship_index)
+
+        self._offsets = np.array(offsets, dtype = 'float').reshape(-1,2)
+        self._half_sizes = np.array(half_sizes, dtype = 'float').reshape(-1,2)
+        self._ship_indices = np.array(ship_indices, dtype = 'int')
+
+        self._stack_is_current = True
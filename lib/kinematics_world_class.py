@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the KinematicsWorld class used in the game STAR WARS DOGFIGHTER.
+Instead of having every sprite update its own position with scalar trigonometry and tiny
+numpy arrays, the positional attributes of all moving sprites are stored row by row in
+contiguous float arrays, which are then integrated with one vectorized step per frame.
+Sprites attached to the world read and write their positional attributes directly from
+and to their row (see the KinematicAttribute descriptor in basic_sprite_class.py).'''
+
+import numpy as np
+import heapq
+
+class KinematicsWorld(object):
+    '''Struct-of-arrays store for the positional attributes of all moving sprites.'''
+
+    def __init__(self,
+                 screen_size,
+                 capacity = 256):
+
+        '''Arguments:
+
+            screen_size: tuple (width, height) of the main screen the game is displayed on.
+                    Needed to 'wrap' entities around edges to produce 'donut topology'.
+            capacity: initial number of rows. The store will grow automatically if more
+                    entities are added.'''
+
+        # attach screen dimensions
+        self._screen_w, self._screen_h = screen_size
+
+        # initialize row bookkeeping
+        self._capacity = 0
+        self._n_rows = 0 # high-water mark of used rows
+        self._free_rows = [] # heap, so the lowest free row is used first
+        self._free_row_set = set()
+        self.n_entities = 0
+
+        # allocate arrays
+        self.center = np.zeros((0,2))
+        self.angle = np.zeros(0)
+        self.speed = np.zeros(0)
+        self.d_angle = np.zeros(0)
+        self.d_speed = np.zeros(0)
+        self.min_speed = np.zeros(0)
+        self.max_speed = np.zeros(0)
+        self.half_size = np.zeros((0,2))
+
+        self._grow(capacity)
+
+    def add(self,
+            center,
+            angle,
+            speed):
+        '''Adds an entity to the world and returns its row index. Speed is expected in
+        pixels per frame, angle in degrees.'''
+
+        # grow if needed
+        if not self._free_rows:
+            self._grow(2 * self._capacity)
+
+        row = heapq.heappop(self._free_rows)
+        self._free_row_set.discard(row)
+        self._n_rows = max(self._n_rows, row + 1)
+        self.n_entities += 1
+
+        # set initial values
+        self.center[row] = center
+        self.angle[row] = angle
+        self.speed[row] = speed
+        self.d_angle[row] = 0
+        self.d_speed[row] = 0
+        self.min_speed[row] = -np.inf
+        self.max_speed[row] = np.inf
+        self.half_size[row] = 0
+
+        return row
+
+    def remove(self,
+               row):
+        '''Removes the entity at the specified row from the world. The row's values are reset
+        so that it stays stationary until it is reused.'''
+
+        self.speed[row] = 0
+        self.d_angle[row] = 0
+        self.d_speed[row] = 0
+        self.min_speed[row] = -np.inf
+        self.max_speed[row] = np.inf
+
+        heapq.heappush(self._free_rows, row)
+        self._free_row_set.add(row)
+        self.n_entities -= 1
+
+        # shrink high-water mark if the top rows are free
+        while self._n_rows and (self._n_rows - 1) in self._free_row_set:
+            self._n_rows -= 1
+
+    def set_speed_limits(self,
+                         row,
+                         min_speed,
+                         max_speed):
+        '''Sets the speed constraints (in pixels per frame) for the entity at the specified row.'''
+
+        self.min_speed[row] = min_speed
+        self.max_speed[row] = max_speed
+
+    def step(self,
+             rows = None,
+             exclude = False):
+        '''Integrates the positional attributes of the entities at the specified rows (all
+        entities if None; all entities except those at the specified rows if 'exclude' is set)
+        by one frame: applies angle and speed changes, enforces speed limits, moves centers
+        along their velocity vectors and wraps them around the screen edges.'''
+
+        n = self._n_rows
+
+        if not n:
+            return
+
+        # get rows to integrate: a slice of all rows, or an array of row indices
+        if rows is None:
+            rows = slice(0, n)
+        elif exclude:
+            is_integrated = np.ones(n, dtype = 'bool')
+            is_integrated[[row for row in rows if row < n]] = False
+            rows = np.nonzero(is_integrated)[0]
+        else:
+            rows = np.array(rows, dtype = 'int')
+
+        # update angle and speed arguments
+        angle = self.angle[rows] + self.d_angle[rows]
+        speed = self.speed[rows] + self.d_speed[rows]
+
+        # control speed: first cap at max, then raise to min (same order as ShipSprite._control_speed)
+        np.minimum(speed, self.max_speed[rows], out = speed)
+        np.maximum(speed, self.min_speed[rows], out = speed)
+
+        # update center arguments. In pygame coordinates, the y-axis has negative orientation
+        radian_angle = np.radians(angle)
+
+        center = self.center[rows]
+        center[:,0] += speed * np.cos(radian_angle)
+        center[:,1] -= speed * np.sin(radian_angle)
+
+        # wrap horizontally and vertically if needed
+        for axis, screen_extent in ((0, self._screen_w), (1, self._screen_h)):
+            position = center[:,axis]
+            half_extent = self.half_size[rows,axis]
+
+            below = position < - half_extent
+            above = position > screen_extent + half_extent
+
+            position[below] = screen_extent + half_extent[below]
+            position[above] = - half_extent[above]
+
+        self.angle[rows] = angle
+        self.speed[rows] = speed
+        self.center[rows] = center
+
+    def _grow(self,
+              capacity):
+        '''Util function that resizes all arrays to the specified capacity and registers the
+        new rows as free.'''
+
+        capacity = max(capacity, 1)
+        n_new = capacity - self._capacity
+
+        self.center = np.concatenate([self.center, np.zeros((n_new,2))])
+        self.angle = np.concatenate([self.angle, np.zeros(n_new)])
+        self.speed = np.concatenate([self.speed, np.zeros(n_new)])
+        self.d_angle = np.concatenate([self.d_angle, np.zeros(n_new)])
+        self.d_speed = np.concatenate([self.d_speed, np.zeros(n_new)])
+        self.min_speed = np.concatenate([self.min_speed, np.full(n_new, -np.inf)])
+        self.max_speed = np.concatenate([self.max_speed, np.full(n_new, np.inf)])
+        self.half_size = np.concatenate([self.half_size, np.zeros((n_new,2))])
+
+        # new rows are free. They are all higher than the rows already in the heap, so
+        # appending them in ascending order keeps the heap valid
+        new_rows = range(self._capacity, capacity)
+        self._free_rows.extend(new_rows)
+        self._free_row_set.update(new_rows)
+
+        self._capacity = capacity
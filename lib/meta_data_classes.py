@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the meta data classes used in the game STAR WARS DOGFIGHTER. The skins
+and animations meta data YAML files are compiled into typed SkinMetaData and
+AnimationMetaData objects, with offsets as float arrays and fire modes as gun index arrays.
+Parsing YAML in pure Python is slow, so the MetaDataCache stores the compiled objects in a
+binary (pickle) cache file, which is used as long as the YAML files are unchanged: their
+modification times and sizes are checked first, and if those differ, their content hashes.'''
+
+import os
+import pickle
+import hashlib
+
+import yaml
+import numpy as np
+
+class SkinMetaData(object):
+    '''Typed meta data of a sprite skin. Offsets and gun index arrays are read-only, so the
+    same objects can be shared by all ships using the skin.'''
+
+    __slots__ = ('name','image_paths','gun_offsets','engine_offsets','fire_modes')
+
+    def __init__(self,
+                 name,
+                 meta_data):
+
+        '''Arguments:
+
+            name: name of the skin.
+            meta_data: the skin's entry in the skins meta data file: a dictionary with the
+                    'image_paths' and, for ship skins, the 'gun_offsets', 'engine_offsets' and
+                    'fire_modes'.'''
+
+        self.name = name
+        self.image_paths = tuple(meta_data['image_paths'])
+
+        # offsets as (n,2) float arrays; None for skins without guns/engines (e.g. laser beams)
+        self.gun_offsets = get_read_only_array(meta_data.get('gun_offsets'), 'float')
+        self.engine_offsets = get_read_only_array(meta_data.get('engine_offsets'), 'float')
+
+        # fire modes as tuples of salvos, each an int array of the indices of the guns it fires
+        if meta_data.get('fire_modes') is not None:
+            self.fire_modes = tuple(tuple(get_read_only_array(gun_indices, 'int') for gun_indices in fire_mode)
+                                    for fire_mode in meta_data['fire_modes'])
+        else:
+            self.fire_modes = None
+
+class AnimationMetaData(object):
+    '''Typed meta data of an animation.'''
+
+    __slots__ = ('name','image_paths','sound_path','spi')
+
+    def __init__(self,
+                 name,
+                 meta_data):
+
+        '''Arguments:
+
+            name: name of the animation.
+            meta_data: the animation's entry in the animations meta data file: a dictionary with
+                    the 'image_paths', the seconds per image 'spi' and optionally a 'sound'.'''
+
+        self.name = name
+        self.image_paths = tuple(meta_data['image_paths'])
+        self.sound_path = meta_data.get('sound')
+        self.spi = float(meta_data['spi'])
+
+class MetaDataCache(object):
+    '''Loads the skins and animations meta data, compiled into typed meta data objects, from a
+    binary cache file. The cache is rebuilt from the YAML files when it is missing, outdated
+    or unreadable.'''
+
+    # version of the cache file's contents; bump after changing the meta data classes
+    version = 1
+
+    def __init__(self,
+                 skins_meta_path = './meta/sprite_skins_meta_data.yaml',
+                 animations_meta_path = './meta/animations_meta_data.yaml',
+                 cache_path = './build/meta_data_cache.pickle'):
+
+        '''Arguments:
+
+            skins_meta_path: path to the YAML file with the skin meta data.
+            animations_meta_path: path to the YAML file with the animation meta data.
+            cache_path: path of the binary cache file. If None, or if the file can't be
+                    written, the meta data is compiled from the YAML files on every load.'''
+
+        self.skins_meta_path = skins_meta_path
+        self.animations_meta_path = animations_meta_path
+        self.cache_path = cache_path
+
+        # whether the last load came from the cache file
+        self.loaded_from_cache = False
+
+    def load(self):
+        '''Returns the raw meta data (as parsed from YAML) and the typed meta data objects as
+        a dictionary with the keys 'skins_meta_data', 'animations_meta_data', 'skins' and
+        'animations'. The latter two map names to SkinMetaData and AnimationMetaData objects.'''
+
+        source_paths = (self.skins_meta_path, self.animations_meta_path)
+
+        # try cache
+        cache = self._read_cache()
+
+        if cache is not None:
+            cache_is_current, cache_needs_update = self._check_sources(cache['sources'], source_paths)
+
+            if cache_is_current:
+                self.loaded_from_cache = True
+
+                # sources were touched, but are unchanged; store their new stats
+                if cache_needs_update:
+                    cache['sources'] = self._get_source_stats(source_paths)
+                    self._write_cache(cache)
+
+                return cache['meta_data']
+
+        # compile YAML files and update cache
+        self.loaded_from_cache = False
+
+        with open(self.skins_meta_path,'r') as skins_meta_file:
+            skins_meta_data = yaml.safe_load(skins_meta_file)
+
+        with open(self.animations_meta_path,'r') as animations_meta_file:
+            animations_meta_data = yaml.safe_load(animations_meta_file)
+
+        meta_data = compile_meta_data(skins_meta_data,
+                                      animations_meta_data)
+
+        self._write_cache({'version': self.version,
+                           'sources': self._get_source_stats(source_paths),
+                           'meta_data': meta_data})
+
+        return meta_data
+
+    def _read_cache(self):
+        '''Util function that returns the cache file's contents, or None if there is no
+        usable cache file.'''
+
+        if self.cache_path is None or not os.path.isfile(self.cache_path):
+            return None
+
+        try:
+            with open(self.cache_path,'rb') as cache_file:
+                cache = pickle.load(cache_file)
+        except Exception:
+            return None
+
+        if not isinstance(cache, dict) or cache.get('version') != self.version:
+            return None
+
+        return cache
+
+    def _write_cache(self,
+                     cache):
+        '''Util function that writes the specified contents to the cache file, if possible.'''
+
+        if self.cache_path is None:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok = True)
+
+            # write to a temporary file first, so that interrupted or concurrent writes (e.g. by
+            # the battle runner's workers) can't leave a broken cache
+            temporary_path = self.cache_path + '.' + str(os.getpid()) + '.tmp'
+
+            with open(temporary_path,'wb') as cache_file:
+                pickle.dump(cache, cache_file, protocol = pickle.HIGHEST_PROTOCOL)
+
+            os.replace(temporary_path, self.cache_path)
+        except OSError:
+            pass
+
+    def _get_source_stats(self,
+                          source_paths):
+        '''Util function that returns the modification time, size and content hash of each of
+        the specified files.'''
+
+        return dict((source_path, self._get_source_stat(source_path) + (get_file_hash(source_path),))
+                    for source_path in source_paths)
+
+    def _get_source_stat(self,
+                         source_path):
+        '''Util function that returns the modification time (in ns) and size of the specified file.'''
+
+        stat = os.stat(source_path)
+
+        return stat.st_mtime_ns, stat.st_size
+
+    def _check_sources(self,
+                       cached_sources,
+                       source_paths):
+        '''Util function that checks the cached stats of the source files against the current
+        ones. Returns whether the cache is current, and whether the cached stats need to be
+        updated (because a file was touched without changing its contents).'''
+
+        needs_update = False
+
+        if sorted(cached_sources) != sorted(source_paths):
+            return False, False
+
+        for source_path in source_paths:
+            if not os.path.isfile(source_path):
+                return False, False
+
+            mtime, size, content_hash = cached_sources[source_path]
+
+            if self._get_source_stat(source_path) == (mtime, size):
+                continue
+
+            # modification time or size changed; only the content hash can tell
+            if get_file_hash(source_path) != content_hash:
+                return False, False
+
+            needs_update = True
+
+        return True, needs_update
+
+def compile_meta_data(skins_meta_data,
+                      animations_meta_data):
+    '''Returns the specified raw meta data together with the typed meta data objects compiled
+    from it, in the format returned by MetaDataCache.load.'''
+
+    return {'skins_meta_data': skins_meta_data,
+            'animations_meta_data': animations_meta_data,
+            'skins': dict((name, SkinMetaData(name, meta_data)) for name, meta_data in skins_meta_data.items()),
+            'animations': dict((name, AnimationMetaData(name, meta_data)) for name, meta_data in animations_meta_data.items())}
+
+def get_read_only_array(values,
+                        dtype):
+    '''Util function that returns the specified values as a read-only array of the specified
+    type, or None if there are no values.'''
+
+    if values is None:
+        return None
+
+    array = np.array(values, dtype = dtype)
+    array.setflags(write = False)
+
+    return array
+
+def get_file_hash(path):
+    '''Util function that returns the hex SHA-256 hash of the specified file's contents.'''
+
+    with open(path,'rb') as hashed_file:
+        return hashlib.sha256(hashed_file.read()).hexdigest()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the RenderQueue class used in the game STAR WARS DOGFIGHTER. The game
+used to draw each of its sprite groups with its own Group.draw call, and the batched laser
+beams, the HUD and the profiler overlay with further blit calls of their own. The render
+queue instead collects the (image, position) pairs of all sprite groups and other sources
+registered with it, in the order of their z-layers, drops everything that lies entirely
+outside the screen and submits the whole frame with a single Surface.blits call.'''
+
+class RenderQueue(object):
+    '''Collects the blits of sprite groups and other sources by z-layer and draws them with one
+    Surface.blits call per frame.'''
+
+    def __init__(self,
+                 screen,
+                 cull_offscreen = True):
+
+        '''Arguments:
+
+            screen: the main screen the game is displayed on (pygame Surface).
+            cull_offscreen: if set, images lying entirely outside the screen are not blitted.
+                    Default is True.'''
+
+        self._screen_rect = screen.get_rect()
+        self.cull_offscreen = cull_offscreen
+
+        # registered sprite groups and sources as (layer, registration index, is group, group or source)
+        self._layers = []
+
+        # initialize statistics
+        self.n_blits = 0
+        self.n_culled = 0
+
+    def add_group(self,
+                  group,
+                  layer = 0):
+        '''Registers the pygame sprite group. Its sprites' images are drawn at their rects every
+        frame, in the group's order, like Group.draw would. Layers are drawn bottom (lowest)
+        to top; groups and sources on the same layer are drawn in the order they were added.'''
+
+        self._add(group, layer, True)
+
+    def add_source(self,
+                   source,
+                   layer = 0):
+        '''Registers a source of blits drawn every frame on the specified layer (see add_group).
+        The source must have a get_blit_sequence method that takes a view region (pygame Rect,
+        or None if nothing should be culled) and returns a list of (image, position) or
+        (image, position, area) tuples, as taken by Surface.blits, for the images overlapping
+        that region.'''
+
+        self._add(source, layer, False)
+
+    def draw(self,
+             surface,
+             return_rects = False):
+        '''Draws the blits of all groups and sources onto the surface with one Surface.blits
+        call. If 'return_rects' is set, returns the list of regions drawn to, e.g. for a
+        DirtyRectRenderer; otherwise returns None.'''
+
+        view_rect = self._screen_rect if self.cull_offscreen else None
+
+        blit_sequence = []
+        n_culled = 0
+
+        for _, _, is_group, group_or_source in self._layers:
+            if is_group:
+                sprites = group_or_source.sprites()
+
+                if view_rect is not None:
+                    is_visible = view_rect.colliderect
+                    group_blits = [(sprite.image, sprite.rect) for sprite in sprites if is_visible(sprite.rect)]
+                    n_culled += len(sprites) - len(group_blits)
+                    blit_sequence.extend(group_blits)
+                else:
+                    blit_sequence.extend([(sprite.image, sprite.rect) for sprite in sprites])
+            else:
+                blit_sequence.extend(group_or_source.get_blit_sequence(view_rect))
+
+        self.n_blits += len(blit_sequence)
+        self.n_culled += n_culled
+
+        if return_rects:
+            return surface.blits(blit_sequence)
+
+        surface.blits(blit_sequence, doreturn = False)
+
+        return None
+
+    def get_stats(self):
+        '''Returns the number of images blitted so far, and the number of sprite images culled
+        for lying outside the screen.'''
+
+        return {'blits': self.n_blits,
+                'culled': self.n_culled}
+
+    def _add(self,
+             group_or_source,
+             layer,
+             is_group):
+        '''Util function that registers a group or source on the layer and keeps the
+        registrations sorted by layer, then by registration order.'''
+
+        self._layers.append((layer, len(self._layers), is_group, group_or_source))
+        self._layers.sort(key = lambda registration: registration[:2])
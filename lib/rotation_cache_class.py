@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the RotationCache class used in the game STAR WARS DOGFIGHTER.
+Rotating a sprite's original image with pygame's rotozoom (and computing its mask) every
+frame is by far the most expensive part of a sprite update. Since sprites only ever turn in
+fixed angle steps, the rotated surfaces can be computed once per angle 'bucket' and then
+shared between all sprites that use the same sequence of original images.'''
+
+from collections import OrderedDict
+from weakref import WeakValueDictionary
+
+import numpy as np
+import pygame as pg
+
+class MaskCounter(object):
+    '''Keeps count of the collision masks built by RotatedImage objects, both in total and
+    per frame. The game loop is expected to call 'reset_frame' once at the start of every frame.'''
+
+    total = 0
+    this_frame = 0
+    last_frame = 0
+
+    @classmethod
+    def count(cls):
+        '''Registers one newly built mask.'''
+
+        cls.total += 1
+        cls.this_frame += 1
+
+    @classmethod
+    def reset_frame(cls):
+        '''Stores the current frame's count as 'last_frame' and resets the frame count.'''
+
+        cls.last_frame = cls.this_frame
+        cls.this_frame = 0
+
+class RotatedImage(object):
+    '''Container for one cache entry: the rotated surface, its (zero positioned) rect
+    and its mask. The mask is only built when it is accessed for the first time, so
+    entries that are never used in a collision test never pay for it.'''
+
+    __slots__ = ('image','rect','_mask','n_bytes')
+
+    def __init__(self,
+                 image):
+
+        self.image = image
+        self.rect = image.get_rect()
+        self._mask = None
+
+        # rough memory footprint: pixel data plus one bit per pixel for the mask
+        width, height = image.get_size()
+        self.n_bytes = width * height * image.get_bytesize() + width * height // 8
+
+    @property
+    def mask(self):
+        '''The rotated surface's collision mask. Built on first access.'''
+
+        if self._mask is None:
+            self._mask = pg.mask.from_surface(self.image)
+            MaskCounter.count()
+
+        return self._mask
+
+class RotationCache(object):
+    '''Cache of rotated versions of a sequence of original images, keyed by image index
+    and quantized angle. Entries are built lazily on first request (or ahead of time via
+    'prebuild') and evicted in least-recently-used order once the cache's memory cap
+    is exceeded.
+
+    Use the 'get_shared' class method to obtain the cache for a given sequence of original
+    images; all sprites that pass the same sequence will then share the same cache.'''
+
+    # default settings used by 'get_shared' if not specified otherwise
+    default_angle_resolution = 1 # in degrees
+    default_max_bytes = 32 * 1024 ** 2 # 32 MB per image sequence
+
+    # registry of live caches. A cache stays registered as long as at least one sprite
+    # holds a reference to it
+    _shared_caches = WeakValueDictionary()
+
+    def __init__(self,
+                 original_images,
+                 size_factor = 1,
+                 angle_resolution = 1,
+                 max_bytes = 32 * 1024 ** 2):
+
+        '''Arguments:
+
+            original_images: list of surface objects that will be rotated and cached.
+            size_factor: zoom factor passed to pygame's rotozoom. Default is 1.
+            angle_resolution: width of one angle bucket in degrees. Angles are rounded to the
+                    nearest bucket before rotating. Needs to divide 360. Default is 1.
+            max_bytes: memory cap (in bytes) for all cached entries. If exceeded, the least
+                    recently used entries will be evicted.'''
+
+        # check angle resolution
+        n_buckets = 360 / angle_resolution
+
+        if angle_resolution <= 0 or abs(n_buckets - round(n_buckets)) > 1e-6:
+            raise ValueError('Angle resolution must be positive and divide 360, but is ' + str(angle_resolution))
+
+        # attach original images. Keeping a reference also guarantees that the
+        # registry key (which is based on image ids) stays valid while the cache lives
+        self._original_images = list(original_images)
+        self._size_factor = size_factor
+        self._angle_resolution = angle_resolution
+        self._n_buckets = int(round(n_buckets))
+
+        # set memory control attributes
+        self._max_bytes = max_bytes
+        self._n_bytes = 0
+
+        # initialize LRU store: (image_index, angle_bucket) -> RotatedImage
+        self._entries = OrderedDict()
+
+        # sources of prebuilt rotations: image_index -> function of angle bucket
+        self._prebuilt = {}
+
+        # initialize counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def get_shared(cls,
+                   original_images,
+                   size_factor = 1,
+                   angle_resolution = None,
+                   max_bytes = None):
+        '''Returns the registered cache for the specified sequence of original images, size
+        factor and angle resolution. Creates and registers a new cache if none exists yet.'''
+
+        # use class defaults if needed
+        if angle_resolution is None:
+            angle_resolution = cls.default_angle_resolution
+
+        if max_bytes is None:
+            max_bytes = cls.default_max_bytes
+
+        # build key from image identities and rotation settings
+        key = (tuple(id(original_image) for original_image in original_images),
+               size_factor,
+               angle_resolution)
+
+        cache = cls._shared_caches.get(key)
+
+        if cache is None:
+            cache = cls(original_images,
+                        size_factor = size_factor,
+                        angle_resolution = angle_resolution,
+                        max_bytes = max_bytes)
+
+            cls._shared_caches[key] = cache
+
+        return cache
+
+    @classmethod
+    def get_shared_stats(cls):
+        '''Returns a dictionary with the summed up statistics of all registered caches.'''
+
+        stats = {'caches':0,
+                 'entries':0,
+                 'bytes':0,
+                 'hits':0,
+                 'misses':0,
+                 'evictions':0}
+
+        for cache in list(cls._shared_caches.values()):
+            cache_stats = cache.get_stats()
+            stats['caches'] += 1
+
+            for key in ('entries','bytes','hits','misses','evictions'):
+                stats[key] += cache_stats[key]
+
+        return stats
+
+    @property
+    def n_buckets(self):
+        '''Number of angle buckets covering the full circle.'''
+
+        return self._n_buckets
+
+    def get_bucket(self,
+                   angle):
+        '''Returns the index of the angle bucket the specified angle (in degrees) falls into.'''
+
+        return int(round(angle / self._angle_resolution)) % self._n_buckets
+
+    def get_buckets(self,
+                    angles):
+        '''Returns the angle bucket indices of the specified angles (array, in degrees), as
+        get_bucket does for a single angle.'''
+
+        return np.round(np.asarray(angles) / self._angle_resolution).astype('int') % self._n_buckets
+
+    def get(self,
+            image_index,
+            angle):
+        '''Returns the RotatedImage entry for the specified image index and angle (in degrees).
+        Builds the entry if it is not cached yet.'''
+
+        return self.get_by_bucket(image_index,
+                                  self.get_bucket(angle))
+
+    def get_by_bucket(self,
+                      image_index,
+                      angle_bucket):
+        '''Returns the RotatedImage entry for the specified image index and angle bucket.
+        Builds the entry if it is not cached yet.'''
+
+        key = (image_index, angle_bucket)
+
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            # cache hit: mark entry as most recently used
+            self.hits += 1
+            self._entries.move_to_end(key)
+
+            return entry
+
+        # cache miss: rotate and store
+        self.misses += 1
+
+        return self._build(key)
+
+    def prebuild(self,
+                 image_indices = None):
+        '''Builds the entries for all angle buckets of the specified image indices ahead of time.
+        If no image indices are specified, all original images will be used. Note that entries
+        will still be evicted if the memory cap is exceeded.'''
+
+        if image_indices is None:
+            image_indices = range(len(self._original_images))
+
+        for image_index in image_indices:
+            for angle_bucket in range(self._n_buckets):
+                key = (image_index, angle_bucket)
+
+                if key not in self._entries:
+                    self._build(key)
+
+    def set_prebuilt(self,
+                     image_index,
+                     get_rotated_image):
+        '''Makes the cache take the rotated versions of the specified image from a source of
+        prebuilt rotations (e.g. an asset bundle) instead of rotating the image itself.
+        'get_rotated_image' takes an angle bucket and returns the rotated surface.'''
+
+        self._prebuilt[image_index] = get_rotated_image
+
+    def get_stats(self):
+        '''Returns a dictionary with the cache's current statistics.'''
+
+        return {'entries':len(self._entries),
+                'bytes':self._n_bytes,
+                'max_bytes':self._max_bytes,
+                'hits':self.hits,
+                'misses':self.misses,
+                'evictions':self.evictions,
+                'angle_resolution':self._angle_resolution}
+
+    def _build(self,
+               key):
+        '''Util function that creates, stores and returns the entry for the specified key.'''
+
+        image_index, angle_bucket = key
+
+        # take prebuilt rotation if available
+        if image_index in self._prebuilt:
+            return self._store(key, RotatedImage(self._prebuilt[image_index](angle_bucket)))
+
+        # rotate original image by the bucket's angle
+        rotated_image = pg.transform.rotozoom(self._original_images[image_index],
+                                              angle_bucket * self._angle_resolution,
+                                              self._size_factor)
+
+        # convert to the display's pixel format (with alpha) if possible; rotozoom returns RGBA
+        # surfaces, which blit much slower onto the display than ones in its own format
+        if pg.display.get_surface() is not None:
+            rotated_image = rotated_image.convert_alpha()
+
+        return self._store(key, RotatedImage(rotated_image))
+
+    def _store(self,
+               key,
+               entry):
+        '''Util function that stores and returns the specified entry, evicting least recently
+        used entries if the memory cap is exceeded.'''
+
+        # store entry and update memory footprint
+        self._entries[key] = entry
+        self._n_bytes += entry.n_bytes
+
+        # evict least recently used entries if needed (but never the one just stored)
+        while self._n_bytes > self._max_bytes and len(self._entries) > 1:
+            _, evicted_entry = self._entries.popitem(last = False)
+            self._n_bytes -= evicted_entry.n_bytes
+            self.evictions += 1
+
+        return entry
@@ -15,11 +15,11 @@ The \'LaserSprite\' class is based directly on the MaskedSprite class.'''
 from basic_sprite_class import BasicSprite
 from animation_classes import BasicAnimation, TrackingAnimation
 from weapons_classes import LaserCannon
+from engine_services_class import EngineServices
 from math import cos, sin, pi
 from pygame.sprite import Group
 from random import randint
 
-import pygame as pg
 import numpy as np
 
 
@@ -61,7 +61,9 @@ class ShipSprite(BasicSprite):
                  max_speed_pixel_per_second = 20,
                  min_speed_pixel_per_second = 10,
                  is_transparent = True,
-                 transparent_color = (255,255,255)):
+                 transparent_color = (255,255,255),
+                 projectile_side = 0,
+                 services = None):
     
         '''Arguments:
             
@@ -107,10 +109,19 @@ class ShipSprite(BasicSprite):
                     color argument in the surfaces contained in 'original_images' will be made transparent.
                     Default is True
             transparent_color: tuple specifiying the color key considered as transparent if 'is_transparent'
-                    is set to true. Default to (255,255,255), which corresponds to the color white.'''
+                    is set to true. Default to (255,255,255), which corresponds to the color white.
+            projectile_side: integer id of the ShipSprite's side, used by the projectile manager
+                    to tell friendly from hostile fire. Default is 0.
+            services: EngineServices object with the engine services (kinematics world, projectile
+                    manager, game clock, sprite pools etc.) the ShipSprite uses. If None, it uses
+                    none of them. Default is None.'''
                     
         # set sound toggle variable to default False
         self._sound = False
+        
+        # get engine services; the kinematics world is needed by the base class
+        if services is None:
+            services = EngineServices()
                     
         # initialize and add to groups if sensible
         BasicSprite.__init__(self,
@@ -122,11 +133,22 @@ class ShipSprite(BasicSprite):
                              angle=angle,
                              speed=speed,
                              is_transparent=is_transparent,
-                             transparent_color=transparent_color)
+                             transparent_color=transparent_color,
+                             kinematics_world=services.kinematics_world)
         
         # set active state variable to communicate to tracking animations
         self._alive = True
         
+        # attach engine services (projectile manager, game clock etc.) before creating laser cannons
+        self._projectile_manager = services.projectile_manager
+        self._projectile_side = projectile_side
+        self._game_clock = services.game_clock
+        self._attachment_registry = services.attachment_registry
+        self._projectile_pool = services.projectile_pool
+        self._muzzle_flash_pool = services.muzzle_flash_pool
+        self._weapons_system = services.weapons_system
+        self._timer_wheel = services.timer_wheel
+        
         # set laser fire meta data attributes            
         self._original_laser_fire_modes = laser_fire_modes
         self._laser_sound = laser_sound
@@ -134,10 +156,11 @@ class ShipSprite(BasicSprite):
         # intialize and attach laser weapons
         self._laser_cannons = []
         
-        for laser_cannon_offset in laser_cannon_offsets * self._size_factor:
+        for cannon_index, laser_cannon_offset in enumerate(laser_cannon_offsets * self._size_factor):
             # for each weapon offset in the ship skin's meta data, we create and 
             # attach a LaserCannon object
             self._laser_cannons.append(LaserCannon(ship_sprite=self,
+                                                     cannon_index=cannon_index,
                                                      cannon_offset=laser_cannon_offset,
                                                      cannon_fire_rate=laser_rate_in_seconds,
                                                      cannon_range_in_seconds=laser_range_in_seconds,
@@ -146,6 +169,11 @@ class ShipSprite(BasicSprite):
                                                      original_laser_beam_images=original_laser_beam_images,
                                                      original_muzzle_flash_images=original_muzzle_flash_images,
                                                      muzzle_flash_animation_spi=muzzle_flash_seconds_per_image))
+            
+        # let the attachment registry rotate the gun offsets along with the ship's animations
+        if self._attachment_registry is not None:
+            self._attachment_registry.add_guns(self,
+                                               laser_cannon_offsets * self._size_factor)
 
         # attach hostile ships and current target group
         self._hostile_ships_group = hostile_ships_group
@@ -176,13 +204,24 @@ class ShipSprite(BasicSprite):
         self._max_speed_pixel_per_frame = max_speed_pixel_per_second / self._fps
         self._min_speed_pixel_per_frame = min_speed_pixel_per_second / self._fps
         
+        # if attached to a kinematics world, let the world enforce the speed limits
+        if self._kinematics_row is not None:
+            self._kinematics_world.set_speed_limits(self._kinematics_row,
+                                                    self._min_speed_pixel_per_frame,
+                                                    self._max_speed_pixel_per_frame)
+        
         # set firing control attributes
         self._command_to_fire = False
+        self._n_shots_fired = 0
         
         # set initial fire mode to coupled cannons, set cannon index to 0
         self._fire_mode_index = 1
         self._cannon_index = 0
         
+        # let the weapons system (if any) take over the laser cannons' fire control
+        if self._weapons_system is not None:
+            self._weapons_system.add_ship(self)
+        
         # create engine flame animation(s)
         self._engine_animations = []
         
@@ -199,6 +238,11 @@ class ShipSprite(BasicSprite):
         # set cannon index back to zero to avoid out of bounds indices when downsampling fire mode
         self._cannon_index = 0  
         
+        # keep the weapons system's fire mode in sync
+        if self._weapons_system is not None:
+            self._weapons_system.set_fire_mode(self,
+                                               self._fire_mode_index)
+        
     def _create_engine_animations(self):
         '''Util method to create engine animations.'''
         
@@ -234,7 +278,7 @@ class ShipSprite(BasicSprite):
         n_salves = len(self._original_laser_fire_modes[self._fire_mode_index])
         
         for next_cannon in self._get_next_cannons():
-            now = pg.time.get_ticks()
+            now = next_cannon._clock.get_ticks()
             mil_seconds_per_shot = 1000 / next_cannon._rate_of_fire
             next_cannon._time_of_last_shot = now - (n_salves - 1) / n_salves * mil_seconds_per_shot
 
@@ -248,7 +292,10 @@ class ShipSprite(BasicSprite):
             self._laser_sound.play()
         
         # fire cannons
-        [laser_cannon.fire() for laser_cannon in self._get_next_cannons()]
+        next_cannons = self._get_next_cannons()
+        [laser_cannon.fire() for laser_cannon in next_cannons]
+        
+        self._n_shots_fired += len(next_cannons)
         
         # update cannon index within current fire mode
         self._cannon_index = (self._cannon_index + 1) % len(self._original_laser_fire_modes[self._fire_mode_index])
@@ -276,12 +323,17 @@ class ShipSprite(BasicSprite):
         group to the current_target group, if feasible. Dummy method at ShipSprite
         level, to be used for AIShipSprite class.'''
         
-    def update(self):
-        '''Base class update plus additional ShipSprite specific updates.'''
+    def steer(self):
+        '''Base class steer plus target acquisition.'''
         
         # if no target has been aquired, get it
         if not self._current_target:
             self._acquire_target()
+            
+        BasicSprite.steer(self)
+        
+    def update(self):
+        '''Base class update plus additional ShipSprite specific updates.'''
         
         # call base class update method
         BasicSprite.update(self)
@@ -292,8 +344,9 @@ class ShipSprite(BasicSprite):
         # get command to fire from custom method
         self.set_gunner_commands()
         
-        # if command to fire was given, check if cannons are ready; if so, fire
-        if self._command_to_fire and np.mean([cannon.is_ready() for cannon in self._get_next_cannons()]):
+        # if command to fire was given, check if any of the cannons are ready; if so, fire. With a
+        # weapons system, this is done for all ships at once after they have updated
+        if self._weapons_system is None and self._command_to_fire and any(cannon.is_ready() for cannon in self._get_next_cannons()):
             # fire the cannon(s)
             self.fire()
             
@@ -310,6 +363,14 @@ class ShipSprite(BasicSprite):
         # update live state variable
         self._alive = False
         
+        # kill attached animations (engine flames, muzzle flashes, frames and ids) right away
+        if self._attachment_registry is not None:
+            self._attachment_registry.despawn(self)
+            
+        # remove laser cannons from the weapons system
+        if self._weapons_system is not None:
+            self._weapons_system.remove_ship(self)
+        
         # create explosion animation
         BasicAnimation(self._fps,
                       self._screen,
@@ -318,7 +379,9 @@ class ShipSprite(BasicSprite):
                       self._animation_group,
                       center = self._center,
                       angle = self._angle,
-                      speed = self._speed * self._fps) # animation expects pixel/second speed unit
+                      speed = self._speed * self._fps, # animation expects pixel/second speed unit
+                      kinematics_world = self._kinematics_world,
+                      timer_wheel = self._timer_wheel)
         
 class AIShipSprite(ShipSprite):
     '''Based on ShipSprite class. Represents an enemy ship during game.'''
@@ -356,7 +419,9 @@ class AIShipSprite(ShipSprite):
                  d_speed_pixel_per_second = 10,
                  max_speed_pixel_per_second = 20,
                  is_transparent = True,
-                 transparent_color = (255,255,255)):
+                 transparent_color = (255,255,255),
+                 projectile_side = 0,
+                 services = None):
     
         '''Arguments: All as in base class's (ShipSprite) __init__ method, except
         for 
@@ -366,7 +431,12 @@ class AIShipSprite(ShipSprite):
                 If pilot can not see the PlayerShipSprite, he will turn to get him back into
                 view.
             gunning_cone_sine: Sine of half of the cone representing the enemy gunner's target sight.
-                If PlayerShipSprite is within this cone, gunner will attempt to fire cannon.'''
+                If PlayerShipSprite is within this cone, gunner will attempt to fire cannon.
+            services: as in base class. Its target selector (if any) is used to acquire
+                targets; otherwise, targets are selected randomly from the hostile ships group.'''
+        
+        # attach target selector before base class init acquires the first target
+        self._target_selector = services.target_selector if services is not None else None
                                 
         ShipSprite.__init__(self,
                             fps,
@@ -398,14 +468,25 @@ class AIShipSprite(ShipSprite):
                              d_speed_pixel_per_second = d_speed_pixel_per_second,
                              max_speed_pixel_per_second = max_speed_pixel_per_second,
                              is_transparent = is_transparent,
-                             transparent_color = transparent_color)
+                             transparent_color = transparent_color,
+                             projectile_side = projectile_side,
+                             services = services)
         
         # attach the AI cone sines
         self._piloting_cone_sine = piloting_cone_sine
         self._gunning_cone_sine = gunning_cone_sine
         
+        # initialize radar reading; set by the AISensors stage if used, and only valid
+        # for the frame it was taken in
+        self._radar_reading = None
+        
     def _acquire_target(self):
         '''Util function to select and add to current_target group.'''
+        
+        # if available, let the target selector pick the target
+        if self._target_selector is not None:
+            self._target_selector.acquire_target(self)
+            return
                 
         # if there are hostile ships, randomly select one
         if self._hostile_ships_group:
@@ -418,11 +499,16 @@ class AIShipSprite(ShipSprite):
         enemy -> player connecting line on the vector orthogonal to the enemy's
         current direction of flight. This allows the enemy to see whether to turn
         left or right to get closer to the current target. Only called when 
-        a current target is selected.'''
+        a current target is selected. If the AISensors stage has already taken a reading
+        for the current target this frame, that reading is returned instead.'''
         
         # get hostile ship sprite
         current_target = self._current_target.sprites()[0]
         
+        # use this frame's reading from the sensor stage if available
+        if self._radar_reading is not None and self._radar_reading[0] is current_target:
+            return self._radar_reading[1]
+        
         # get own directional unit vector
         # convert angle to radian
         angle_radian = self._angle * pi / 180
@@ -472,11 +558,15 @@ class AIShipSprite(ShipSprite):
         
                 # only make piloting decisions if there is a current target
         if not self._current_target:
+            self._radar_reading = None
             return
         
         # have a look at the radar to see where player sprite is
         projection_on_ortnorm = self.use_radar()
         
+        # gunner is the last to use this frame's radar reading
+        self._radar_reading = None
+        
         # if player within 'cone of reasonable accuracy', attempt to fire cannon.
         # Otherwise, dont attempt to fire cannon
         self._command_to_fire = -self._gunning_cone_sine < projection_on_ortnorm < self._gunning_cone_sine
\ No newline at end of file
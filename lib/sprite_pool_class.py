@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the SpritePool class used in the game STAR WARS DOGFIGHTER. Every shot
+creates a laser beam and a muzzle flash sprite that are killed again a second or two later;
+in long battles, that constant churn of short-lived objects shows up as garbage collection
+pauses. A pool keeps killed sprites of one class and sets them up again (see the sprites'
+reset methods) instead of creating new ones. Pools can be prewarmed with sprites created
+ahead of time, and keep statistics that help sizing them for peak fire.'''
+
+class SpritePool(object):
+    '''Free list of killed sprites of one class, handed out again by acquire.'''
+
+    def __init__(self,
+                 sprite_class,
+                 size = 128):
+
+        '''Arguments:
+
+            sprite_class: class of the pooled sprites. Its reset method must take the same
+                    arguments as its __init__ method.
+            size: maximum number of free sprites kept by the pool; sprites killed while the
+                    pool is full are left to the garbage collector. Also the number of sprites
+                    created by prewarm.'''
+
+        self.sprite_class = sprite_class
+        self.size = size
+
+        self._free_sprites = []
+
+        # initialize statistics
+        self.n_in_use = 0
+        self.high_water_mark = 0
+        self.n_misses = 0
+        self.n_reuses = 0
+        self.n_discarded = 0
+
+    def prewarm(self,
+                *args,
+                **kwargs):
+        '''Fills the pool up to its size with sprites created with the specified arguments
+        (which should not include any groups).'''
+
+        while len(self._free_sprites) < self.size:
+            sprite = self._create(*args, **kwargs)
+            self.n_in_use += 1
+            sprite.kill()
+
+    def acquire(self,
+                *args,
+                **kwargs):
+        '''Returns a sprite set up with the specified arguments (as passed to the sprite class'
+        __init__ method): a free sprite from the pool if there is one, otherwise a new one.'''
+
+        if self._free_sprites:
+            sprite = self._free_sprites.pop()
+            sprite._is_free = False
+            sprite.reset(*args, **kwargs)
+            self.n_reuses += 1
+        else:
+            sprite = self._create(*args, **kwargs)
+            self.n_misses += 1
+
+        self.n_in_use += 1
+        self.high_water_mark = max(self.high_water_mark, self.n_in_use)
+
+        return sprite
+
+    def release(self,
+                sprite):
+        '''Takes back a killed sprite. Called by the sprite's kill method; sprites killed
+        more than once are only taken back once.'''
+
+        if sprite._is_free:
+            return
+
+        sprite._is_free = True
+        self.n_in_use -= 1
+
+        if len(self._free_sprites) < self.size:
+            self._free_sprites.append(sprite)
+        else:
+            self.n_discarded += 1
+
+    def get_stats(self):
+        '''Returns the pool's statistics: its size, the number of free sprites, the number of
+        sprites in use now and at most, and the number of sprites that had to be created
+        (misses), were reused, or were left to the garbage collector (discarded).'''
+
+        return {'size': self.size,
+                'free': len(self._free_sprites),
+                'in_use': self.n_in_use,
+                'high_water_mark': self.high_water_mark,
+                'misses': self.n_misses,
+                'reuses': self.n_reuses,
+                'discarded': self.n_discarded}
+
+    def _create(self,
+                *args,
+                **kwargs):
+        '''Util function that creates a new sprite belonging to the pool.'''
+
+        sprite = self.sprite_class(*args, **kwargs)
+        sprite._pool = self
+        sprite._is_free = False
+
+        return sprite
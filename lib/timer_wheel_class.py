@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the TimerWheel and Timer classes used in the game STAR WARS DOGFIGHTER.
+Laser beams and animations used to find out whether their lifetime was over by counting
+and comparing their frames in every update. Instead, they can register their expiry once
+with a timer wheel keyed on the simulation frame, which the game advances once per frame
+to run everything that is due in one batch. The same wheel schedules other delayed events,
+like respawns. The wheel is hierarchical: timers due soon are kept in slots of one frame,
+timers due later in coarser slots that are cascaded down as their time approaches, so the
+cost per frame grows with the number of timers due, not with the number of timers pending.'''
+
+class Timer(object):
+    '''A callback scheduled on a TimerWheel. Returned by TimerWheel.schedule.'''
+
+    __slots__ = ('due','callback','args','kwargs','is_pending','_wheel')
+
+    def __init__(self,
+                 wheel,
+                 due,
+                 callback,
+                 args,
+                 kwargs):
+
+        '''Arguments:
+
+            wheel: the TimerWheel the timer is scheduled on.
+            due: tick (simulation frame) the timer is due at.
+            callback: callable run when the timer is due.
+            args: tuple of positional arguments passed to the callback.
+            kwargs: dictionary of keyword arguments passed to the callback.'''
+
+        self._wheel = wheel
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.is_pending = True
+
+    def cancel(self):
+        '''Cancels the timer if it is still pending. Cancelled timers stay in their slot until
+        their tick comes and are dropped then.'''
+
+        if self.is_pending:
+            self.is_pending = False
+            self.callback = self.args = self.kwargs = None
+            self._wheel.n_cancelled += 1
+
+    def run(self):
+        '''Runs the timer's callback. Called for the timers returned by TimerWheel.advance_to.'''
+
+        return self.callback(*self.args, **self.kwargs)
+
+class TimerWheel(object):
+    '''Hierarchical timer wheel scheduling callbacks on simulation frames (ticks).'''
+
+    def __init__(self,
+                 tick = 0,
+                 level_bits = (8,6,6,6)):
+
+        '''Arguments:
+
+            tick: current tick, e.g. the frame of the game clock the wheel is keyed on.
+            level_bits: number of slots of each level of the wheel, as powers of two. Each
+                    slot of a level spans all slots of the level below; timers further in the
+                    future than all levels span are kept in an overflow list. The default
+                    levels span 256 frames, 4.5 minutes, 4.8 hours and 12 days at 60 fps.'''
+
+        self.tick = tick
+
+        # slots per level, and the number of ticks a slot of each level spans (as power of two)
+        self._level_bits = level_bits
+        self._level_shifts = [sum(level_bits[:level]) for level in range(len(level_bits))]
+        self._levels = [[[] for _ in range(1 << bits)] for bits in level_bits]
+        self._overflow = []
+
+        # initialize statistics
+        self.n_scheduled = 0
+        self.n_run = 0
+        self.n_cancelled = 0
+
+    @property
+    def n_pending(self):
+        '''Number of timers scheduled but neither due nor cancelled yet.'''
+
+        return self.n_scheduled - self.n_run - self.n_cancelled
+
+    def schedule(self,
+                 n_ticks,
+                 callback,
+                 *args,
+                 **kwargs):
+        '''Schedules the callback to run with the specified arguments 'n_ticks' ticks from now,
+        i.e. when the wheel is advanced to tick + n_ticks (at least one tick from now). Returns
+        the Timer, which can be cancelled.'''
+
+        timer = Timer(self,
+                      self.tick + max(int(n_ticks), 1),
+                      callback,
+                      args,
+                      kwargs)
+
+        self._insert(timer)
+        self.n_scheduled += 1
+
+        return timer
+
+    def advance_to(self,
+                   tick):
+        '''Advances the wheel tick by tick up to the specified tick and returns the timers due
+        on the way, in the order they are due. The caller runs them (see Timer.run); they no
+        longer count as pending.'''
+
+        due_timers = []
+
+        while self.tick < tick:
+            self.tick += 1
+
+            # cascade the slots of higher levels whose span starts now down to lower levels
+            for level in range(1, len(self._levels)):
+                if self.tick & ((1 << self._level_shifts[level]) - 1):
+                    break
+
+                self._cascade(level)
+            else:
+                # the top level wrapped around; bring in overflow timers that are in range now
+                if self._overflow and not self.tick & ((1 << sum(self._level_bits)) - 1):
+                    overflow, self._overflow = self._overflow, []
+
+                    for timer in overflow:
+                        self._insert(timer)
+
+            # pop the current slot of the lowest level
+            level_slots = self._levels[0]
+            slot_index = self.tick & (len(level_slots) - 1)
+            slot, level_slots[slot_index] = level_slots[slot_index], []
+
+            for timer in slot:
+                if timer.is_pending:
+                    timer.is_pending = False
+                    due_timers.append(timer)
+
+        self.n_run += len(due_timers)
+
+        return due_timers
+
+    def get_stats(self):
+        '''Returns the current tick and the number of timers scheduled, run, cancelled and
+        still pending.'''
+
+        return {'tick': self.tick,
+                'scheduled': self.n_scheduled,
+                'run': self.n_run,
+                'cancelled': self.n_cancelled,
+                'pending': self.n_pending}
+
+    def _insert(self,
+                timer):
+        '''Util function that puts the timer into the slot of the lowest level that spans its
+        due tick, or into the overflow list.'''
+
+        n_ticks = timer.due - self.tick
+
+        for level_slots, shift, bits in zip(self._levels, self._level_shifts, self._level_bits):
+            if n_ticks < (1 << (shift + bits)):
+                level_slots[(timer.due >> shift) & ((1 << bits) - 1)].append(timer)
+
+                return
+
+        self._overflow.append(timer)
+
+    def _cascade(self,
+                 level):
+        '''Util function that re-inserts the pending timers of the current slot of the
+        specified level, which now all fall into lower levels.'''
+
+        level_slots = self._levels[level]
+        slot_index = (self.tick >> self._level_shifts[level]) & (len(level_slots) - 1)
+        slot, level_slots[slot_index] = level_slots[slot_index], []
+
+        for timer in slot:
+            if timer.is_pending:
+                self._insert(timer)
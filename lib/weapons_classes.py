@@ -7,10 +7,13 @@ Created on Tue Jun 12 21:41:38 2018
 
 '''This script classes representing weapon objects in the game STAR WARS DOGFIGHTER.
 For now it only contains the experimental LaserWeapon class and the ProjectileSprite class
-representing laser beams (and possibly other projectiles in the future).'''
+representing laser beams (and possibly other projectiles in the future), as well as the
+ProjectileManager class that can be used instead of ProjectileSprites for batched laser fire.'''
 
 from animation_classes import TrackingAnimation
 from basic_sprite_class import BasicSprite
+from rotation_cache_class import RotationCache
+from game_clock_classes import WallClock
 from math import sin,cos,pi
 
 import pygame as pg
@@ -29,7 +32,9 @@ class ProjectileSprite(BasicSprite):
                  angle = 0,
                  speed = 0,
                  is_transparent = True,
-                 transparent_color = (255,255,255)):
+                 transparent_color = (255,255,255),
+                 kinematics_world = None,
+                 timer_wheel = None):
         
         '''Arguments:
             
@@ -51,7 +56,11 @@ class ProjectileSprite(BasicSprite):
                     color argument in the surfaces contained in 'original_images' will be made transparent.
                     Default is True
             transparent_color: tuple specifiying the color key considered as transparent if 'is_transparent'
-                    is set to true. Default to (255,255,255), which corresponds to the color white.'''
+                    is set to true. Default to (255,255,255), which corresponds to the color white.
+            kinematics_world: KinematicsWorld object that will integrate the projectile's positional
+                    attributes. Default is None.
+            timer_wheel: TimerWheel object. If specified, the projectile registers its expiry with
+                    the wheel instead of counting its frames in every update. Default is None.'''
                                                
         # initialize and add to groups if sensible
         BasicSprite.__init__(self,
@@ -63,12 +72,52 @@ class ProjectileSprite(BasicSprite):
                              angle=angle,
                              speed=speed,
                              is_transparent=is_transparent,
-                             transparent_color=transparent_color)
+                             transparent_color=transparent_color,
+                             kinematics_world=kinematics_world)
         
         # set lifetime related attributes
+        self._set_lifetime(fps,
+                           lifetime_in_seconds,
+                           timer_wheel)
+        
+    def reset(self,
+              fps,
+              screen,
+              original_images,
+              lifetime_in_seconds,
+              *groups,
+              timer_wheel = None,
+              **kwargs):
+        '''Sets a killed projectile up again with the specified arguments (see __init__), so
+        that it can be reused (see SpritePool).'''
+        
+        BasicSprite.reset(self,
+                          fps,
+                          screen,
+                          original_images,
+                          *groups,
+                          **kwargs)
+        
+        # reset lifetime related attributes
+        self._set_lifetime(fps,
+                           lifetime_in_seconds,
+                           timer_wheel)
+        
+    def _set_lifetime(self,
+                      fps,
+                      lifetime_in_seconds,
+                      timer_wheel):
+        '''Util function that sets the lifetime related attributes and, if there is a timer
+        wheel, registers the projectile's expiry with it.'''
+        
         self._lifetime_in_frames = fps * lifetime_in_seconds
         self.frames_passed = 0
         
+        # the frame counter exceeds the lifetime in the update int(lifetime) + 1 frames from now
+        if timer_wheel is not None:
+            self.expire_in(timer_wheel,
+                           int(self._lifetime_in_frames) + 1)
+        
     def update(self):
         '''BasicSprite update method plus checks & handling against MissileSprite's
         lifetime  attribute.'''
@@ -76,6 +125,10 @@ class ProjectileSprite(BasicSprite):
         # call base class update
         BasicSprite.update(self)
         
+        # projectiles with an expiry timer are killed by the timer wheel
+        if self._expiry_timer is not None:
+            return
+        
         # update frame counter
         self.frames_passed += 1
                     
@@ -84,6 +137,350 @@ class ProjectileSprite(BasicSprite):
             self.kill()
 
 
+class ProjectileManager(object):
+    '''Alternative to ProjectileSprite for large amounts of laser fire. Instead of creating one
+    sprite object per laser beam, the manager keeps all live beams as rows in numpy arrays
+    (position, velocity, angle bucket, remaining lifetime, owner side and beam type), advances
+    and expires them in bulk, draws them with one batched blit call from a pre-rotated image
+    atlas and provides a vectorized collision query against groups of ship sprites.'''
+    
+    def __init__(self,
+                 fps,
+                 screen,
+                 capacity = 512):
+        
+        '''Arguments:
+            
+            fps: frames per second ratio of surrounding pygame
+            screen: the main screen the game is displayed on (pygame Surface).
+                    Needed to 'wrap' laser beams around edges to produce 'donut topology'.
+            capacity: initial number of rows. The arrays will grow automatically if more
+                    laser beams are alive at the same time.'''
+        
+        # set surrounding pygame variables as attributes
+        self._fps = fps
+        self._screen = screen
+        
+        # initialize beam type atlas: one list of pre-rotated images (indexed by angle bucket)
+        # and one array of half image sizes per registered original images sequence
+        self._beam_type_ids = {}
+        self._rotation_caches = []
+        self._atlas_images = []
+        self._atlas_half_sizes = []
+        
+        # allocate arrays; live beams are kept contiguous in the first n_beams rows
+        self.n_beams = 0
+        self._capacity = capacity
+        
+        self.position = np.zeros((capacity,2))
+        self.velocity = np.zeros((capacity,2))
+        self.half_size = np.zeros((capacity,2))
+        self.angle_bucket = np.zeros(capacity,dtype='int')
+        self.lifetime = np.zeros(capacity,dtype='int') # remaining lifetime in frames
+        self.side = np.zeros(capacity,dtype='int')
+        self.beam_type = np.zeros(capacity,dtype='int')
+        
+        # initialize counters
+        self.n_fired = 0
+        self.n_expired = 0
+        self.n_hits = 0
+        
+    def register_beam_type(self,
+                           original_images):
+        '''Registers a sequence of original laser beam images and returns its beam type id.
+        The first image of the sequence is rotated into every angle bucket of its shared
+        rotation cache ahead of time. Registering the same sequence again returns the same id.'''
+        
+        key = tuple(id(original_image) for original_image in original_images)
+        
+        if key in self._beam_type_ids:
+            return self._beam_type_ids[key]
+        
+        # make sure beam images are transparent like those of ProjectileSprites
+        for original_image in original_images:
+            if original_image.get_colorkey() is None and not original_image.get_flags() & pg.SRCALPHA:
+                original_image.set_colorkey((255,255,255))
+        
+        # build atlas from (pre-built) rotation cache entries
+        rotation_cache = RotationCache.get_shared(original_images)
+        rotation_cache.prebuild([0])
+        
+        entries = [rotation_cache.get_by_bucket(0, angle_bucket) for angle_bucket in range(rotation_cache.n_buckets)]
+        
+        beam_type_id = len(self._rotation_caches)
+        
+        self._beam_type_ids[key] = beam_type_id
+        self._rotation_caches.append(rotation_cache)
+        self._atlas_images.append(entries)
+        self._atlas_half_sizes.append(np.array([entry.rect.size for entry in entries],dtype='float') / 2)
+        
+        return beam_type_id
+        
+    def spawn(self,
+              center,
+              angle,
+              speed,
+              lifetime_in_seconds,
+              side,
+              beam_type):
+        '''Adds one laser beam. Speed is expected in pixels per second, angle in degrees.'''
+        
+        # grow arrays if needed
+        if self.n_beams == self._capacity:
+            self._grow(2 * self._capacity)
+            
+        row = self.n_beams
+        self.n_beams += 1
+        self.n_fired += 1
+        
+        # compute velocity vector in pixel per frame. In pygame coordinates, the y-axis has negative orientation
+        radian_angle = angle * pi / 180
+        speed_per_frame = speed / self._fps
+        
+        # set beam attributes
+        angle_bucket = self._rotation_caches[beam_type].get_bucket(angle)
+        
+        self.position[row] = center
+        self.velocity[row] = speed_per_frame * cos(radian_angle), - speed_per_frame * sin(radian_angle)
+        self.angle_bucket[row] = angle_bucket
+        self.half_size[row] = self._atlas_half_sizes[beam_type][angle_bucket]
+        self.lifetime[row] = int(self._fps * lifetime_in_seconds)
+        self.side[row] = side
+        self.beam_type[row] = beam_type
+
+    def spawn_many(self,
+                   centers,
+                   angles,
+                   speeds,
+                   lifetimes_in_seconds,
+                   sides,
+                   beam_types):
+        '''Adds a block of laser beams at once. Takes one sequence per argument of spawn,
+        with one entry per laser beam; the beams are added in that order.'''
+
+        n_new = len(angles)
+
+        if not n_new:
+            return
+
+        # grow arrays if needed
+        while self.n_beams + n_new > self._capacity:
+            self._grow(2 * self._capacity)
+
+        rows = slice(self.n_beams, self.n_beams + n_new)
+        self.n_beams += n_new
+        self.n_fired += n_new
+
+        angles = np.array(angles, dtype='float')
+
+        # compute velocity vectors in pixel per frame. In pygame coordinates, the y-axis has negative orientation
+        radian_angles = angles * pi / 180
+        speeds_per_frame = np.array(speeds, dtype='float') / self._fps
+
+        # get angle buckets per beam type
+        if len(set(beam_types)) == 1:
+            beam_type = beam_types[0]
+            angle_buckets = self._rotation_caches[beam_type].get_buckets(angles)
+            half_sizes = self._atlas_half_sizes[beam_type][angle_buckets]
+        else:
+            beam_types = np.array(beam_types, dtype='int')
+            angle_buckets = np.zeros(n_new, dtype='int')
+            half_sizes = np.zeros((n_new,2))
+
+            for beam_type in np.unique(beam_types).tolist():
+                of_type = beam_types == beam_type
+                angle_buckets[of_type] = self._rotation_caches[beam_type].get_buckets(angles[of_type])
+                half_sizes[of_type] = self._atlas_half_sizes[beam_type][angle_buckets[of_type]]
+
+        # set beam attributes
+        self.position[rows] = centers
+        self.velocity[rows,0] = speeds_per_frame * np.cos(radian_angles)
+        self.velocity[rows,1] = - speeds_per_frame * np.sin(radian_angles)
+        self.angle_bucket[rows] = angle_buckets
+        self.half_size[rows] = half_sizes
+        self.lifetime[rows] = (self._fps * np.array(lifetimes_in_seconds, dtype='float')).astype('int')
+        self.side[rows] = sides
+        self.beam_type[rows] = beam_types
+
+    def step(self):
+        '''Advances all laser beams by one frame: moves them, wraps them around the screen
+        edges and removes all beams whose lifetime is over.'''
+        
+        n = self.n_beams
+        
+        if not n:
+            return
+        
+        # move beams
+        position = self.position[:n]
+        position += self.velocity[:n]
+        
+        # wrap horizontally and vertically if needed
+        for axis, screen_extent in enumerate(self._screen.get_size()):
+            coordinate = position[:,axis]
+            half_extent = self.half_size[:n,axis]
+            
+            below = coordinate < - half_extent
+            above = coordinate > screen_extent + half_extent
+            
+            coordinate[below] = screen_extent + half_extent[below]
+            coordinate[above] = - half_extent[above]
+            
+        # update lifetimes and remove expired beams
+        lifetime = self.lifetime[:n]
+        lifetime -= 1
+        
+        expired = lifetime < 0
+        
+        if expired.any():
+            self.n_expired += int(expired.sum())
+            self._remove(expired)
+            
+    def draw(self,
+             surface):
+        '''Draws all live laser beams onto the specified surface with one batched blit call.'''
+        
+        if not self.n_beams:
+            return
+        
+        surface.blits(self.get_blit_sequence(),
+                      doreturn = False)
+        
+    def get_blit_sequence(self,
+                          view_rect = None):
+        '''Returns the (image, top left corner) pairs of all live laser beams overlapping the
+        specified view region (pygame Rect; all beams if None), as taken by Surface.blits.'''
+        
+        n = self.n_beams
+        
+        if not n:
+            return []
+        
+        # get top left corners of all beams
+        top_lefts = (self.position[:n] - self.half_size[:n]).astype('int')
+        beam_types = self.beam_type[:n]
+        angle_buckets = self.angle_bucket[:n]
+        
+        # drop beams entirely outside the view region
+        if view_rect is not None:
+            bottom_rights = top_lefts + (2 * self.half_size[:n]).astype('int')
+            is_visible = ((top_lefts[:,0] < view_rect.right) & (bottom_rights[:,0] > view_rect.left) &
+                          (top_lefts[:,1] < view_rect.bottom) & (bottom_rights[:,1] > view_rect.top))
+        
+            if not is_visible.all():
+                top_lefts, beam_types, angle_buckets = top_lefts[is_visible], beam_types[is_visible], angle_buckets[is_visible]
+        
+        atlas_images = self._atlas_images
+        
+        return [(atlas_images[beam_type][angle_bucket].image, top_left) for beam_type, angle_bucket, top_left in zip(beam_types.tolist(),
+                                                                                                                     angle_buckets.tolist(),
+                                                                                                                     top_lefts.tolist())]
+        
+    def get_rects(self):
+        '''Returns the screen regions covered by all live laser beams as a list of pygame Rects.'''
+        
+        n = self.n_beams
+        
+        top_lefts = (self.position[:n] - self.half_size[:n]).astype('int').tolist()
+        sizes = (2 * self.half_size[:n]).astype('int').tolist()
+        
+        return [pg.Rect(top_left, size) for top_left, size in zip(top_lefts, sizes)]
+        
+    def collide(self,
+                ships_group,
+                side):
+        '''Checks all live laser beams fired by the specified side against all ships in the
+        specified group. Uses a vectorized bounding box test for all beams at once, followed by
+        a mask test for the remaining candidates. Like collide_mask_wrapped, both tests take the
+        shortest way around the (toroidal) screen. Beams that hit are removed. Returns a dictionary
+        mapping each hit ship to the number of beams that hit it, similar to pygame's groupcollide.'''
+        
+        hits = {}
+        
+        screen_w, screen_h = self._screen.get_size()
+        
+        for ship in ships_group.sprites():
+            n = self.n_beams
+            
+            if not n:
+                break
+            
+            # offsets of all beams' rects w.r.t. ship's rect, wrapped around the screen edges
+            ship_rect = ship.rect
+            top_left = (self.position[:n] - self.half_size[:n]).astype('int')
+            size = (2 * self.half_size[:n]).astype('int')
+            
+            x_offset = (top_left[:,0] - ship_rect.left + screen_w // 2) % screen_w - screen_w // 2
+            y_offset = (top_left[:,1] - ship_rect.top + screen_h // 2) % screen_h - screen_h // 2
+            
+            # bounding box test against ship's rect for all beams of the specified side
+            candidates = np.flatnonzero((self.side[:n] == side) &
+                                        (x_offset > - size[:,0]) &
+                                        (x_offset < ship_rect.width) &
+                                        (y_offset > - size[:,1]) &
+                                        (y_offset < ship_rect.height))
+            
+            if not len(candidates):
+                continue
+            
+            # mask test for candidates
+            ship_mask = ship.mask
+            hit = np.zeros(n,dtype='bool')
+            
+            for row in candidates.tolist():
+                beam_image = self._atlas_images[self.beam_type[row]][self.angle_bucket[row]]
+                
+                if ship_mask.overlap(beam_image.mask,(int(x_offset[row]),int(y_offset[row]))):
+                    hit[row] = True
+                    
+            n_hit = int(hit.sum())
+            
+            if n_hit:
+                hits[ship] = n_hit
+                self.n_hits += n_hit
+                self._remove(hit)
+                
+        return hits
+    
+    def get_stats(self):
+        '''Returns a dictionary with the manager's current statistics.'''
+        
+        return {'live':self.n_beams,
+                'capacity':self._capacity,
+                'fired':self.n_fired,
+                'expired':self.n_expired,
+                'hits':self.n_hits}
+    
+    def _remove(self,
+                removed):
+        '''Util function that removes the beams flagged in the boolean array 'removed' (of
+        length n_beams) and compacts the remaining beams into the first rows.'''
+        
+        keep = ~removed
+        n_keep = int(keep.sum())
+        n = self.n_beams
+        
+        for array in (self.position,self.velocity,self.half_size,self.angle_bucket,self.lifetime,self.side,self.beam_type):
+            array[:n_keep] = array[:n][keep]
+            
+        self.n_beams = n_keep
+        
+    def _grow(self,
+              capacity):
+        '''Util function that resizes all arrays to the specified capacity.'''
+        
+        n_new = capacity - self._capacity
+        
+        self.position = np.concatenate([self.position, np.zeros((n_new,2))])
+        self.velocity = np.concatenate([self.velocity, np.zeros((n_new,2))])
+        self.half_size = np.concatenate([self.half_size, np.zeros((n_new,2))])
+        self.angle_bucket = np.concatenate([self.angle_bucket, np.zeros(n_new,dtype='int')])
+        self.lifetime = np.concatenate([self.lifetime, np.zeros(n_new,dtype='int')])
+        self.side = np.concatenate([self.side, np.zeros(n_new,dtype='int')])
+        self.beam_type = np.concatenate([self.beam_type, np.zeros(n_new,dtype='int')])
+        
+        self._capacity = capacity
+
 class LaserCannon(object):
     '''This class represents a ship's laser cannon. One or more instances of this 
     class will be attached to each ship that carries weapons. The LaserWeapon class
@@ -93,6 +490,7 @@ class LaserCannon(object):
     
     def __init__(self,
                  ship_sprite=None,
+                 cannon_index=0,
                  cannon_offset=None,
                  cannon_fire_rate=1,
                  cannon_range_in_seconds=1.5,
@@ -106,6 +504,8 @@ class LaserCannon(object):
             - ship_sprite: ShipSprite class object. Parent ship to which the laser
             weapon is attached. Needed to access positional and angle parameters
             at firing time.
+            - cannon_index: index of the laser weapon among the parent ship's cannons. Used to
+            get the gun tip position from the parent ship's attachment registry, if any.
             - cannon_fire_rate: rate of fire for this laser weapon, in shots/second
             - cannon_offset: 2-dim offset vector specifying the laser weapon tip w.r.t
             the parent ship sprite's center position. needed to align the laser beam
@@ -127,6 +527,10 @@ class LaserCannon(object):
         # attach laser group
         self._laser_beam_group = cannon_projectile_group
         
+        # attach parent ship's attachment registry (if any), which rotates all gun offsets at once
+        self._cannon_index = cannon_index
+        self._attachment_registry = getattr(ship_sprite,'_attachment_registry',None)
+        
         # attach mechanic weapon specs
         self._offset = np.array(cannon_offset)
         self._rate_of_fire = cannon_fire_rate
@@ -140,14 +544,36 @@ class LaserCannon(object):
         self._original_muzzle_flash_images = original_muzzle_flash_images
         self._muzzle_flash_spi = muzzle_flash_animation_spi
         
+        # if the parent ship fires into a projectile manager, register laser beam images with it
+        self._projectile_manager = getattr(ship_sprite,'_projectile_manager',None)
+        
+        if self._projectile_manager is not None:
+            self._beam_type = self._projectile_manager.register_beam_type(original_laser_beam_images)
+        
+        # create muzzle flashes and laser beams from the parent ship's sprite pools, if any
+        muzzle_flash_pool = getattr(ship_sprite,'_muzzle_flash_pool',None)
+        projectile_pool = getattr(ship_sprite,'_projectile_pool',None)
+        
+        self._create_muzzle_flash = muzzle_flash_pool.acquire if muzzle_flash_pool is not None else TrackingAnimation
+        self._create_laser_beam = projectile_pool.acquire if projectile_pool is not None else ProjectileSprite
+        
+        # attach the parent ship's timer wheel (if any), which kills muzzle flashes and laser beams when they expire
+        self._timer_wheel = getattr(ship_sprite,'_timer_wheel',None)
+        
+        # attach the parent ship's game clock; fall back to the wall clock if there is none
+        self._clock = getattr(ship_sprite,'_game_clock',None)
+        
+        if self._clock is None:
+            self._clock = WallClock()
+        
         # initialize time of last shot that weapon is ready after initializion
-        self._time_of_last_shot = pg.time.get_ticks() - 1005 / cannon_fire_rate # 1005 -> milliseconds unit and + epsilon
+        self._time_of_last_shot = self._clock.get_ticks() - 1005 / cannon_fire_rate # 1005 -> milliseconds unit and + epsilon
         
     def is_ready(self):
         '''Util function called from ship to assess weapon state. Return True if 
         ready to fire, else False.'''
         
-        return (pg.time.get_ticks() - self._time_of_last_shot) > 1000 / self._rate_of_fire
+        return (self._clock.get_ticks() - self._time_of_last_shot) > 1000 / self._rate_of_fire
     
     def get_laser_beam_positions(self):
         '''Calculates the coordinates of the ship sprite's gun tips w.r.t the main
@@ -155,6 +581,11 @@ class LaserCannon(object):
         offset (based on ship sprite's current angle) w.r.t ship sprite's image's 
         center.'''
         
+        # if the parent ship has an attachment registry, get the position from there
+        if self._attachment_registry is not None:
+            return self._attachment_registry.get_gun_position(self._ship,
+                                                              self._cannon_index)
+        
         # convert ship's current angle to radian
         radian_angle = self._ship._angle * pi / 180
         
@@ -168,32 +599,68 @@ class LaserCannon(object):
         
         return rotated_position
     
-    def fire(self):
+    def fire(self,
+             spawns = None):
         '''Util function called from ship to fire cannon. Calculates necessary offsets, then
         creates a laser beam (class MissileSprite object) and a muzzle flash animation (class
-        TrackingAnimation object) at appropriate main game screen position.'''
+        TrackingAnimation object) at appropriate main game screen position. If the cannon fires
+        into a projectile manager and a 'spawns' list is specified, the arguments of the laser
+        beam's ProjectileManager.spawn call are appended to that list instead, so that the beams
+        of several cannons can be added with one spawn_many call.'''
         
         # get: main game screen coordinates for laser beams, offsets for muzzle flash
         laser_beam_position = self.get_laser_beam_positions()
         
+        # if firing into a projectile manager, add beam there and show the muzzle flash with the
+        # ship's other animations. Otherwise, create sprites as usual
+        if self._projectile_manager is not None:
+            self._create_muzzle_flash(self._ship._fps,
+                                      self._ship._screen,
+                                      self._original_muzzle_flash_images,
+                                      self._muzzle_flash_spi,
+                                      self._ship,
+                                      self._offset,
+                                      self._ship._animation_group,
+                                      timer_wheel = self._timer_wheel)
+            
+            spawn = (laser_beam_position,
+                     self._ship._angle,
+                     self._ship._speed * self._ship._fps + self._projectile_speed_in_seconds,
+                     self._range_in_seconds,
+                     self._ship._projectile_side,
+                     self._beam_type)
+            
+            if spawns is not None:
+                spawns.append(spawn)
+            else:
+                self._projectile_manager.spawn(*spawn)
+            
+            # update time of last shot attribute
+            self._time_of_last_shot = self._clock.get_ticks()
+            
+            return
+        
         # create muzzle flash
-        TrackingAnimation(self._ship._fps,
-                          self._ship._screen,
-                          self._original_muzzle_flash_images,
-                          self._muzzle_flash_spi,
-                          self._ship,
-                          self._offset,
-                          self._laser_beam_group)
+        self._create_muzzle_flash(self._ship._fps,
+                                  self._ship._screen,
+                                  self._original_muzzle_flash_images,
+                                  self._muzzle_flash_spi,
+                                  self._ship,
+                                  self._offset,
+                                  self._laser_beam_group,
+                                  timer_wheel = self._timer_wheel)
         
         # create laser beam
-        ProjectileSprite(self._ship._fps,
-                      self._ship._screen,
-                     self._original_laser_beam_images,
-                     self._range_in_seconds,
-                     self._laser_beam_group,
-                     center = laser_beam_position,
-                     angle = self._ship._angle,
-                     speed = self._ship._speed * self._ship._fps + self._projectile_speed_in_seconds)
+        self._create_laser_beam(self._ship._fps,
+                                self._ship._screen,
+                                self._original_laser_beam_images,
+                                self._range_in_seconds,
+                                self._laser_beam_group,
+                                center = laser_beam_position,
+                                angle = self._ship._angle,
+                                speed = self._ship._speed * self._ship._fps + self._projectile_speed_in_seconds,
+                                kinematics_world = self._ship._kinematics_world,
+                                timer_wheel = self._timer_wheel)
         
         # update time of last shot attribute
-        self._time_of_last_shot = pg.time.get_ticks()
\ No newline at end of file
+        self._time_of_last_shot = self._clock.get_ticks()
\ No newline at end of file
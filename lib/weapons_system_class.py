@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+'''This file contains the WeaponsSystem class used in the game STAR WARS DOGFIGHTER. Every
+ship used to check in its own update whether the cannons next in line were ready, one
+LaserCannon object at a time, and to pause the cannons next in line after firing with
+per-cannon timestamp arithmetic. The weapons system keeps every cannon's time of last shot
+and cooldown, and every ship's fire mode and position in the fire mode's salvo cycle, in
+arrays with one row per ship. Once per frame, after all ships have updated (and set their
+commands to fire), it decides which ships fire in one vectorized pass, updates all cooldowns
+at once and emits the resulting laser beams as one block. The fire modes ('all', 'coupled'
+and 'single' salvos, see the skins meta data) behave exactly as before.'''
+
+import numpy as np
+
+class WeaponsSystem(object):
+    '''Struct-of-arrays store for the laser cannons and fire mode cycles of all armed ships.'''
+
+    def __init__(self,
+                 game_clock,
+                 capacity = 32):
+
+        '''Arguments:
+
+            game_clock: GameClock object (or any clock with a get_ticks method returning
+                    milliseconds) the cannons' cooldowns are measured with. Should be the
+                    clock the ships' laser cannons are paced with.
+            capacity: initial number of ship rows. The arrays will grow automatically if more
+                    ships are added.'''
+
+        self._clock = game_clock
+
+        # ships in the order they were added, which is the order they fire in, and their rows
+        self._ships = []
+        self._ship_rows = {}
+        self._rows = np.zeros(0, dtype = 'int')
+
+        # initialize row bookkeeping
+        self._capacity = 0
+        self._free_rows = []
+
+        # cannon arrays, one row per ship (the cannons' owner) and one column per cannon: time
+        # of the cannon's last shot and its cooldown, both in milliseconds
+        self.time_of_last_shot = np.zeros((0,0))
+        self.ms_per_shot = np.zeros((0,0))
+
+        # fire mode arrays, one row per ship: current fire mode, position in its salvo cycle,
+        # number of salvos per fire mode and the cannon indices of each salvo per fire mode
+        # (padded with -1)
+        self.fire_mode_index = np.zeros(0, dtype = 'int')
+        self.salvo_index = np.zeros(0, dtype = 'int')
+        self.n_salvos = np.zeros((0,0), dtype = 'int')
+        self.salvo_cannons = np.zeros((0,0,0,0), dtype = 'int')
+
+        self._grow(capacity, 1, 1, 1)
+
+        # initialize statistics
+        self.n_salvos_fired = 0
+        self.n_shots_fired = 0
+
+    @property
+    def n_ships(self):
+        '''Number of ships in the weapons system.'''
+
+        return len(self._ships)
+
+    def add_ship(self,
+                 ship):
+        '''Adds the ship's laser cannons and fire modes to the weapons system. The cannons'
+        times of last shot and the ship's current fire mode and salvo cycle position are taken
+        over from the ship.'''
+
+        laser_cannons = ship._laser_cannons
+        fire_modes = ship._original_laser_fire_modes
+
+        n_cannons = max([len(laser_cannons)] + [len(salvo) for fire_mode in fire_modes for salvo in fire_mode])
+        n_salvos = max(len(fire_mode) for fire_mode in fire_modes)
+
+        # grow if needed
+        if not self._free_rows:
+            self._grow(2 * self._capacity, len(fire_modes), n_salvos, n_cannons)
+        else:
+            self._grow(self._capacity, len(fire_modes), n_salvos, n_cannons)
+
+        row = self._free_rows.pop()
+
+        # set cannon attributes
+        self.time_of_last_shot[row] = 0
+        self.time_of_last_shot[row,:len(laser_cannons)] = [laser_cannon._time_of_last_shot for laser_cannon in laser_cannons]
+        self.ms_per_shot[row] = np.inf
+        self.ms_per_shot[row,:len(laser_cannons)] = [1000 / laser_cannon._rate_of_fire for laser_cannon in laser_cannons]
+
+        # set fire mode attributes
+        self.fire_mode_index[row] = ship._fire_mode_index
+        self.salvo_index[row] = ship._cannon_index
+        self.n_salvos[row] = 1
+        self.salvo_cannons[row] = -1
+
+        for fire_mode_index, fire_mode in enumerate(fire_modes):
+            self.n_salvos[row,fire_mode_index] = len(fire_mode)
+
+            for salvo_index, salvo in enumerate(fire_mode):
+                self.salvo_cannons[row,fire_mode_index,salvo_index,:len(salvo)] = salvo
+
+        self._ship_rows[ship] = row
+        self._ships.append(ship)
+        self._rows = np.array([self._ship_rows[ship] for ship in self._ships], dtype = 'int')
+
+    def remove_ship(self,
+                    ship):
+        '''Removes the ship from the weapons system, e.g. when it is killed.'''
+
+        row = self._ship_rows.pop(ship, None)
+
+        if row is None:
+            return
+
+        self._free_rows.append(row)
+        self._ships.remove(ship)
+        self._rows = np.array([self._ship_rows[ship] for ship in self._ships], dtype = 'int')
+
+    def set_fire_mode(self,
+                      ship,
+                      fire_mode_index):
+        '''Sets the ship's fire mode and starts its salvo cycle from the first salvo.'''
+
+        row = self._ship_rows[ship]
+
+        self.fire_mode_index[row] = fire_mode_index
+        self.salvo_index[row] = 0
+
+    def step(self):
+        '''Fires the salvos of all ships that were commanded to fire and have at least one of
+        the cannons next in line ready, in the order the ships were added. Fired cannons wait
+        for their cooldown; the cannons next in line wait for the share of their cooldown that
+        spaces the salvos of a fire mode evenly. Call once per frame, after the ships have
+        updated.'''
+
+        if not self._ships:
+            return
+
+        # get ships commanded to fire
+        commands_to_fire = [ship._command_to_fire for ship in self._ships]
+
+        if not any(commands_to_fire):
+            return
+
+        rows = self._rows[np.array(commands_to_fire, dtype = 'bool')]
+        ships = [ship for ship, command_to_fire in zip(self._ships, commands_to_fire) if command_to_fire]
+        now = self._clock.get_ticks()
+
+        # get the cannons next in line and check which of them are ready
+        fire_mode_indices = self.fire_mode_index[rows]
+        cannons = self.salvo_cannons[rows,fire_mode_indices,self.salvo_index[rows]]
+        is_cannon = cannons >= 0
+        cannon_columns = np.where(is_cannon, cannons, 0)
+
+        is_ready = is_cannon & ((now - self.time_of_last_shot[rows[:,None],cannon_columns]) > self.ms_per_shot[rows[:,None],cannon_columns])
+
+        # ships fire if any of their cannons next in line is ready
+        is_firing = is_ready.any(axis = 1)
+
+        if not is_firing.any():
+            return
+
+        rows, fire_mode_indices, cannons, is_cannon = rows[is_firing], fire_mode_indices[is_firing], cannons[is_firing], is_cannon[is_firing]
+        ships = [ship for ship, ship_is_firing in zip(ships, is_firing.tolist()) if ship_is_firing]
+
+        # fire all cannons of the salvos
+        self.time_of_last_shot[rows[np.nonzero(is_cannon)[0]],cannons[is_cannon]] = now
+
+        # advance salvo cycles
+        n_salvos = self.n_salvos[rows,fire_mode_indices]
+        salvo_indices = (self.salvo_index[rows] + 1) % n_salvos
+        self.salvo_index[rows] = salvo_indices
+
+        # make the cannons next in line wait so that salvos are evenly spaced
+        next_cannons = self.salvo_cannons[rows,fire_mode_indices,salvo_indices]
+        is_next_cannon = next_cannons >= 0
+
+        next_ships = np.nonzero(is_next_cannon)[0]
+        next_rows = rows[next_ships]
+        next_columns = next_cannons[is_next_cannon]
+        wait_shares = ((n_salvos - 1) / n_salvos)[next_ships]
+
+        self.time_of_last_shot[next_rows,next_columns] = now - wait_shares * self.ms_per_shot[next_rows,next_columns]
+
+        # emit muzzle flashes and laser beams; beams fired into a projectile manager are added as one block
+        spawns = {}
+
+        for ship, salvo, salvo_index in zip(ships, cannons.tolist(), salvo_indices.tolist()):
+            # play laser sound if sound is on
+            if ship._sound:
+                ship._laser_sound.play()
+
+            salvo = [cannon_index for cannon_index in salvo if cannon_index >= 0]
+            ship_spawns = spawns.setdefault(ship._projectile_manager, [])
+
+            for cannon_index in salvo:
+                ship._laser_cannons[cannon_index].fire(ship_spawns)
+
+            # keep the ship's own fire control attributes up to date
+            ship._n_shots_fired += len(salvo)
+            ship._cannon_index = salvo_index
+
+            self.n_shots_fired += len(salvo)
+
+        self.n_salvos_fired += len(ships)
+
+        for projectile_manager, manager_spawns in spawns.items():
+            if projectile_manager is not None and manager_spawns:
+                projectile_manager.spawn_many(*zip(*manager_spawns))
+
+    def get_stats(self):
+        '''Returns the number of ships, and the number of salvos and laser beams fired so far.'''
+
+        return {'ships': self.n_ships,
+                'salvos_fired': self.n_salvos_fired,
+                'shots_fired': self.n_shots_fired}
+
+    def _grow(self,
+              capacity,
+              n_fire_modes,
+              n_salvos,
+              n_cannons):
+        '''Util function that resizes all arrays to at least the specified number of rows, fire
+        modes, salvos per fire mode and cannons per ship, and registers the new rows as free.'''
+
+        capacity = max(capacity, self._capacity, 1)
+        n_fire_modes = max(n_fire_modes, self.n_salvos.shape[1])
+        n_salvos = max(n_salvos, self.salvo_cannons.shape[2])
+        n_cannons = max(n_cannons, self.time_of_last_shot.shape[1], self.salvo_cannons.shape[3])
+
+        if (capacity, n_fire_modes, n_salvos, n_cannons) == (self._capacity,) + self.salvo_cannons.shape[1:]:
+            return
+
+        # copy arrays into padded ones
+        time_of_last_shot = np.zeros((capacity,n_cannons))
+        ms_per_shot = np.full((capacity,n_cannons), np.inf)
+        n_salvos_per_fire_mode = np.ones((capacity,n_fire_modes), dtype = 'int')
+        salvo_cannons = np.full((capacity,n_fire_modes,n_salvos,n_cannons), -1, dtype = 'int')
+
+        old_capacity, old_n_fire_modes, old_n_salvos, old_n_cannons = (self._capacity,) + self.salvo_cannons.shape[1:]
+
+        time_of_last_shot[:old_capacity,:old_n_cannons] = self.time_of_last_shot
+        ms_per_shot[:old_capacity,:old_n_cannons] = self.ms_per_shot
+        n_salvos_per_fire_mode[:old_capacity,:old_n_fire_modes] = self.n_salvos
+        salvo_cannons[:old_capacity,:old_n_fire_modes,:old_n_salvos,:old_n_cannons] = self.salvo_cannons
+
+        self.time_of_last_shot = time_of_last_shot
+        self.ms_per_shot = ms_per_shot
+        self.n_salvos = n_salvos_per_fire_mode
+        self.salvo_cannons = salvo_cannons
+
+        n_new = capacity - self._capacity
+
+        self.fire_mode_index = np.concatenate([self.fire_mode_index, np.zeros(n_new, dtype = 'int')])
+        self.salvo_index = np.concatenate([self.salvo_index, np.zeros(n_new, dtype = 'int')])
+
+        # register new rows as free, lowest row first
+        self._free_rows = list(range(capacity - 1, self._capacity - 1, -1)) + self._free_rows
+        self._capacity = capacity
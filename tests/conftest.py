@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+'''Test setup for the game STAR WARS DOGFIGHTER. The game's modules live in the lib
+directory and import each other by name, and assets are loaded relative to the repository
+root, so the tests run from there with lib on the path and without opening a window.'''
+
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER','dummy')
+os.environ.setdefault('SDL_AUDIODRIVER','dummy')
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, os.path.join(REPOSITORY_ROOT,'lib'))
+os.chdir(REPOSITORY_ROOT)
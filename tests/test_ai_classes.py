@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the AI classes.'''
+
+import numpy as np
+import pytest
+
+from ai_classes import ShipIndex
+
+class Ship(object):
+    '''Stand-in for a ship sprite with the attributes read by ShipIndex.'''
+
+    def __init__(self,
+                 center):
+
+        self._center = np.array(center, dtype = 'float')
+        self._hit_points = 1
+
+def get_ships(centers):
+    return [Ship(center) for center in centers]
+
+def test_get_nearest_across_partial_seam_cells():
+    '''The nearest ship is found even if the shortest path crosses the narrower last column
+    of a grid whose cell size doesn't divide the world size.'''
+
+    ship_index = ShipIndex(get_ships([(0,184), (1405,64)]), (1500,700), 128)
+
+    assert ship_index.get_nearest((0,64)) == 1
+
+@pytest.mark.parametrize('world_size, cell_size', [((1500,700),128),
+                                                   ((1500,700),64),
+                                                   ((1000,1000),100),
+                                                   ((700,300),250)])
+def test_get_nearest_matches_brute_force(world_size, cell_size):
+    '''get_nearest returns the same ship as a brute force search over all live ships.'''
+
+    random_state = np.random.RandomState(0)
+
+    for _ in range(200):
+        n_ships = random_state.randint(1, 12)
+        ship_index = ShipIndex(get_ships(random_state.rand(n_ships,2) * world_size), world_size, cell_size)
+        ship_index.alive[random_state.rand(n_ships) < 0.2] = False
+
+        point = random_state.rand(2) * world_size
+        nearest = ship_index.get_nearest(point)
+
+        if not ship_index.alive.any():
+            assert nearest is None
+            continue
+
+        distances = ship_index.get_distances(point)
+        distances[~ship_index.alive] = np.inf
+
+        assert distances[nearest] == distances.min()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the animation classes.'''
+
+import numpy as np
+
+from animation_classes import AnimationTimeline
+
+def get_interval_image_index(frames_passed,
+                             n_images,
+                             frames_per_image):
+    '''The frame to image lookup BasicAnimation used before AnimationTimeline: a scan over the
+    frame count intervals of all images. Returns -1 if the animation sequence is over.'''
+
+    lowers = np.linspace(0,(n_images-1)*frames_per_image,n_images)
+    uppers = np.linspace(frames_per_image,n_images*frames_per_image,n_images)
+
+    for i,(lower,upper) in enumerate(zip(lowers,uppers)):
+        if lower < frames_passed <= upper:
+            return i
+
+    return -1
+
+def test_timeline_matches_interval_scan():
+    '''The timeline maps every frame count to the same image as the interval scan, including
+    frame rates and seconds per image that give fractional frames per image.'''
+
+    for n_images in (1, 2, 4, 9):
+        for fps in (30, 60, 144):
+            for seconds_per_image in (0.01, 0.1, 0.07, 1 / 3, 0.5):
+                timeline = AnimationTimeline.get_shared(n_images, fps, seconds_per_image)
+                frames_per_image = float(fps) * seconds_per_image
+
+                for frames_passed in range(0, int(n_images * frames_per_image) + 3):
+                    assert timeline.get_image_index(frames_passed) == get_interval_image_index(frames_passed, n_images, frames_per_image)
+
+                # the end frame is the first frame count after the first one without an image
+                assert get_interval_image_index(timeline.end_frame, n_images, frames_per_image) == -1
+                assert all(get_interval_image_index(frames_passed, n_images, frames_per_image) >= 0 for frames_passed in range(2, timeline.end_frame))
+
+def test_timelines_are_shared():
+    '''Animations with the same number of images, frame rate and seconds per image share one
+    timeline.'''
+
+    assert AnimationTimeline.get_shared(4, 60, 0.1) is AnimationTimeline.get_shared(4, 60, 0.1)
+    assert AnimationTimeline.get_shared(4, 60, 0.1) is not AnimationTimeline.get_shared(4, 60, 0.2)
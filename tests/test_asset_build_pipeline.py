@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the asset build pipeline.'''
+
+import os
+
+import pygame as pg
+
+from asset_build_pipeline import build_assets
+from asset_bundle_class import get_prebuilt_bundle
+
+def test_unchanged_rebuild_keeps_bundle_fresh(tmp_path):
+    '''If the bundle's source files have been touched without changing, the pipeline does not
+    rewrite the bundle, but the runtime considers it up to date again afterwards.'''
+
+    pg.display.set_mode((100,100))
+    build_dir = str(tmp_path)
+
+    stats = build_assets(build_dir = build_dir,
+                         angle_resolution = 90,
+                         verbose = False)
+
+    bundle_path = get_prebuilt_bundle(build_dir)
+
+    assert stats['bundle_written'] and bundle_path is not None
+
+    # make the sources look newer than the bundle, as touching them would
+    os.utime(bundle_path, (0, 0))
+
+    assert get_prebuilt_bundle(build_dir) is None
+
+    stats = build_assets(build_dir = build_dir,
+                         angle_resolution = 90,
+                         verbose = False)
+
+    assert not stats['bundle_written'] and get_prebuilt_bundle(build_dir) == bundle_path
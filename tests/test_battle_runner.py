@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the batch battle runner.'''
+
+import json
+
+from battle_runner import load_results, terminate_last_line
+
+def test_results_appended_after_partial_line_are_kept(tmp_path):
+    '''A result appended after an interrupted write starts on a new line, so it is loaded
+    again, while the partial line is still ignored.'''
+
+    results_path = str(tmp_path / 'results.jsonl')
+
+    with open(results_path,'w') as results_file:
+        results_file.write(json.dumps({'key': 'a'}) + '\n' + '{"key": "b", "win')
+
+    terminate_last_line(results_path)
+    terminate_last_line(results_path)
+
+    with open(results_path,'a') as results_file:
+        results_file.write(json.dumps({'key': 'c'}) + '\n')
+
+    assert [row['key'] for row in load_results(results_path)] == ['a', 'c']
+
+def test_terminate_last_line_leaves_complete_and_empty_files_alone(tmp_path):
+    '''Missing, empty and newline terminated results files are not changed.'''
+
+    results_path = tmp_path / 'results.jsonl'
+
+    terminate_last_line(str(results_path))
+
+    assert not results_path.exists()
+
+    for content in ('', '{"key": "a"}\n'):
+        results_path.write_text(content)
+        terminate_last_line(str(results_path))
+
+        assert results_path.read_text() == content
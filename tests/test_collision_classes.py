@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the collision classes.'''
+
+import numpy as np
+import pygame as pg
+import pytest
+
+from pygame.sprite import Group
+from basic_sprite_class import BasicSprite
+from collision_classes import SpatialHash, AnalyticCollider, collide_mask_wrapped
+
+WORLD_SIZE = (1500,700)
+
+@pytest.fixture(scope = 'module')
+def screen():
+    return pg.display.set_mode(WORLD_SIZE)
+
+@pytest.fixture(scope = 'module')
+def images():
+    '''Images of a round ship and a laser beam with per pixel alpha, like the ones from the
+    asset registry.'''
+
+    ship_image = pg.Surface((40,40), pg.SRCALPHA)
+    pg.draw.circle(ship_image, (0,0,200), (20,20), 16)
+
+    beam_image = pg.Surface((10,4), pg.SRCALPHA)
+    beam_image.fill((200,0,0))
+
+    return [ship_image], [beam_image]
+
+def get_groups(screen, images, random_state, n_ships = 6, n_beams = 60):
+    '''Returns a group of ships and a group of laser beams close to them, many of them near or
+    across the screen edges.'''
+
+    ship_images, beam_images = images
+    world_size = np.array(WORLD_SIZE)
+
+    ships, beams = Group(), Group()
+
+    for _ in range(n_ships):
+        # ships anywhere within 60 pixels of an edge, including partly outside the screen
+        center = random_state.uniform(-20, 60, 2) * random_state.choice([-1,1], 2) % world_size
+
+        BasicSprite(60, screen, ship_images, ships, center = center, angle = random_state.uniform(0,360))
+
+        for _ in range(n_beams // n_ships):
+            beam_center = (center + random_state.uniform(-35, 35, 2)) % world_size
+
+            BasicSprite(60, screen, beam_images, beams, center = beam_center, angle = random_state.uniform(0,360))
+
+    return ships, beams
+
+def get_brute_force_hits(ships, beams):
+    return dict((ship, set(beam for beam in beams if collide_mask_wrapped(ship, beam, WORLD_SIZE))) for ship in ships)
+
+def get_hits(crashed, ships):
+    return dict((ship, set(crashed.get(ship, ()))) for ship in ships)
+
+def test_spatial_hash_cells_match_across_partial_seam_cells():
+    '''A rect crossing the left edge shares a cell with a rect at the same spot on the right
+    edge, although the last column of the grid is narrower than a cell.'''
+
+    spatial_hash = SpatialHash(WORLD_SIZE, 64)
+
+    ship_cells = set(spatial_hash.get_cells(pg.Rect(-40,300,40,40)))
+    beam_cells = set(spatial_hash.get_cells(pg.Rect(1455,310,10,4)))
+
+    assert ship_cells & beam_cells
+
+@pytest.mark.parametrize('cell_size', [64, 100, 128])
+def test_spatial_hash_groupcollide_matches_brute_force(screen, images, cell_size):
+    '''The broadphase finds exactly the collisions a brute force toroidal mask test finds.'''
+
+    random_state = np.random.RandomState(cell_size)
+    spatial_hash = SpatialHash(WORLD_SIZE, cell_size)
+    n_hits = 0
+
+    for _ in range(20):
+        ships, beams = get_groups(screen, images, random_state)
+        brute_force_hits = get_brute_force_hits(ships, beams)
+
+        assert get_hits(spatial_hash.groupcollide(ships, beams, False, False), ships) == brute_force_hits
+
+        n_hits += sum(len(hits) for hits in brute_force_hits.values())
+
+    assert n_hits
+
+def test_analytic_collider_matches_mask_test_across_edges(screen, images):
+    '''In circle mode, refined with the mask test, the analytic collider only misses the
+    collisions of a brute force toroidal mask test that its audit counts as false negatives,
+    and gives the same results with and without the broadphase.'''
+
+    random_state = np.random.RandomState(0)
+    spatial_hash = SpatialHash(WORLD_SIZE, 64)
+    colliders = [AnalyticCollider('circle',
+                                  world_size = WORLD_SIZE,
+                                  refine_with_mask = True,
+                                  audit = True) for _ in range(2)]
+    n_hits = 0
+
+    for _ in range(20):
+        ships, beams = get_groups(screen, images, random_state)
+        brute_force_hits = get_brute_force_hits(ships, beams)
+
+        results = []
+
+        for collider, broadphase in zip(colliders, [None, spatial_hash]):
+            n_false_negatives = collider.stats['false_negatives']
+            hits = get_hits(collider.groupcollide(ships, beams, False, False, broadphase = broadphase), ships)
+
+            n_missed = sum(len(brute_force_hits[ship] - hits[ship]) for ship in ships)
+
+            assert all(hits[ship] <= brute_force_hits[ship] for ship in ships)
+            assert n_missed == collider.stats['false_negatives'] - n_false_negatives
+
+            results.append(hits)
+
+        assert results[0] == results[1]
+
+        n_hits += sum(len(hits) for hits in results[0].values())
+
+    assert n_hits
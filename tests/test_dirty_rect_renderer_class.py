@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the DirtyRectRenderer class.'''
+
+import pygame as pg
+
+from pygame.sprite import Group, Sprite
+from dirty_rect_renderer_class import DirtyRectRenderer
+
+def get_group(size, n_sprites):
+    '''Returns a group of square sprites of the specified size along a diagonal.'''
+
+    group = Group()
+
+    for i in range(n_sprites):
+        sprite = Sprite(group)
+        sprite.image = pg.Surface((size,size))
+        sprite.rect = sprite.image.get_rect(topleft = (i * size, i * size))
+
+    return group
+
+def render_frame(renderer, screen, group, extra_rects = ()):
+    '''Draws one frame of the group with the renderer, like Game.draw_game_state does.'''
+
+    renderer.restore_background()
+    group.draw(screen)
+    renderer.update_display([group], extra_rects)
+
+def test_renderer_chooses_partial_update_or_full_flip():
+    '''The first frame is flipped in full; frames with small dirty regions are partial updates;
+    frames whose dirty regions exceed the threshold, and frames after invalidate, are full
+    flips.'''
+
+    screen = pg.display.set_mode((400,300))
+    background = pg.Surface((400,300))
+    renderer = DirtyRectRenderer(screen, background, full_flip_threshold = 0.4)
+
+    small_group = get_group(20, 3)
+    large_group = get_group(150, 2)
+
+    render_frame(renderer, screen, small_group)
+
+    assert (renderer.n_full_flips, renderer.n_partial_updates) == (1, 0)
+
+    render_frame(renderer, screen, small_group)
+
+    # previous and current sprite regions: 2 * 3 * 20 * 20 pixels
+    assert (renderer.n_full_flips, renderer.n_partial_updates) == (1, 1)
+    assert renderer.last_dirty_share == 2 * 3 * 20 * 20 / (400 * 300)
+
+    # small sprites plus a large region drawn by other means
+    render_frame(renderer, screen, small_group, extra_rects = [pg.Rect(0,0,300,200)])
+
+    assert (renderer.n_full_flips, renderer.n_partial_updates) == (2, 1)
+
+    # large sprites: the renderer expects the next frame to be too large as well
+    render_frame(renderer, screen, large_group)
+    render_frame(renderer, screen, large_group)
+
+    assert (renderer.n_full_flips, renderer.n_partial_updates) == (4, 1)
+
+    render_frame(renderer, screen, small_group)
+    render_frame(renderer, screen, small_group)
+
+    assert renderer.n_partial_updates == 2
+
+    renderer.invalidate()
+    render_frame(renderer, screen, small_group)
+
+    assert renderer.get_stats()['full_flips'] == 6 and renderer.last_dirty_share == 1.0
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the Game class.'''
+
+import pytest
+
+from game_class import Game
+from weapons_classes import ProjectileSprite
+
+@pytest.fixture
+def game():
+    return Game(headless = True,
+                respawn_delay_in_seconds = 0.5)
+
+@pytest.mark.parametrize('side', ['hostile','allied'])
+def test_killed_ship_respawns_after_delay(game, side):
+    '''A ship shot down in handle_collisions is flagged, and the respawn scheduled for it
+    spawns a new ship of its side exactly 'respawn_delay_in_frames' frames later.'''
+
+    game.setup_squadron_battle(1, 1)
+
+    ships = game.hostile_ships if side == 'hostile' else game.allied_ships
+    laser_beams, laser_images = (game.allied_laser_beams, game.allied_laser_images) if side == 'hostile' else (game.hostile_laser_beams, game.hostile_laser_images)
+
+    # put a laser beam right onto a ship with one hit point left
+    ship = ships.sprites()[0]
+    ship._hit_points = 1
+
+    ProjectileSprite(game.fps,
+                     game.screen,
+                     laser_images,
+                     1,
+                     laser_beams,
+                     center = ship._center.copy(),
+                     kinematics_world = game.kinematics_world,
+                     timer_wheel = game.expiry_timers)
+
+    hostile_down, ally_down = game.handle_collisions()
+
+    assert (hostile_down, ally_down) == ((True, False) if side == 'hostile' else (False, True))
+    assert not ship.alive() and not ships
+
+    game.schedule_respawns(hostile_down, ally_down)
+
+    for _ in range(game.respawn_delay_in_frames - 1):
+        game.update_game_state()
+
+    assert not ships
+
+    game.update_game_state()
+
+    assert len(ships) == 1
+
+def test_killed_ship_does_not_respawn_by_default():
+    '''Respawns are opt-in: by default, a ship shot down is not replaced.'''
+
+    game = Game(headless = True)
+    game.setup_squadron_battle(1, 1)
+
+    assert game.respawn_delay_in_frames is None
+
+    ship = game.hostile_ships.sprites()[0]
+    ship.kill()
+
+    n_pending = game.timers.n_pending
+    game.schedule_respawns(True, False)
+
+    assert game.timers.n_pending == n_pending
+
+    for _ in range(2 * game.fps):
+        game.update_game_state()
+
+    assert not game.hostile_ships
+
+def test_spawned_ships_use_the_game_services():
+    '''Ships spawned by the game get all engine services from the game's EngineServices.'''
+
+    game = Game(headless = True,
+                projectile_pool_size = 8,
+                muzzle_flash_pool_size = 8)
+    game.setup_squadron_battle(1, 1)
+
+    services = game.services
+
+    for ship in game.all_ships:
+        assert ship._kinematics_world is services.kinematics_world is game.kinematics_world
+        assert ship._weapons_system is services.weapons_system is game.weapons
+        assert ship._target_selector is services.target_selector is game.target_selector
+        assert ship._projectile_pool is game.projectile_pool and ship._muzzle_flash_pool is game.muzzle_flash_pool
+        assert ship._timer_wheel is game.expiry_timers and ship._game_clock is game.game_clock
+        assert ship._attachment_registry is game.attachments
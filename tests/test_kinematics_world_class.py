@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the KinematicsWorld class.'''
+
+import numpy as np
+import pygame as pg
+
+from basic_sprite_class import BasicSprite
+from kinematics_world_class import KinematicsWorld
+
+class PilotedSprite(BasicSprite):
+    '''BasicSprite with a fixed steering pattern and speed limits, like a ShipSprite's.'''
+
+    def __init__(self,
+                 *args,
+                 min_speed = 2,
+                 max_speed = 9,
+                 **kwargs):
+
+        BasicSprite.__init__(self, *args, **kwargs)
+
+        self._min_speed, self._max_speed = min_speed, max_speed
+        self._n_frames = 0
+
+        if self._kinematics_row is not None:
+            self._kinematics_world.set_speed_limits(self._kinematics_row, min_speed, max_speed)
+
+    def set_pilot_commands(self):
+        self._n_frames += 1
+
+        self._d_angle = 3 if (self._n_frames // 40) % 2 else -2
+        self._d_speed = 0.5 if (self._n_frames // 25) % 2 else -0.5
+
+    def _control_speed(self):
+        self._speed = max(min(self._speed, self._max_speed), self._min_speed)
+
+def test_world_step_matches_scalar_integration():
+    '''Sprites integrated by the world's vectorized step end up with the same centers, angles
+    and speeds as the same sprites integrated one by one with update_positional_attributes,
+    frame by frame, while wrapping around all four screen edges.'''
+
+    screen = pg.Surface((400,300))
+    screen_w, screen_h = screen.get_size()
+
+    image = pg.Surface((30,12), pg.SRCALPHA)
+    image.fill((0,0,255))
+
+    world = KinematicsWorld(screen.get_size(), capacity = 2)
+
+    # sprites near every edge, heading across it
+    starts = [((390,150),0), ((10,150),180), ((200,10),90), ((200,290),270), ((395,295),315), ((5,5),135)]
+    world_sprites = [PilotedSprite(60, screen, [image], center = center, angle = angle, speed = 480, kinematics_world = world) for center, angle in starts]
+    scalar_sprites = [PilotedSprite(60, screen, [image], center = center, angle = angle, speed = 480) for center, angle in starts]
+
+    wrapped_edges = set()
+
+    for _ in range(600):
+        # world path, in the order of Game.update_game_state
+        for sprite in world_sprites:
+            sprite.steer()
+
+        world.step()
+
+        for sprite in world_sprites:
+            sprite.update()
+
+        # scalar path
+        previous_centers = [sprite._center.copy() for sprite in scalar_sprites]
+
+        for sprite in scalar_sprites:
+            sprite.update()
+
+        for world_sprite, scalar_sprite, previous_center in zip(world_sprites, scalar_sprites, previous_centers):
+            np.testing.assert_allclose(world_sprite._center, scalar_sprite._center, rtol = 0, atol = 1e-9)
+            np.testing.assert_allclose(world_sprite._angle, scalar_sprite._angle, rtol = 0, atol = 1e-9)
+            np.testing.assert_allclose(world_sprite._speed, scalar_sprite._speed, rtol = 0, atol = 1e-9)
+
+            # record screen edges crossed by the jump a wrap makes
+            dx, dy = scalar_sprite._center - previous_center
+
+            if dx < - screen_w / 2:
+                wrapped_edges.add('right')
+            elif dx > screen_w / 2:
+                wrapped_edges.add('left')
+
+            if dy < - screen_h / 2:
+                wrapped_edges.add('bottom')
+            elif dy > screen_h / 2:
+                wrapped_edges.add('top')
+
+    assert wrapped_edges == {'left','right','top','bottom'}
+
+def test_removed_rows_are_reused_lowest_first():
+    '''Freed rows are reused lowest first, and the high-water mark shrinks over free top rows.'''
+
+    world = KinematicsWorld((400,300), capacity = 2)
+
+    rows = [world.add((0,0), 0, 1) for _ in range(5)]
+
+    assert rows == [0,1,2,3,4] and world._n_rows == 5
+
+    for row in (3,1,4):
+        world.remove(row)
+
+    assert world._n_rows == 3
+
+    world.remove(2)
+
+    assert world._n_rows == 1 and world.n_entities == 1
+    assert [world.add((0,0), 0, 1) for _ in range(3)] == [1,2,3]
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the meta data classes.'''
+
+import os
+import shutil
+
+from meta_data_classes import MetaDataCache
+
+def get_cache(tmp_path):
+    '''Returns a MetaDataCache on copies of the meta data files in the specified directory.'''
+
+    skins_meta_path = str(tmp_path / 'skins.yaml')
+    animations_meta_path = str(tmp_path / 'animations.yaml')
+
+    shutil.copy('./meta/sprite_skins_meta_data.yaml', skins_meta_path)
+    shutil.copy('./meta/animations_meta_data.yaml', animations_meta_path)
+
+    return MetaDataCache(skins_meta_path = skins_meta_path,
+                         animations_meta_path = animations_meta_path,
+                         cache_path = str(tmp_path / 'build' / 'meta_data_cache.pickle'))
+
+def test_cache_is_used_until_meta_data_changes(tmp_path):
+    '''The cache file is used as long as the YAML files' contents are unchanged, even if they
+    are touched, and rebuilt as soon as their contents change.'''
+
+    cache = get_cache(tmp_path)
+
+    meta_data = cache.load()
+
+    assert not cache.loaded_from_cache
+
+    assert cache.load()['animations']['engine'].spi == meta_data['animations']['engine'].spi
+    assert cache.loaded_from_cache
+
+    # touch: modification time changes, contents don't
+    os.utime(cache.animations_meta_path, (1, 1))
+
+    cache.load()
+
+    assert cache.loaded_from_cache
+    assert cache._read_cache()['sources'][cache.animations_meta_path][0] == 1 * 10 ** 9
+
+    # change contents
+    with open(cache.animations_meta_path,'r') as animations_meta_file:
+        animations_meta_data = animations_meta_file.read()
+
+    with open(cache.animations_meta_path,'w') as animations_meta_file:
+        animations_meta_file.write(animations_meta_data.replace('  spi: 0.1', '  spi: 0.25', 1))
+
+    changed_meta_data = cache.load()
+
+    assert not cache.loaded_from_cache
+    assert changed_meta_data['animations']['engine'].spi == 0.25
+
+    cache.load()
+
+    assert cache.loaded_from_cache
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the SpritePool class.'''
+
+import numpy as np
+import pygame as pg
+
+from pygame.sprite import Group
+from sprite_pool_class import SpritePool
+from kinematics_world_class import KinematicsWorld
+from timer_wheel_class import TimerWheel
+from weapons_classes import ProjectileSprite
+
+def test_killed_sprites_are_reused_and_reset():
+    '''A killed pooled sprite is handed out again by the next acquire, set up like a new
+    sprite with the new arguments.'''
+
+    screen = pg.display.set_mode((400,300))
+    image = pg.Surface((10,4), pg.SRCALPHA)
+    image.fill((255,0,0))
+
+    world = KinematicsWorld(screen.get_size())
+    wheel = TimerWheel()
+    old_group, new_group = Group(), Group()
+
+    pool = SpritePool(ProjectileSprite, size = 2)
+
+    sprite = pool.acquire(60, screen, [image], 1, old_group, center = np.array([10.0,20.0]), angle = 30, speed = 120, kinematics_world = world, timer_wheel = wheel)
+    sprite.update()
+
+    sprite.kill()
+    sprite.kill() # killed twice, taken back once
+
+    assert pool.get_stats()['free'] == 1 and pool.n_in_use == 0 and world.n_entities == 0
+    assert not wheel.n_pending
+
+    reused_sprite = pool.acquire(60, screen, [image], 0.5, new_group, center = np.array([200.0,100.0]), angle = 90, speed = 60, kinematics_world = world, timer_wheel = wheel)
+
+    assert reused_sprite is sprite
+    assert reused_sprite.groups() == [new_group] and not old_group
+    assert list(reused_sprite._center) == [200,100] and reused_sprite._angle == 90 and reused_sprite._speed == 1
+    assert reused_sprite.rect.center == (200,100)
+    assert reused_sprite.frames_passed == 0 and reused_sprite._lifetime_in_frames == 30
+    assert reused_sprite._kinematics_row is not None and world.n_entities == 1
+    assert wheel.n_pending == 1
+
+    stats = pool.get_stats()
+
+    assert (stats['misses'], stats['reuses'], stats['in_use'], stats['free']) == (1, 1, 1, 0)
+
+def test_full_pool_discards_killed_sprites():
+    '''Prewarmed sprites are handed out first; sprites killed while the pool is full are not
+    kept.'''
+
+    screen = pg.display.set_mode((400,300))
+    image = pg.Surface((10,4), pg.SRCALPHA)
+
+    pool = SpritePool(ProjectileSprite, size = 2)
+    pool.prewarm(60, screen, [image], 1)
+
+    sprites = [pool.acquire(60, screen, [image], 1) for _ in range(3)]
+
+    for sprite in sprites:
+        sprite.kill()
+
+    stats = pool.get_stats()
+
+    assert (stats['misses'], stats['reuses'], stats['discarded'], stats['free'], stats['high_water_mark']) == (1, 2, 1, 2, 3)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the TimerWheel class.'''
+
+import numpy as np
+
+from timer_wheel_class import TimerWheel
+
+def test_timers_run_at_their_due_tick_across_levels():
+    '''Timers due in any level of the wheel or in its overflow list are returned by the
+    advance that passes their due tick, in the order they are due, and cancelled timers are
+    never returned.'''
+
+    # small levels spanning 4, 16 and 64 ticks, so that timers cascade and overflow often
+    wheel = TimerWheel(tick = 3,
+                       level_bits = (2,2,2))
+    random_state = np.random.RandomState(0)
+
+    pending_timers = set()
+    n_run = 0
+
+    def schedule(n_timers):
+        for _ in range(n_timers):
+            n_ticks = int(random_state.choice([1,3,4,5,15,16,17,63,64,65,200]) + random_state.randint(0,3))
+            timer = wheel.schedule(n_ticks, lambda: None)
+
+            # cancel some of them
+            if random_state.rand() < 0.2:
+                timer.cancel()
+            else:
+                pending_timers.add(timer)
+
+    schedule(50)
+
+    while wheel.tick < 600:
+        # advance by one or more ticks at a time, scheduling more timers on the way
+        tick = wheel.tick + random_state.randint(1,4)
+
+        due_timers = wheel.advance_to(tick)
+
+        assert [timer.due for timer in due_timers] == sorted(timer.due for timer in due_timers)
+        assert set(due_timers) == set(timer for timer in pending_timers if timer.due <= tick)
+
+        pending_timers.difference_update(due_timers)
+        n_run += len(due_timers)
+
+        if wheel.tick < 300:
+            schedule(3)
+
+    assert n_run and not pending_timers and wheel.n_pending == 0
+
+def test_timers_with_default_levels_cascade_in_order():
+    '''With the default levels, timers due around the first level boundary (256 ticks) run at
+    their due tick.'''
+
+    wheel = TimerWheel()
+    delays = [300, 1, 256, 255, 257, 511, 512, 1000]
+
+    timers = [wheel.schedule(delay, lambda: None) for delay in delays]
+
+    run_order = []
+
+    for tick in range(1, 1001):
+        for timer in wheel.advance_to(tick):
+            assert timer.due == tick
+            run_order.append(timer.due)
+
+    assert run_order == sorted(delays) and all(not timer.is_pending for timer in timers)
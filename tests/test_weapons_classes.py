@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+'''Tests of the weapon classes.'''
+
+import numpy as np
+import pygame as pg
+
+from pygame.sprite import Group, Sprite
+from collision_classes import collide_mask_wrapped
+from rotation_cache_class import RotationCache
+from weapons_classes import ProjectileManager
+
+def test_projectile_manager_collide_wraps_around_screen_edges():
+    '''Batched laser beams hit ships exactly when the equivalent sprites collide according to
+    collide_mask_wrapped, also across the screen edges.'''
+
+    screen = pg.display.set_mode((300,200))
+    screen_w, screen_h = screen.get_size()
+
+    beam_image = pg.Surface((20,4))
+    beam_image.fill((255,0,0))
+    ship_image = pg.Surface((30,30))
+    ship_image.fill((0,0,255))
+
+    random_state = np.random.RandomState(0)
+    n_hits, n_wrapped_hits = 0, 0
+
+    for _ in range(500):
+        manager = ProjectileManager(60, screen)
+        beam_type = manager.register_beam_type([beam_image])
+
+        # ship anywhere, beam close to it (possibly on the other side of a screen edge)
+        ship = Sprite()
+        ship.image = ship_image
+        ship.rect = ship_image.get_rect(center = tuple(random_state.rand(2) * (screen_w, screen_h)))
+        ship.mask = pg.mask.from_surface(ship_image)
+
+        center = (np.array(ship.rect.center) + random_state.uniform(-40, 40, 2)) % (screen_w, screen_h)
+        manager.spawn(center, random_state.uniform(0, 360), 0, 1, 0, beam_type)
+
+        beam = Sprite()
+        beam.rect = manager.get_rects()[0]
+        beam.mask = RotationCache.get_shared([beam_image]).get_by_bucket(0, int(manager.angle_bucket[0])).mask
+
+        is_hit = collide_mask_wrapped(ship, beam, (screen_w, screen_h)) is not None
+
+        assert bool(manager.collide(Group(ship), 0)) == is_hit
+
+        n_hits += is_hit
+        n_wrapped_hits += is_hit and not ship.rect.colliderect(beam.rect)
+
+    assert n_hits and n_wrapped_hits